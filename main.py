@@ -51,6 +51,37 @@ if __name__ == "__main__":
     l_parser.add_argument("--timestamp", dest="resulttimestamped",
                           default=False, action='store_true',
                           help="create timestamped folders for output")
+    l_parser.add_argument("--checkpoint-phase1", dest="checkpointphase1",
+                          default=False, action='store_true',
+                          help="save the SUMO state at the end of phase 1 and "
+                               "branch runs with the same network and demand "
+                               "from it (requires SUMO with state saving)")
+    l_parser.add_argument("--route-cache", dest="routecache",
+                          default=False, action='store_true',
+                          help="reuse phase 2 routes of runs with the same "
+                               "network and demand, cooperative routes only "
+                               "with --phase2-seed")
+    l_parser.add_argument("--phase2-seed", dest="phase2seed", type=int,
+                          help="seed of the phase 2 hill climbing, makes "
+                               "cooperative routes reproducible")
+    l_parser.add_argument("--hill-budget", dest="hillbudget", type=float,
+                          help="wall clock budget in seconds of the phase 2 "
+                               "hill climbing, the best routes found so far "
+                               "are used")
+    l_parser.add_argument("--background-vehicles", dest="backgroundvehicles",
+                          type=int,
+                          help="number of vehicles not searching for parking, "
+                               "simulated by SUMO only")
+    l_parser.add_argument("--communication-distance",
+                          dest="communicationdistance", type=float,
+                          help="searching vehicles closer than this "
+                               "(Manhattan distance in m) share what they "
+                               "know about parking spaces")
+    l_parser.add_argument("--phase2-prefetch", dest="phase2prefetch",
+                          type=int,
+                          help="number of upcoming runs whose demand and "
+                               "phase 2 routes are computed in a process "
+                               "pool while the current run simulates")
 
     # if display GUI, restrict to one run (implies --run 1)
     # for more than one run, disallow use of --gui
@@ -71,8 +102,7 @@ if __name__ == "__main__":
     print("* pre-testing runcfg for all runs")
     sim_conf = l_config.getCfg("simulation")
     if l_config.existRunCfg():
-        tmp_iter = xrange(sim_conf.get("runs"))
-        if [run for run in tmp_iter if not l_config.isRunCfgOk(run)]:
+        if l_config.validateRunCfg():
             raise BaseException("Error(s) in run configuration")
         else:
             print("  -> passed.")
@@ -221,25 +251,23 @@ if __name__ == "__main__":
             print("/!\\ stack trace:")
             print(traceback.format_exc())
             print("/!\ recovering...")
-            # cleanup open file streams and write run cfg if not exists
+            # cleanup open file streams and the process pool, write run cfg
             rf.close()
             cf.close()
-            if not os.path.isfile(sim_conf.get("runconfiguration")):
-                l_config.writeRunCfg()
-            else:
-                print("There exists a run cfg at {}! Refusing to overwrite it!".format(
-                    os.path.isfile(sim_conf.get("runconfiguration"))))
+            l_runtime.close()
+            l_config.saveRunCfg()
             raise BaseException("/!\\ Unhandled exception in run id {} occurred /!\\".format(i_run))
 
     rf.close()
     cf.close()
+    l_runtime.close()
 
-    # write run cfg - make sure not to overwrite an existing one
-    if not os.path.isfile(sim_conf.get("runconfiguration")):
-        l_config.writeRunCfg()
-    else:
-        print("There exists a run cfg at {}! Refusing to overwrite it!".format(
-            os.path.isfile(sim_conf.get("runconfiguration"))))
+    if l_runtime.routeCache is not None:
+        print("* " + l_runtime.routeCache.summary())
+
+    # write run cfg - a run store is finalized, an existing JSON run cfg is
+    # not overwritten
+    l_config.saveRunCfg()
 
     if sim_conf.get("resulttimestamped"): 
         sf = open(os.path.join(l_mainresultdir, l_resultdir, l_summaryfile), 'w')
@@ -0,0 +1,130 @@
+#!usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+from heapq import heappush, heappop
+from math import hypot
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    import itertools.izip as zip
+except ImportError:
+    pass
+
+
+class AStarRouter(object):
+
+    def __init__(self, successors, coordinates=None):
+        """
+        Goal directed point to point router for networks where an all pairs
+        table does not fit into memory. Every query is an A* search with the
+        Euclidean distance to the destination as heuristic.
+
+        SUMO lane lengths are shorter than the distance between the junction
+        centres, so the straight line distance is scaled with the smallest
+        ratio of edge length to junction distance over all edges. That keeps
+        the heuristic admissible and consistent, the returned paths are
+        shortest paths (ties may be resolved differently than by Dijkstra).
+
+        Args:
+            successors (list): for every node a list of (node, weight) pairs
+            coordinates (list): (x, y) of every node, without coordinates the
+                search degrades to Dijkstra
+        """
+        self.successors = successors
+        self.coordinates = coordinates
+        self.scale = 0.0
+        if coordinates is not None:
+            ratios = [weight / hypot(coordinates[u][0] - coordinates[v][0],
+                                     coordinates[u][1] - coordinates[v][1])
+                      for u, succ in enumerate(successors)
+                      for v, weight in succ
+                      if coordinates[u] != coordinates[v]]
+            # shrink a little so rounding can't make the heuristic overestimate
+            self.scale = min(ratios) * (1 - 1e-9) if ratios else 0.0
+        # number of nodes settled by the last query
+        self.settled = 0
+
+    @classmethod
+    def from_matrix(cls, graph, coordinates=None, adjacency=None):
+        """ Create a router from a weighted adjacency matrix.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            coordinates (list): (x, y) of every node
+            adjacency (list): optional precomputed neighbor lists
+
+        Returns:
+            AStarRouter: router for the graph
+        """
+        if adjacency is None:
+            adjacency = [[v for v, w in enumerate(row) if w] for row in graph]
+        successors = [[(v, graph[u][v]) for v in succ]
+                      for u, succ in enumerate(adjacency)]
+        return cls(successors, coordinates)
+
+    def _heuristic(self, destination):
+        """ Lower bound of the remaining distance to destination """
+        if not self.scale:
+            return lambda node: 0.0
+        dest_x, dest_y = self.coordinates[destination]
+        scale = self.scale
+        coordinates = self.coordinates
+        return lambda node: scale * hypot(coordinates[node][0] - dest_x,
+                                          coordinates[node][1] - dest_y)
+
+    def _search(self, origin, destination):
+        """ A* search, returns distance and predecessor dict """
+        heuristic = self._heuristic(destination)
+        distance = {origin: 0}
+        previous = {origin: -1}
+        closed = set()
+        heap = [(heuristic(origin), 0, origin)]
+        while heap:
+            dummy, dist, node = heappop(heap)
+            if node in closed or dist != distance[node]:
+                continue
+            closed.add(node)
+            if node == destination:
+                break
+            for succ, weight in self.successors[node]:
+                new = dist + weight
+                if succ not in closed and new < distance.get(succ, new + 1):
+                    distance[succ] = new
+                    previous[succ] = node
+                    heappush(heap, (new + heuristic(succ), new, succ))
+        self.settled = len(closed)
+        return distance, previous
+
+    def distance(self, origin, destination):
+        """ Length of the shortest path, inf if there is none """
+        return self._search(origin, destination)[0].get(destination,
+                                                         float("inf"))
+
+    def path(self, origin, destination):
+        """ Shortest path as list of node indices.
+
+        Args:
+            origin (int): start node
+            destination (int): end node
+
+        Returns:
+            list: nodes from origin to destination
+        """
+        dummy, previous = self._search(origin, destination)
+        if destination not in previous:
+            raise ValueError("No path from {} to {}".format(origin,
+                                                             destination))
+        sol = [destination]
+        while sol[-1] != origin:
+            sol.append(previous[sol[-1]])
+        return sol[::-1]
+
+    def paths(self, origins, destinations):
+        """ Shortest paths for pairs of origins and destinations """
+        return [self.path(o, d) for o, d in zip(origins, destinations)]
@@ -0,0 +1,336 @@
+#!usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import os
+from heapq import heapify, heappush, heappop
+
+import numpy
+
+from parking.common.shortestPaths import graph_digest
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    import itertools.izip as zip
+except ImportError:
+    pass
+
+
+class ContractionHierarchy(object):
+
+    # settled node limit of a witness search, a search that gives up early
+    # only adds a superfluous shortcut
+    witness_limit = 500
+
+    def __init__(self, rank, edges, key=None):
+        """
+        Contraction hierarchy for point to point queries on road networks
+        where neither the dense adjacency matrix nor an all pairs table fit
+        into memory. Nodes are contracted one after another in order of
+        importance, shortcuts keep the distances between the remaining nodes.
+        A query is a bidirectional Dijkstra that only relaxes edges towards
+        more important nodes and settles a small fraction of the nodes a
+        Dijkstra or A* search settles.
+
+        Path lengths equal Dijkstra's, ties among equally long paths may be
+        resolved differently. Distances of paths made up of shortcuts are
+        summed in a different order and may differ in the last bits.
+
+        Args:
+            rank (list): contraction order of every node
+            edges (dict): (tail, head) -> (weight, middle) of all original
+                edges and shortcuts, middle is the contracted node a shortcut
+                bypasses or -1 for original edges
+            key (str): digest of the graph the hierarchy was built for
+        """
+        self.rank = rank
+        self.edges = edges
+        self.key = key
+        num_nodes = len(rank)
+        # upward graph for the forward search, reversed downward graph for
+        # the backward search
+        self.up = [[] for _ in xrange(num_nodes)]
+        self.down = [[] for _ in xrange(num_nodes)]
+        for (tail, head), (weight, dummy) in edges.items():
+            if rank[head] > rank[tail]:
+                self.up[tail].append((head, weight))
+            else:
+                self.down[head].append((tail, weight))
+        # number of nodes settled by the last query
+        self.settled = 0
+
+    @classmethod
+    def build(cls, successors, key=None):
+        """ Contract all nodes of a graph.
+
+        Args:
+            successors (list): for every node a list of (node, weight) pairs
+            key (str): digest stored with the hierarchy
+
+        Returns:
+            ContractionHierarchy: hierarchy for the graph
+        """
+        num_nodes = len(successors)
+        out = [{} for _ in xrange(num_nodes)]
+        inn = [{} for _ in xrange(num_nodes)]
+        edges = {}
+        for tail, succ in enumerate(successors):
+            for head, weight in succ:
+                if head == tail:
+                    continue
+                if weight < out[tail].get(head, float("inf")):
+                    out[tail][head] = weight
+                    inn[head][tail] = weight
+                    edges[(tail, head)] = (weight, -1)
+
+        deleted_neighbours = [0] * num_nodes
+        level = [0] * num_nodes
+
+        def shortcuts(node):
+            """ Shortcuts needed to contract node """
+            needed = []
+            for tail, w_in in inn[node].items():
+                targets = dict((head, w_in + w_out)
+                               for head, w_out in out[node].items()
+                               if head != tail)
+                if not targets:
+                    continue
+                witness = cls._witness(out, tail, node, targets,
+                                       max(targets.values()))
+                for head, weight in targets.items():
+                    if witness.get(head, float("inf")) > weight:
+                        needed.append((tail, head, weight))
+            return needed
+
+        def priority(node):
+            # edge difference, spread evenly over the network and keep the
+            # hierarchy flat
+            return 2 * (len(shortcuts(node)) - len(inn[node]) -
+                        len(out[node])) + deleted_neighbours[node] + \
+                level[node]
+
+        heap = [(priority(node), node) for node in xrange(num_nodes)]
+        heapify(heap)
+        rank = [0] * num_nodes
+        order = 0
+        while heap:
+            dummy, node = heappop(heap)
+            # lazy update, contract only if still the least important node
+            current = priority(node)
+            if heap and current > heap[0][0]:
+                heappush(heap, (current, node))
+                continue
+            for tail, head, weight in shortcuts(node):
+                if weight < out[tail].get(head, float("inf")):
+                    out[tail][head] = weight
+                    inn[head][tail] = weight
+                    edges[(tail, head)] = (weight, node)
+            for neighbour in set(inn[node]) | set(out[node]):
+                deleted_neighbours[neighbour] += 1
+                level[neighbour] = max(level[neighbour], level[node] + 1)
+                out[neighbour].pop(node, None)
+                inn[neighbour].pop(node, None)
+            rank[node] = order
+            order += 1
+        return cls(rank, edges, key)
+
+    @staticmethod
+    def _witness(out, source, excluded, targets, limit):
+        """ Dijkstra from source in the remaining graph without excluded,
+        bounded by the longest shortcut candidate """
+        distance = {source: 0}
+        heap = [(0, source)]
+        remaining = set(targets)
+        settled = 0
+        while heap and remaining and \
+                settled < ContractionHierarchy.witness_limit:
+            dist, node = heappop(heap)
+            if dist > distance[node]:
+                continue
+            if dist > limit:
+                break
+            settled += 1
+            remaining.discard(node)
+            for succ, weight in out[node].items():
+                if succ == excluded:
+                    continue
+                new = dist + weight
+                if new < distance.get(succ, float("inf")):
+                    distance[succ] = new
+                    heappush(heap, (new, succ))
+        return distance
+
+    @classmethod
+    def from_matrix(cls, graph, adjacency=None):
+        """ Build the hierarchy for a weighted adjacency matrix.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            adjacency (list): optional precomputed neighbor lists
+
+        Returns:
+            ContractionHierarchy: hierarchy for the graph
+        """
+        if adjacency is None:
+            adjacency = [[v for v, w in enumerate(row) if w] for row in graph]
+        successors = [[(v, graph[u][v]) for v in succ]
+                      for u, succ in enumerate(adjacency)]
+        return cls.build(successors, graph_digest(graph))
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a hierarchy written by :meth:`save`.
+
+        Args:
+            filename (str): path of the .npz file
+
+        Returns:
+            ContractionHierarchy: the loaded hierarchy
+        """
+        with numpy.load(filename) as data:
+            edges = dict(((tail, head), (weight, middle))
+                         for tail, head, weight, middle in zip(
+                             data["tails"].tolist(), data["heads"].tolist(),
+                             data["weights"].tolist(),
+                             data["middles"].tolist()))
+            return cls(data["rank"].tolist(), edges, str(data["key"]))
+
+    @classmethod
+    def cached(cls, graph, filename, adjacency=None):
+        """ Load the hierarchy from filename if it was built for graph,
+        otherwise build it and store it there.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            filename (str): path of the .npz file
+            adjacency (list): optional precomputed neighbor lists
+
+        Returns:
+            ContractionHierarchy: hierarchy for the graph
+        """
+        key = graph_digest(graph)
+        if os.path.isfile(filename):
+            hierarchy = cls.load(filename)
+            if hierarchy.key == key:
+                return hierarchy
+        hierarchy = cls.from_matrix(graph, adjacency)
+        hierarchy.save(filename)
+        return hierarchy
+
+    def save(self, filename):
+        """ Store the hierarchy as compressed .npz file, atomically replacing
+        an existing one.
+
+        Args:
+            filename (str): path of the .npz file
+        """
+        keys = list(self.edges)
+        tmp = "{}.{}.tmp".format(filename, os.getpid())
+        with open(tmp, 'wb') as fp:
+            numpy.savez_compressed(
+                fp,
+                key=numpy.array(self.key),
+                rank=numpy.array(self.rank, dtype=numpy.int32),
+                tails=numpy.array([t for t, h in keys], dtype=numpy.int32),
+                heads=numpy.array([h for t, h in keys], dtype=numpy.int32),
+                weights=numpy.array([self.edges[k][0] for k in keys],
+                                    dtype=numpy.float64),
+                middles=numpy.array([self.edges[k][1] for k in keys],
+                                    dtype=numpy.int32))
+        os.rename(tmp, filename)
+
+    def _query(self, origin, destination):
+        """ Bidirectional upward search, returns distance, meeting node and
+        the predecessor dicts of both directions """
+        if origin == destination:
+            return 0, origin, {origin: -1}, {origin: -1}
+        dist = ({origin: 0}, {destination: 0})
+        previous = ({origin: -1}, {destination: -1})
+        heaps = ([(0, origin)], [(0, destination)])
+        graphs = (self.up, self.down)
+        done = (set(), set())
+        best = float("inf")
+        meeting = -1
+        while heaps[0] or heaps[1]:
+            # alternate, always advancing the direction with the closer node
+            if not heaps[1] or (heaps[0] and heaps[0][0][0] <= heaps[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            distance, node = heappop(heaps[side])
+            if distance >= best:
+                # nothing on this side can improve the best path anymore
+                del heaps[side][:]
+                continue
+            if node in done[side] or distance > dist[side][node]:
+                continue
+            done[side].add(node)
+            other = dist[1 - side].get(node)
+            if other is not None and distance + other < best:
+                best = distance + other
+                meeting = node
+            # stall on demand: a more important node reaches this one on a
+            # shorter downward edge, so it is not on a shortest up path
+            if any(distance > dist[side].get(higher, distance) + weight
+                   for higher, weight in graphs[1 - side][node]):
+                continue
+            for succ, weight in graphs[side][node]:
+                new = distance + weight
+                if new < dist[side].get(succ, float("inf")):
+                    dist[side][succ] = new
+                    previous[side][succ] = node
+                    heappush(heaps[side], (new, succ))
+        self.settled = len(done[0]) + len(done[1])
+        return best, meeting, previous[0], previous[1]
+
+    def _unpack(self, tail, head):
+        """ Original nodes of an edge or shortcut, without the tail """
+        sol = []
+        stack = [(tail, head)]
+        while stack:
+            tail, head = stack.pop()
+            middle = self.edges[(tail, head)][1]
+            if middle < 0:
+                sol.append(head)
+            else:
+                stack.append((middle, head))
+                stack.append((tail, middle))
+        return sol
+
+    def distance(self, origin, destination):
+        """ Length of the shortest path, inf if there is none """
+        return self._query(origin, destination)[0]
+
+    def path(self, origin, destination):
+        """ Shortest path as list of node indices.
+
+        Args:
+            origin (int): start node
+            destination (int): end node
+
+        Returns:
+            list: nodes from origin to destination
+        """
+        dummy, meeting, forward, backward = self._query(origin, destination)
+        if meeting < 0:
+            raise ValueError("No path from {} to {}".format(origin,
+                                                             destination))
+        hops = [meeting]
+        while forward[hops[-1]] >= 0:
+            hops.append(forward[hops[-1]])
+        hops.reverse()
+        while backward[hops[-1]] >= 0:
+            hops.append(backward[hops[-1]])
+        sol = [origin]
+        for tail, head in zip(hops, hops[1:]):
+            sol.extend(self._unpack(tail, head))
+        return sol
+
+    def paths(self, origins, destinations):
+        """ Shortest paths for pairs of origins and destinations """
+        return [self.path(o, d) for o, d in zip(origins, destinations)]
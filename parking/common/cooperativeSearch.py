@@ -2,8 +2,12 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
+import time
+from heapq import heappush, heappop
 from sys import maxsize  # faster like this then like sys.maxsize 40ns vs 17ns
 
+from parking.common.enum import Enum
+
 try:
     xrange
 except NameError:
@@ -15,6 +19,20 @@ except ImportError:
     pass
 
 
+# When HeapCooperativeSearch.shortest() may stop expanding:
+#   FULL - every agent settles every reachable node (reference behaviour)
+#   ALL_DESTINATIONS - all agents keep expanding until every agent has settled
+#       its destination, paths to the destinations are identical to FULL
+#   OWN_DESTINATION - an agent stops as soon as its own destination is
+#       settled, the remaining agents continue in the same round robin order
+#       without its penalties (identical to FULL only for penalty 0)
+termination = Enum(
+    ["FULL",
+     "ALL_DESTINATIONS",
+     "OWN_DESTINATION"]
+)
+
+
 class CooperativeSearch(object):
 
     def __init__(self, graph, agents, penalty=0.2):
@@ -43,6 +61,8 @@ class CooperativeSearch(object):
 
         # history necessary for drivers to know which nodes they have increased
         self.history = []
+        # the same history as overlay, see _remember
+        self.own_penalties = []
 
         # prepare necessary containers
         for dummy in xrange(len(self.agents)):
@@ -50,6 +70,7 @@ class CooperativeSearch(object):
             self.path_lst.append([])
             self.bool_lst.append([])
             self.history.append([])
+            self.own_penalties.append({})
 
         # prepare the output_list and bool_list starting conditions
         for agent in xrange(len(self.agents)):
@@ -116,6 +137,11 @@ class CooperativeSearch(object):
         and increases the cost of nodes that were checked i.e. modifies the
         dynamic adjacency matrix. It is derived from Dijkstra's shortest path
         algorithm.
+
+        An agent does not see its own penalties. Instead of copying the
+        dynamic matrix and subtracting the agent's history, the weights of
+        the settled row are corrected on the fly with the agent's penalty
+        overlay (see :meth:`_remember`).
         """
         # TODO one loop could be added to add additional corrections of choosen
         # paths hence one could optimize that loop locally
@@ -125,41 +151,60 @@ class CooperativeSearch(object):
         path = self.path_lst[car_index]
         min_index = self._neighbors(output, bool_list)
         bool_list[min_index] = True
+        if output[min_index] == maxsize:
+            return
 
-        # Modify dynamic driver graph with the knowledge of which edges has the
-        # driver penalized before i.e. revealing the 'real' cost of and edge
-        driver_graph = [x[:] for x in self.dynamic_graph]
-        history = self.history[car_index]
-        for position in history:
-            driver_graph[position[0]][position[1]] -= \
-                self.graph[position[0]][position[1]] * self.penalty
-
+        row = self.dynamic_graph[min_index]
+        own = self.own_penalties[car_index].get(min_index)
         temp_l = []
         for node in xrange(len(self.graph)):
-            if ((not bool_list[node]) \
-                and driver_graph[min_index][node] \
-                and output[min_index] != maxsize \
-                and output[min_index] + driver_graph[min_index][node] <
-                output[node]):
-                    output[node] = (output[min_index] +
-                                    driver_graph[min_index][node])
-                    path[node] = min_index
-                    temp_l.append(node)
+            if bool_list[node] or not row[node]:
+                continue
+            weight = row[node]
+            if own and node in own:
+                weight = self._driver_weight(min_index, node, weight,
+                                             own[node])
+            if weight and output[min_index] + weight < output[node]:
+                output[node] = output[min_index] + weight
+                path[node] = min_index
+                temp_l.append(node)
 
         if temp_l:
-            # Get min cost node that would be traversed
-            _, temp = min(((output[x], x) for x in temp_l),
-                          key=lambda p: p[0])
-
-            # Penalize both directions
-            self.dynamic_graph[min_index][temp] += \
-                self.graph[min_index][temp] * self.penalty
+            self._penalize_cheapest(car_index, min_index, temp_l)
+
+    def _driver_weight(self, from_node, to_node, weight, count):
+        """ Remove an agent's own penalties (count times) from a dynamic edge
+        weight, one subtraction per penalty as on the copied matrix. """
+        own_penalty = self.graph[from_node][to_node] * self.penalty
+        for dummy in xrange(count):
+            weight -= own_penalty
+        return weight
+
+    def _penalize_cheapest(self, car_index, min_index, temp_l):
+        """ Penalize the edge to the relaxed node with minimal cost in both
+        directions and remember it for the agent. """
+        output = self.output_lst[car_index]
+        # Get min cost node that would be traversed
+        _, temp = min(((output[x], x) for x in temp_l),
+                      key=lambda p: p[0])
+
+        # Penalize both directions (if the opposite direction exists)
+        self.dynamic_graph[min_index][temp] += \
+            self.graph[min_index][temp] * self.penalty
+        if self.graph[temp][min_index]:
             self.dynamic_graph[temp][min_index] += \
                 self.graph[temp][min_index] * self.penalty
 
-            # Add memory to car in both direction
-            history.append((min_index, temp))
-            history.append((temp, min_index))
+        # Add memory to car in both direction
+        self._remember(car_index, min_index, temp)
+        self._remember(car_index, temp, min_index)
+
+    def _remember(self, car_index, from_node, to_node):
+        """ Add an edge penalized by an agent to its history and to its
+        penalty overlay, a per agent mapping from_node -> {to_node: count}. """
+        self.history[car_index].append((from_node, to_node))
+        own = self.own_penalties[car_index].setdefault(from_node, {})
+        own[to_node] = own.get(to_node, 0) + 1
 
     def _neighbors(self, output, bool_list):
         """
@@ -207,14 +252,258 @@ class CooperativeSearch(object):
         return paths
 
 
-class CoopSearchHillOptimized(CooperativeSearch):
+def adjacency_lists(graph):
+    """ Convert a weighted adjacency matrix into sorted neighbor lists.
+
+    Args:
+        graph (2d list): weighted adjacency matrix, 0 means no edge
 
-    def __init__(self, graph, agents, destinations, penalty):
-        super(CoopSearchHillOptimized, self).__init__(graph, agents, penalty)
+    Returns:
+        list: for every node a list of indices of its successors
+    """
+    return [[node for node, weight in enumerate(row) if weight]
+            for row in graph]
+
+
+class HeapCooperativeSearch(CooperativeSearch):
+
+    def __init__(self, graph, agents, penalty=0.2, adjacency=None,
+                 destinations=None, stop=termination.FULL):
+        """
+        Cooperative search on a sparse view of the graph. Every agent keeps a
+        binary heap of tentative distances and only the neighbors of a
+        settled node are relaxed, so a settle costs O(deg * log(N)) instead of
+        two O(N) scans. Results (distances, predecessors and the penalized
+        dynamic graph) are identical to :class:`CooperativeSearch`.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            agents (int list): Starting positions of agents
+            penalty (float): How many times to increase the cost of traversing
+                the edge for other agents.
+            adjacency (list): optional precomputed :func:`adjacency_lists` of
+                graph, pass it when searching the same graph repeatedly
+            destinations (int list): destination of every agent, required
+                unless stop is termination.FULL
+            stop (int): one of :data:`termination`
+        """
+        self.graph = graph
+        self.agents = agents
+        self.penalty = penalty
         self.destinations = destinations
+        self.stop = stop
+        num_nodes = len(self.graph)
+        for agent in self.agents:
+            assert agent < num_nodes, \
+                "Starting position of a car can not be outside of the graph"
+        assert stop == termination.FULL or \
+            (destinations is not None and len(destinations) == len(agents)), \
+            "Early termination requires a destination for every agent"
+        if adjacency is None:
+            adjacency = adjacency_lists(self.graph)
+        self.adjacency = adjacency
+        # only existing edges are stored, penalties never create new ones
+        self.dynamic_graph = [dict((node, row[node]) for node in succ)
+                              for row, succ in zip(self.graph, self.adjacency)]
+        self.output_lst = []
+        self.path_lst = []
+        self.bool_lst = []
+        self.history = []
+        self.own_penalties = []
+        self.heaps = []
+        for agent in self.agents:
+            output = [maxsize] * num_nodes
+            path = ["entry"] * num_nodes
+            output[agent] = 0
+            path[agent] = "start"
+            self.output_lst.append(output)
+            self.path_lst.append(path)
+            self.bool_lst.append([False] * num_nodes)
+            self.history.append([])
+            self.own_penalties.append({})
+            # ties are broken towards the highest node index like the linear
+            # scan in CooperativeSearch._neighbors does
+            self.heaps.append([(0, -agent)])
+
+    def shortest(self):
+        """
+        Calculate cooperational paths for multiple users. Agents settle one
+        node per round in the same order as :meth:`CooperativeSearch.shortest`,
+        agents without reachable unsettled nodes drop out early. Depending on
+        :attr:`stop` the search ends before all nodes are settled, see
+        :data:`termination`.
+
+        Returns:
+            self
+        """
+        len_to_check = len(self.graph) - 1
+        active = list(xrange(len(self.agents)))
+        # agents that still have to settle their destination
+        pending = [] if self.stop == termination.FULL else active[:]
+        while len_to_check != 0 and active:
+            for car in active:
+                self._inner(car)
+            active = [car for car in active if not self._exhausted(car)]
+            len_to_check -= 1
+            if pending:
+                pending = [car for car in pending if not self._exhausted(car)
+                           and not self.bool_lst[car][self.destinations[car]]]
+                if not pending:
+                    break
+                if self.stop == termination.OWN_DESTINATION:
+                    active = [car for car in active if car in pending]
+        return self
+
+    @property
+    def settled(self):
+        """ Number of settled nodes summed over all agents """
+        return sum(sum(visited) for visited in self.bool_lst)
+
+    def _exhausted(self, car_index):
+        """ Check if an agent has no reachable unsettled node left """
+        return not self.heaps[car_index]
+
+    def _inner(self, car_index):
+        """
+        Settle the closest node of one agent, relax its outgoing edges and
+        penalize the relaxed edges in the dynamic graph.
+        """
+        heap = self.heaps[car_index]
+        output = self.output_lst[car_index]
+        bool_list = self.bool_lst[car_index]
+        path = self.path_lst[car_index]
+        # skip stale heap entries left over from earlier relaxations
+        while heap:
+            dist, min_index = heappop(heap)
+            min_index = -min_index
+            if not bool_list[min_index] and dist == output[min_index]:
+                break
+        else:
+            return
+        bool_list[min_index] = True
+
+        row = self.dynamic_graph[min_index]
+        relaxed = []
+        for node in self.adjacency[min_index]:
+            if not bool_list[node] and dist + row[node] < output[node]:
+                output[node] = dist + row[node]
+                path[node] = min_index
+                heappush(heap, (output[node], -node))
+                relaxed.append(node)
+
+        if relaxed and self.penalty:
+            self._penalize(min_index, relaxed)
+
+    def _penalize(self, min_index, relaxed):
+        """
+        Apply the penalty increments of :meth:`CooperativeSearch._inner`.
+
+        The reference implementation increments the last relaxed node once for
+        every matrix column it scans until the next relaxation (and never
+        increments node 0, which is falsy). The same number of additions is
+        repeated here so the floating point values match exactly.
+        """
+        graph = self.graph
+        dynamic_from = self.dynamic_graph[min_index]
+        bounds = relaxed[1:] + [len(graph)]
+        for temp, end in zip(relaxed, bounds):
+            if not temp:
+                continue
+            forward = graph[min_index][temp] * self.penalty
+            backward = graph[temp][min_index] * self.penalty
+            dynamic_to = self.dynamic_graph[temp]
+            for dummy in xrange(end - temp):
+                dynamic_from[temp] += forward
+                if backward:
+                    dynamic_to[min_index] += backward
 
-    def optimized(self):
-        from parking.common.hill_climb import hill
+    def dijkstra_inner(self, car_index):
+        """
+        Sparse :meth:`CooperativeSearch.dijkstra_inner`: only the neighbors
+        of the settled node are relaxed with weights corrected by the agent's
+        penalty overlay, no matrix is copied.
+        """
+        heap = self.heaps[car_index]
+        output = self.output_lst[car_index]
+        bool_list = self.bool_lst[car_index]
+        path = self.path_lst[car_index]
+        while heap:
+            dist, min_index = heappop(heap)
+            min_index = -min_index
+            if not bool_list[min_index] and dist == output[min_index]:
+                break
+        else:
+            return
+        bool_list[min_index] = True
+
+        row = self.dynamic_graph[min_index]
+        own = self.own_penalties[car_index].get(min_index)
+        temp_l = []
+        for node in self.adjacency[min_index]:
+            if bool_list[node]:
+                continue
+            weight = row[node]
+            if own and node in own:
+                weight = self._driver_weight(min_index, node, weight,
+                                             own[node])
+            if weight and dist + weight < output[node]:
+                output[node] = dist + weight
+                path[node] = min_index
+                heappush(heap, (output[node], -node))
+                temp_l.append(node)
+
+        if temp_l:
+            self._penalize_cheapest(car_index, min_index, temp_l)
+
+
+class HistoryCooperativeSearch(HeapCooperativeSearch):
+    """ Heap based cooperative search where agents ignore their own penalties,
+    i.e. :meth:`shortest` settles nodes with :meth:`dijkstra_inner`. """
+
+    def _inner(self, car_index):
+        self.dijkstra_inner(car_index)
+
+
+class HillOptimized(object):
+
+    def __init__(self, graph, agents, destinations, penalty, adjacency=None,
+                 stop=termination.ALL_DESTINATIONS):
+        """
+        Mixin that optimizes the routes of a cooperative search backend
+        (:class:`HeapCooperativeSearch` or one of its subclasses) with
+        :func:`parking.common.hill_climb.hill`.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            agents (int list): Starting positions of agents
+            destinations (int list): Destinations of agents
+            penalty (float): Penalty of the cooperative search
+            adjacency (list): optional precomputed :func:`adjacency_lists`
+            stop (int): one of :data:`termination`
+        """
+        super(HillOptimized, self).__init__(graph, agents, penalty,
+                                            adjacency, destinations, stop)
+
+    def optimized(self, rng=None, table=None, iterations=1000, budget=None):
+        """ Hill climbing optimized routes, shortest() must be called first.
+
+        Anytime: the climb stops after iterations moves, budget seconds or at
+        a plateau and returns the best routes found so far. Its convergence
+        is recorded in ``self.telemetry``, see
+        :class:`parking.common.hill_climb.Telemetry`.
+
+        Args:
+            rng (random.Random): optional random number generator of the hill
+                climbing, the global one by default
+            table (ShortestPathTable): optional static shortest paths of the
+                graph the hill climbing reconnects moved nodes with
+            iterations (int): maximal number of moves
+            budget (float): optional wall clock budget in seconds
+
+        Returns:
+            list: node paths of all agents
+        """
+        from parking.common.hill_climb import Telemetry, hill
         # this thing with dest[ind] works when you pass dest as an argument
         # i.e. CoopSearchHillOptimized(graph_ort, cars, dest, 0.2).optimized()
         # now that is crazy
@@ -226,7 +515,14 @@ class CoopSearchHillOptimized(CooperativeSearch):
                           self.path_lst,
                           self.destinations,
                           self.agents))
-        return hill(routes, self.graph)
+        self.telemetry = Telemetry()
+        deadline = None if budget is None else time.time() + budget
+        return hill(routes, self.graph, self.adjacency, rng, table,
+                    iterations, deadline, self.telemetry)
+
+
+class CoopSearchHillOptimized(HillOptimized, HeapCooperativeSearch):
+    """ Heap based cooperative search followed by hill climbing """
 
 
 if __name__ == "__main__":
@@ -3,8 +3,11 @@
 
 from __future__ import print_function
 
+import math
+import random
+import time
+from collections import defaultdict
 from itertools import chain
-from random import randint, choice
 
 try:
     xrange
@@ -17,7 +20,8 @@ except ImportError:
     pass
 
 from parking.common.cooperativeSearch import CooperativeSearch
-reconstruct_path = CooperativeSearch.reconstruct_path
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.shortestPaths import LazyShortestPathTable
 
 
 def count_overlap(driver_matrix):
@@ -54,7 +58,209 @@ def total_cost(driver_matrix):
     return count_overlap(driver_matrix) + num_of_visited_nodes(driver_matrix)
 
 
-def hill(driver_matrix, adjacency_matrix):
+class RouteCost(object):
+
+    def __init__(self, driver_matrix):
+        """ Incrementally maintained :func:`total_cost` of a set of paths.
+
+        Every traversal of an edge (a, b) is counted as (a, b) and (b, a) like
+        the forward and backward edges of :func:`count_overlap`, so the
+        overlap is the number of counted edges minus the number of distinct
+        ones. Replacing a path updates the counts in O(path length).
+
+        Args:
+            driver_matrix (list of lists): paths of all drivers, copied
+        """
+        self.paths = [list(path) for path in driver_matrix]
+        self.multiplicity = defaultdict(int)
+        self.edge_count = 0
+        self.distinct = 0
+        self.nodes = 0
+        for path in self.paths:
+            self._add(path)
+
+    def _add(self, path):
+        multiplicity = self.multiplicity
+        for a, b in zip(path, path[1:]):
+            for edge in ((a, b), (b, a)):
+                if not multiplicity[edge]:
+                    self.distinct += 1
+                multiplicity[edge] += 1
+        self.edge_count += 2 * max(len(path) - 1, 0)
+        self.nodes += len(path)
+
+    def _remove(self, path):
+        multiplicity = self.multiplicity
+        for a, b in zip(path, path[1:]):
+            for edge in ((a, b), (b, a)):
+                multiplicity[edge] -= 1
+                if not multiplicity[edge]:
+                    self.distinct -= 1
+                    del multiplicity[edge]
+        self.edge_count -= 2 * max(len(path) - 1, 0)
+        self.nodes -= len(path)
+
+    @property
+    def overlap(self):
+        """ Same as :func:`count_overlap` of the current paths """
+        return self.edge_count - self.distinct
+
+    @property
+    def cost(self):
+        """ Same as :func:`total_cost` of the current paths """
+        return self.overlap + self.nodes
+
+    def replace(self, index, path):
+        """ Replace the path of a driver.
+
+        Args:
+            index (int): driver index
+            path (list): new path
+
+        Returns:
+            list: the previous path, replace it back to undo
+        """
+        old = self.paths[index]
+        self._remove(old)
+        self._add(path)
+        self.paths[index] = path
+        return old
+
+
+class Telemetry(object):
+
+    def __init__(self):
+        """ Convergence record of an optimizer run: the cost and the elapsed
+        time after every iteration and the number of accepted, rejected and
+        impossible moves. """
+        self.costs = []
+        self.times = []
+        self.accepted = 0
+        self.rejected = 0
+        self.infeasible = 0
+        self.initial_cost = None
+        self.best_cost = None
+        self.elapsed = 0.0
+        self._start = None
+
+    def start(self, cost):
+        """ Begin recording from the initial cost """
+        self._start = time.time()
+        self.initial_cost = self.best_cost = cost
+
+    def record(self, cost, accepted):
+        """ Record an iteration.
+
+        Args:
+            cost (int): cost after the iteration
+            accepted (bool): whether the move was accepted, None if no move
+                was possible
+        """
+        self.elapsed = time.time() - self._start
+        self.costs.append(cost)
+        self.times.append(self.elapsed)
+        self.best_cost = min(self.best_cost, cost)
+        if accepted is None:
+            self.infeasible += 1
+        elif accepted:
+            self.accepted += 1
+        else:
+            self.rejected += 1
+
+    @property
+    def iterations(self):
+        return len(self.costs)
+
+    def summary(self):
+        """ One line description for logs """
+        return ("{} iterations ({} accepted, {} rejected, {} infeasible), "
+                "cost {} -> {} in {:.1f} ms".format(
+                    self.iterations, self.accepted, self.rejected,
+                    self.infeasible, self.initial_cost, self.best_cost,
+                    self.elapsed * 1000))
+
+
+def propose_move(state, feasible_ind, adjacency, table, rng):
+    """ Random move of a node of a driver path to one of its neighbors, the
+    path is reconnected with static shortest paths.
+
+    Args:
+        state (RouteCost): current paths
+        feasible_ind (list): indices of the drivers whose paths can change
+        adjacency (list of lists): neighbor lists of the graph
+        table (ShortestPathTable): static shortest paths of the graph
+        rng (random.Random): random number generator
+
+    Returns:
+        tuple: driver index and new path, None if the move is not possible
+    """
+    d = rng.choice(feasible_ind)  # pick a random driver path index
+    # do not use paths that are to small i.e. smaller than 4
+    path = state.paths[d]
+    # pick a random node excluding first and the last (start and end)
+    path_end = len(path) - 1
+    node_ind = rng.randint(1, path_end - 1)
+    node = path[node_ind]
+    path_neighbors = (path[node_ind - 1], path[node_ind + 1])
+    # chose where to move (you can not move into neighbors already in path)
+    move_to = [x for x in adjacency[node] if x not in path_neighbors]
+    if not move_to:
+        # you are in the corner, so no change just return
+        return None
+    move_to = rng.choice(move_to)
+    # get the shortest route to connecting nodes
+    if node_ind == 1:
+        left_ind = 0
+    else:
+        left_ind = node_ind - 2
+
+    if node_ind == path_end - 1:
+        righ_ind = path_end
+    else:
+        righ_ind = node_ind + 2
+
+    left = path[left_ind]
+    right = path[righ_ind]
+
+    # the static shortest paths, i.e. those of a search without penalty
+    left_path = table.path(left, move_to)
+    try:
+        right_path = table.path(move_to, right)
+    except ValueError:
+        # one way streets, no way back from move_to
+        return None
+
+    new_path = path[:left_ind] + left_path + right_path[1:-1] + path[righ_ind:]
+
+    # TODO: some stupid cases where edge gets duplicated discard such
+    # cases... in this situation 2 cases should be checked: left path
+    # routed without the node that got repeated twice right path router
+    # without the node that got repeated twice and then better option
+    # should be chosen in any case cycles are out of question here
+    if len(new_path) - len(set(new_path)):
+        # TODO: improve this case because there might be some benefitical
+        # cases here to avoid local optima catch
+        return None
+    return d, new_path
+
+
+def _prepare(driver_matrix, adjacency_matrix, adjacency, rng, table):
+    """ Common arguments of the optimizers, None if nothing can change """
+    feasible_ind = [x[0] for x in enumerate(driver_matrix) if len(x[1]) > 3]
+    # too short, no need to optimize
+    if not feasible_ind:
+        return None
+    if adjacency is None:
+        adjacency = adjacency_lists(adjacency_matrix)
+    if rng is None:
+        rng = random
+    if table is None:
+        table = LazyShortestPathTable(adjacency_matrix, adjacency)
+    return feasible_ind, adjacency, rng, table
+
+
+def hill(driver_matrix, adjacency_matrix, adjacency=None, rng=None,
+         table=None, iterations=1000, deadline=None, telemetry=None):
     """ A hill based optimizer for routes.
 
     Note:
@@ -68,84 +274,170 @@ def hill(driver_matrix, adjacency_matrix):
         adjacency_matrix (list of lists): Adjacency matrix of an underlying
             graph.
 
+        adjacency (list of lists): Optional neighbor lists of the graph, see
+            :func:`parking.common.cooperativeSearch.adjacency_lists`.
+
+        rng (random.Random): Optional random number generator, the global one
+            of the random module by default.
+
+        table (ShortestPathTable): Optional static shortest paths of the
+            graph used to reconnect moved nodes, rows are computed on demand
+            by default.
+
+        iterations (int): Maximal number of moves to try.
+
+        deadline (float): Optional time.time() to stop at, the routes are
+            the best found so far.
+
+        telemetry (Telemetry): Optional record of the iterations.
+
     Returns:
         list: Optimized list of routes.
     """
     # TODO normalize cost
-    # TODO: make all this into a class
-    costs = [total_cost(driver_matrix)]
-    feasible_ind = [x[0] for x in enumerate(driver_matrix) if len(x[1]) > 3]
-    # too short, no need to optimize
-    if not feasible_ind:
+    prepared = _prepare(driver_matrix, adjacency_matrix, adjacency, rng, table)
+    if prepared is None:
         return driver_matrix
+    feasible_ind, adjacency, rng, table = prepared
+    state = RouteCost(driver_matrix)
+    if telemetry is not None:
+        telemetry.start(state.cost)
+
+    # number of iterations without improvement, the cost only changes when a
+    # move is accepted
+    unchanged = 0
+    for i in xrange(iterations):
+        if deadline is not None and time.time() >= deadline:
+            break
+        move = propose_move(state, feasible_ind, adjacency, table, rng)
+        unchanged += 1
+        accepted = None
+        if move is not None:
+            # Check if cost is improved, undo the move if not
+            cost = state.cost
+            d, new_path = move
+            old_path = state.replace(d, new_path)
+            accepted = state.cost < cost
+            if accepted:
+                unchanged = 0
+            else:
+                state.replace(d, old_path)
+        if telemetry is not None:
+            telemetry.record(state.cost, accepted)
+        # Check if you can stop, i.e. the cost was the same for the last 100
+        # evaluations
+        if i >= 99 and unchanged >= 99:
+            break
+    return state.paths
+
+
+def anneal(driver_matrix, adjacency_matrix, adjacency=None, rng=None,
+           table=None, iterations=1000, deadline=None, temperature=0.5,
+           cooling=None, telemetry=None):
+    """ Simulated annealing variant of :func:`hill`. Moves that increase the
+    cost by delta are accepted with probability exp(-delta / T), T starts at
+    temperature and is multiplied by cooling after every move.
 
-    def hill_runner(driver_matrix, adjacency_matrix):
-        cost = total_cost(driver_matrix)
-        d = choice(feasible_ind)  # pick a random driver path index
-        # do not use paths that are to small i.e. smaller than 4
-        path = driver_matrix[d]
-        # pick a random node excluding first and the last (start and end)
-        path_end = len(path) - 1
-        node_ind = randint(1, path_end - 1)
-        node = path[node_ind]
-        path_neighbors = (path[node_ind - 1], path[node_ind + 1])
-        # chose where to move (you can not move into neighbors already in path)
-        neighbors = adjacency_matrix[node][:]
-        move_to = [x for x in enumerate(neighbors)
-                   if x[1] != 0 and x[0] not in path_neighbors]
-        if not move_to:
-            # you are in the corner, so no change just return
-            return driver_matrix
-        move_to = choice(move_to)[0]
-        # get the shortest route to connecting nodes
-        if node_ind == 1:
-            left_ind = 0
-        else:
-            left_ind = node_ind - 2
+    Args:
+        driver_matrix (list of lists): paths of all drivers
+        adjacency_matrix (list of lists): Adjacency matrix of the graph
+        adjacency (list of lists): Optional neighbor lists of the graph
+        rng (random.Random): Optional random number generator
+        table (ShortestPathTable): Optional static shortest paths
+        iterations (int): Number of moves to try
+        deadline (float): Optional time.time() to stop at
+        temperature (float): Initial temperature
+        cooling (float): Factor applied to the temperature after every move,
+            by default it falls to 1% of the initial one over the iterations
+        telemetry (Telemetry): Optional record of the iterations
 
-        if node_ind == path_end - 1:
-            righ_ind = path_end
-        else:
-            righ_ind = node_ind + 2
-
-        left = path[left_ind]
-        right = path[righ_ind]
-
-        left_route, righ_route = CooperativeSearch(adjacency_matrix,
-                                                   [left, move_to],
-                                                   0).shortest().path_lst
-
-        left_path = reconstruct_path(left_route, move_to, left)
-        right_path = reconstruct_path(righ_route, right, move_to)
-
-        new_path = path[:left_ind] + left_path + right_path[1:-1] + path[righ_ind:]
-
-        # TODO: some stupid cases where edge gets duplicated discard such
-        # cases... in this situation 2 cases should be checked: left path
-        # routed without the node that got repeated twice right path router
-        # without the node that got repeated twice and then better option
-        # should be chosen in any case cycles are out of question here
-        if len(new_path) - len(set(new_path)):
-            # TODO: improve this case because there might be some benefitical
-            # cases here to avoid local optima catch
-            return driver_matrix
-
-        # Check if cost is improved and modify the routes if yes
-        temp_matrix = [x[:] for x in driver_matrix]
-        temp_matrix[d] = new_path
-        new_cost = total_cost(temp_matrix)
-        if new_cost < cost:
-            return temp_matrix
+    Returns:
+        list: The best routes found.
+    """
+    prepared = _prepare(driver_matrix, adjacency_matrix, adjacency, rng, table)
+    if prepared is None:
         return driver_matrix
+    feasible_ind, adjacency, rng, table = prepared
+    if cooling is None:
+        cooling = 0.01 ** (1.0 / max(iterations, 1))
+    state = RouteCost(driver_matrix)
+    if telemetry is not None:
+        telemetry.start(state.cost)
+    best_cost = state.cost
+    best = list(state.paths)
+    for i in xrange(iterations):
+        if deadline is not None and time.time() >= deadline:
+            break
+        move = propose_move(state, feasible_ind, adjacency, table, rng)
+        accepted = None
+        if move is not None:
+            cost = state.cost
+            d, new_path = move
+            old_path = state.replace(d, new_path)
+            delta = state.cost - cost
+            accepted = delta <= 0 or \
+                rng.random() < math.exp(-delta / max(temperature, 1e-9))
+            if not accepted:
+                state.replace(d, old_path)
+            elif state.cost < best_cost:
+                best_cost = state.cost
+                best = list(state.paths)
+        if telemetry is not None:
+            telemetry.record(state.cost, accepted)
+        temperature *= cooling
+    return best
+
+
+# optimizers of multi_start by name
+OPTIMIZERS = {"hill": hill, "anneal": anneal}
+
+
+def _optimize_start(method, driver_matrix, adjacency_matrix, adjacency, table,
+                    seed, iterations, deadline):
+    """ One start of :func:`multi_start`, module level to be picklable """
+    if table is None:
+        table = LazyShortestPathTable(adjacency_matrix, adjacency)
+    return OPTIMIZERS[method](driver_matrix, adjacency_matrix, adjacency,
+                              random.Random(seed), table, iterations,
+                              deadline)
+
+
+def multi_start(driver_matrix, adjacency_matrix, adjacency=None, table=None,
+                starts=4, seed=0, method="hill", iterations=1000, budget=None,
+                executor=None):
+    """ Independent climbs (or annealing runs) from the same routes, each with
+    its own seeded random number generator; the best result under
+    :func:`total_cost` wins, ties go to the lower start index.
 
-    for i in xrange(1000):
-        driver_matrix = hill_runner(driver_matrix, adjacency_matrix)
-        costs.append(total_cost(driver_matrix))
-        # Check if you can stop
-        if len(costs) > 100 and len(set(costs[-100:])) == 1:
-            return driver_matrix
-    return driver_matrix
+    Args:
+        driver_matrix (list of lists): paths of all drivers
+        adjacency_matrix (list of lists): Adjacency matrix of the graph
+        adjacency (list of lists): Optional neighbor lists of the graph
+        table (ShortestPathTable): Optional static shortest paths
+        starts (int): Number of independent starts
+        seed (int): Seed of the stream the per start seeds are drawn from
+        method (str): "hill" or "anneal"
+        iterations (int): Iteration budget of every start
+        budget (float): Optional wall clock budget in seconds
+        executor (concurrent.futures.Executor): Optional pool running the
+            starts in parallel, otherwise they run one after another
 
+    Returns:
+        list: The best routes found.
+    """
+    if adjacency is None:
+        adjacency = adjacency_lists(adjacency_matrix)
+    streams = random.Random(seed)
+    seeds = [streams.getrandbits(64) for _ in xrange(starts)]
+    deadline = None if budget is None else time.time() + budget
+    args = [(method, driver_matrix, adjacency_matrix, adjacency, table, s,
+             iterations, deadline) for s in seeds]
+    if executor is None:
+        results = [_optimize_start(*a) for a in args]
+    else:
+        results = list(executor.map(_optimize_start, *zip(*args)))
+    costs = [total_cost(result) for result in results]
+    return results[costs.index(min(costs))]
 
 if __name__ == "__main__":
     graph_ort = [[0, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 0],
@@ -0,0 +1,207 @@
+#!usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import hashlib
+import os
+from sys import maxsize
+
+import numpy
+
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.cooperativeSearch import adjacency_lists
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    import itertools.izip as zip
+except ImportError:
+    pass
+
+
+def graph_digest(graph):
+    """ Hex digest identifying a weighted adjacency matrix.
+
+    Args:
+        graph (2d list): weighted adjacency matrix
+
+    Returns:
+        str: sha1 hex digest
+    """
+    digest = hashlib.sha1()
+    for row in graph:
+        digest.update(repr(list(row)).encode("ascii"))
+    return digest.hexdigest()
+
+
+def single_source(graph, origin, adjacency):
+    """ Distances and predecessors of a Dijkstra search from origin.
+
+    Args:
+        graph (2d list): weighted adjacency matrix
+        origin (int): start node
+        adjacency (list): neighbor lists of the graph
+
+    Returns:
+        tuple: distances (inf if unreachable) and predecessors (-1 for the
+            origin and unreachable nodes) of all nodes
+    """
+    search = HeapCooperativeSearch(graph, [origin], 0, adjacency)
+    search.shortest()
+    return ([float(d) if d != maxsize else float("inf")
+             for d in search.output_lst[0]],
+            [p if isinstance(p, int) else -1 for p in search.path_lst[0]])
+
+
+class ShortestPathTable(object):
+
+    def __init__(self, distances, predecessors, key=None):
+        """
+        All pairs shortest path table. For every origin it holds the distance
+        to and the previous node on the shortest path to every node, so a path
+        is reconstructed in O(path length) without any search.
+
+        The predecessors are those of a Dijkstra search from the origin (see
+        :func:`ShortestPathTable.build`), hence paths are exactly the ones
+        :class:`parking.common.cooperativeSearch.CooperativeSearch` finds with
+        penalty 0, ties included.
+
+        Args:
+            distances (2d list): distances[origin][node], inf if unreachable
+            predecessors (2d list): predecessors[origin][node], -1 for the
+                origin itself and for unreachable nodes
+            key (str): digest of the graph the table was built for
+        """
+        self.distances = distances
+        self.predecessors = predecessors
+        self.key = key
+
+    @classmethod
+    def build(cls, graph, adjacency=None):
+        """ Build the table with one single source search per node.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            adjacency (list): optional precomputed neighbor lists
+
+        Returns:
+            ShortestPathTable: table for the graph
+        """
+        if adjacency is None:
+            adjacency = adjacency_lists(graph)
+        rows = [single_source(graph, origin, adjacency)
+                for origin in xrange(len(graph))]
+        return cls([row[0] for row in rows], [row[1] for row in rows],
+                   graph_digest(graph))
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a table written by :meth:`save`.
+
+        Args:
+            filename (str): path of the .npz file
+
+        Returns:
+            ShortestPathTable: the loaded table
+        """
+        with numpy.load(filename) as data:
+            return cls(data["distances"].tolist(),
+                       data["predecessors"].tolist(),
+                       str(data["key"]))
+
+    @classmethod
+    def cached(cls, graph, filename, adjacency=None):
+        """ Load the table from filename if it was built for graph, otherwise
+        build it and store it there.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            filename (str): path of the .npz file
+            adjacency (list): optional precomputed neighbor lists
+
+        Returns:
+            ShortestPathTable: table for the graph
+        """
+        key = graph_digest(graph)
+        if os.path.isfile(filename):
+            table = cls.load(filename)
+            if table.key == key:
+                return table
+        table = cls.build(graph, adjacency)
+        table.save(filename)
+        return table
+
+    def save(self, filename):
+        """ Store the table as compressed .npz file, atomically replacing an
+        existing one.
+
+        Args:
+            filename (str): path of the .npz file
+        """
+        tmp = "{}.{}.tmp".format(filename, os.getpid())
+        with open(tmp, 'wb') as fp:
+            numpy.savez_compressed(
+                fp,
+                key=numpy.array(self.key),
+                distances=numpy.array(self.distances, dtype=numpy.float64),
+                predecessors=numpy.array(self.predecessors,
+                                         dtype=numpy.int32))
+        os.rename(tmp, filename)
+
+    def _row(self, origin):
+        """ Distances and predecessors of all nodes from origin """
+        return self.distances[origin], self.predecessors[origin]
+
+    def distance(self, origin, destination):
+        """ Length of the shortest path, inf if there is none """
+        return self._row(origin)[0][destination]
+
+    def path(self, origin, destination):
+        """ Shortest path as list of node indices.
+
+        Args:
+            origin (int): start node
+            destination (int): end node
+
+        Returns:
+            list: nodes from origin to destination
+        """
+        predecessors = self._row(origin)[1]
+        if destination != origin and predecessors[destination] < 0:
+            raise ValueError("No path from {} to {}".format(origin,
+                                                             destination))
+        sol = [destination]
+        while sol[-1] != origin:
+            sol.append(predecessors[sol[-1]])
+        return sol[::-1]
+
+    def paths(self, origins, destinations):
+        """ Shortest paths for pairs of origins and destinations """
+        return [self.path(o, d) for o, d in zip(origins, destinations)]
+
+
+class LazyShortestPathTable(ShortestPathTable):
+
+    def __init__(self, graph, adjacency=None):
+        """
+        :class:`ShortestPathTable` whose rows are computed by a single source
+        search on first use, for callers that only query a few origins.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            adjacency (list): optional precomputed neighbor lists
+        """
+        super(LazyShortestPathTable, self).__init__({}, {})
+        self.graph = graph
+        self.adjacency = adjacency if adjacency is not None \
+            else adjacency_lists(graph)
+
+    def _row(self, origin):
+        if origin not in self.predecessors:
+            self.distances[origin], self.predecessors[origin] = \
+                single_source(self.graph, origin, self.adjacency)
+        return self.distances[origin], self.predecessors[origin]
@@ -0,0 +1,221 @@
+#!usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import numpy
+
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.cooperativeSearch import HillOptimized
+from parking.common.cooperativeSearch import termination
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    import itertools.izip as zip
+except ImportError:
+    pass
+
+
+def repeated_add(value, increment, count):
+    """ Add increment count times to value, one addition after another.
+
+    numpy.add.accumulate is sequential, so the result is bitwise identical to
+    ``count`` times ``value += increment`` in Python.
+
+    Args:
+        value (float): initial value
+        increment (float): value to add
+        count (int): number of additions
+
+    Returns:
+        float: the accumulated value
+    """
+    steps = numpy.full(count + 1, increment, dtype=numpy.float64)
+    steps[0] = value
+    return numpy.add.accumulate(steps)[-1]
+
+
+class NumpyCooperativeSearch(HeapCooperativeSearch):
+
+    def __init__(self, graph, agents, penalty=0.2, adjacency=None,
+                 destinations=None, stop=termination.FULL):
+        """
+        Cooperative search kernel for small dense graphs. The static and the
+        dynamic adjacency matrix as well as distances and visited flags of all
+        agents are NumPy arrays, settling a node relaxes the whole matrix row
+        with masked vector operations and penalizes the dynamic matrix in
+        place. Round robin order and termination are shared with
+        :class:`HeapCooperativeSearch`; distances, paths and penalties are
+        identical to :class:`CooperativeSearch`.
+
+        Unreached nodes have the distance ``numpy.inf`` instead of
+        ``sys.maxsize``.
+
+        Args:
+            graph (2d list): weighted adjacency matrix
+            agents (int list): Starting positions of agents
+            penalty (float): How many times to increase the cost of traversing
+                the edge for other agents.
+            adjacency (list): optional precomputed neighbor lists, only used
+                by the hill climbing on top of this search
+            destinations (int list): destination of every agent, required
+                unless stop is termination.FULL
+            stop (int): one of :data:`termination`
+        """
+        self.graph = graph
+        self.agents = agents
+        self.penalty = penalty
+        self.destinations = destinations
+        self.stop = stop
+        num_nodes = len(self.graph)
+        for agent in self.agents:
+            assert agent < num_nodes, \
+                "Starting position of a car can not be outside of the graph"
+        assert stop == termination.FULL or \
+            (destinations is not None and len(destinations) == len(agents)), \
+            "Early termination requires a destination for every agent"
+        self.adjacency = adjacency
+        self.matrix = numpy.array(self.graph, dtype=numpy.float64)
+        self.dynamic_graph = self.matrix.copy()
+        num_agents = len(self.agents)
+        self.output_lst = numpy.full((num_agents, num_nodes), numpy.inf)
+        self.bool_lst = numpy.zeros((num_agents, num_nodes), dtype=bool)
+        self.path_lst = []
+        self.history = []
+        self.own_penalties = []
+        for car, agent in enumerate(self.agents):
+            self.output_lst[car, agent] = 0
+            path = ["entry"] * num_nodes
+            path[agent] = "start"
+            self.path_lst.append(path)
+            self.history.append([])
+            self.own_penalties.append({})
+
+    @property
+    def adjacency(self):
+        """ Neighbor lists, computed on first use """
+        if self._adjacency is None:
+            self._adjacency = [numpy.flatnonzero(row).tolist()
+                               for row in self.matrix]
+        return self._adjacency
+
+    @adjacency.setter
+    def adjacency(self, value):
+        self._adjacency = value
+
+    @property
+    def settled(self):
+        """ Number of settled nodes summed over all agents """
+        return int(self.bool_lst.sum())
+
+    def _exhausted(self, car_index):
+        """ Check if an agent has no reachable unsettled node left """
+        reachable = ~self.bool_lst[car_index] & \
+            numpy.isfinite(self.output_lst[car_index])
+        return not reachable.any()
+
+    def _closest(self, car_index):
+        """ Closest unsettled node of an agent, ties are broken towards the
+        highest index like :meth:`CooperativeSearch._neighbors`. Returns None
+        if no unsettled node is reachable. """
+        output = self.output_lst[car_index]
+        candidates = ~self.bool_lst[car_index] & numpy.isfinite(output)
+        if not candidates.any():
+            return None
+        minimum = output[candidates].min()
+        return int(numpy.flatnonzero(candidates & (output == minimum))[-1])
+
+    def _inner(self, car_index):
+        """
+        Settle the closest node of one agent, relax its matrix row and
+        penalize the relaxed edges in the dynamic matrix.
+        """
+        min_index = self._closest(car_index)
+        if min_index is None:
+            return
+        output = self.output_lst[car_index]
+        bool_list = self.bool_lst[car_index]
+        bool_list[min_index] = True
+
+        row = self.dynamic_graph[min_index]
+        candidate = output[min_index] + row
+        relaxed = numpy.flatnonzero(~bool_list & (row != 0) &
+                                    (candidate < output))
+        if not relaxed.size:
+            return
+        output[relaxed] = candidate[relaxed]
+        relaxed = relaxed.tolist()
+        path = self.path_lst[car_index]
+        for node in relaxed:
+            path[node] = min_index
+
+        if self.penalty:
+            self._penalize(min_index, relaxed)
+
+    def _penalize(self, min_index, relaxed):
+        """
+        Apply the penalty increments of :meth:`CooperativeSearch._inner`, see
+        :meth:`HeapCooperativeSearch._penalize`.
+        """
+        matrix = self.matrix
+        dynamic = self.dynamic_graph
+        bounds = relaxed[1:] + [len(matrix)]
+        for temp, end in zip(relaxed, bounds):
+            if not temp:
+                continue
+            count = end - temp
+            dynamic[min_index, temp] = repeated_add(
+                dynamic[min_index, temp],
+                matrix[min_index, temp] * self.penalty, count)
+            if matrix[temp, min_index]:
+                dynamic[temp, min_index] = repeated_add(
+                    dynamic[temp, min_index],
+                    matrix[temp, min_index] * self.penalty, count)
+
+    def dijkstra_inner(self, car_index):
+        """
+        Vectorized :meth:`CooperativeSearch.dijkstra_inner`. Only the row of
+        the settled node is needed, so the agent's own penalties are removed
+        from a copy of that row using the agent's penalty overlay.
+        """
+        min_index = self._closest(car_index)
+        if min_index is None:
+            return
+        output = self.output_lst[car_index]
+        bool_list = self.bool_lst[car_index]
+        bool_list[min_index] = True
+
+        driver_row = self.dynamic_graph[min_index]
+        own = self.own_penalties[car_index].get(min_index)
+        if own:
+            driver_row = driver_row.copy()
+            for node, count in own.items():
+                driver_row[node] = self._driver_weight(
+                    min_index, node, driver_row[node], count)
+
+        candidate = output[min_index] + driver_row
+        relaxed = numpy.flatnonzero(~bool_list & (driver_row != 0) &
+                                    (candidate < output))
+        if not relaxed.size:
+            return
+        output[relaxed] = candidate[relaxed]
+        path = self.path_lst[car_index]
+        for node in relaxed.tolist():
+            path[node] = min_index
+
+        # first relaxed node with minimal cost
+        temp = int(relaxed[numpy.argmin(output[relaxed])])
+        self.dynamic_graph[min_index, temp] += \
+            self.matrix[min_index, temp] * self.penalty
+        self.dynamic_graph[temp, min_index] += \
+            self.matrix[temp, min_index] * self.penalty
+        self._remember(car_index, min_index, temp)
+        self._remember(car_index, temp, min_index)
+
+
+class NumpyCoopSearchHillOptimized(HillOptimized, NumpyCooperativeSearch):
+    """ Vectorized cooperative search followed by hill climbing """
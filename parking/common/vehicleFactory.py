@@ -51,3 +51,48 @@ def generatePsvDemand(p_num, p_resourcedir="", p_routefile="reroute.rou.xml",
     f.write("</vehicles>")
     # close the XML file
     f.close()
+
+
+def generateBackgroundDemand(p_num, p_period=600.0, p_resourcedir="",
+                             p_routefile="background.rou.xml",
+                             p_edgefile="reroute.edg.xml"):
+    """ Generate random background traffic, i.e. vehicles that do not search
+    for parking, and create the corresponding XML file. The vehicles depart
+    spread over a period and are only simulated by SUMO, the Python control
+    loop never sees them.
+
+    Args:
+        p_num (int): Number of vehicles
+        p_period (float): Vehicles depart uniformly within [0, p_period] s
+        p_resourcedir (str): Base path name for SUMO related resources
+        p_routefile (str): Filename to write routes,
+            default: background.rou.xml
+        p_edgefile (str):  Filename to read edges, default: reroute.edg.xml
+    """
+    # same origins and destinations as the parking search vehicles, so every
+    # trip has a connection
+    origins = []
+    destinations = []
+    for edge in sumolib.output.parse(os.path.join(p_resourcedir, p_edgefile),
+                                     ['edge']):
+        if "entry" in str(edge.id):
+            origins.append(str(edge.id))
+        else:
+            destinations.append(str(edge.id))
+
+    # SUMO expects the vehicles of a route file sorted by departure time
+    departures = sorted(random.uniform(0, p_period) for i in range(p_num))
+
+    tab = "    "
+    # IDs must not contain "veh", which marks searching vehicles
+    veh = '<trip id="bg{0}" depart="{1:.2f}" from="{2}" to="{3}" ' + \
+            'type="Background" color="0.5,0.5,0.5"/>\n'
+
+    with open(os.path.join(p_resourcedir, p_routefile), 'w') as f:
+        f.write("<routes>\n")
+        f.write(tab + '<vType accel="1.0" decel="5.0" id="Background" ' + \
+                'length="4.0" maxSpeed="100.0" sigma="0.0"/>\n')
+        for i, depart in enumerate(departures):
+            f.write(tab + veh.format(i, depart, random.choice(origins),
+                                     random.choice(destinations)))
+        f.write("</routes>")
@@ -18,6 +18,12 @@ except ImportError:
     pass
 
 from parking.env.parkingSpace import ParkingSpace
+from parking.env.knowledge import ParkingKnowledge
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.shortestPaths import ShortestPathTable
+from parking.common.shortestPaths import graph_digest
+from parking.common.aStar import AStarRouter
+from parking.common.contractionHierarchy import ContractionHierarchy
 
 
 class Environment(object):
@@ -31,6 +37,8 @@ class Environment(object):
         reroute_edges = os.path.join(resource_dir, 'reroute.edg.xml')
         self._nodes = [str(x.id) for x in sumolib.output.parse(reroute_nodes, ['node'])]
         self._edges = [str(x.id) for x in sumolib.output.parse(reroute_edges, ['edge'])]
+        # position of a node ID in the adjacency matrices
+        self._nodeIndex = dict((node, i) for i, node in enumerate(self._nodes))
 
         # TODO: make a proper object from this and then finish refactoring this
         # class
@@ -60,6 +68,12 @@ class Environment(object):
                     e = self._net.getEdge(edge)
                     self._adjacencyMatrix[i][j] = e.getLength()
                     self._adjacencyEdgeID[i][j] = str(e.getID())
+        # sparse view of the same graph used by the heap based searches
+        self._adjacencyList = adjacency_lists(self._adjacencyMatrix)
+        # identifies the network in caches of derived data
+        self._graphDigest = graph_digest(self._adjacencyMatrix)
+        # per vehicle parking knowledge, only with V2V communication
+        self._knowledge = None
 
         self._oppositeEdgeID = dict(filter(
             lambda x: (edg_to_id(x[0]) == edg_from_id(x[1])
@@ -96,6 +110,72 @@ class Environment(object):
             else:
                 e["oppositeEdgeID"] = []
 
+        # router for static (penalty free) shortest paths between nodes
+        self._individualRouter = self._createIndividualRouter(
+            self._config.getCfg("simulation").get("individualrouter", "table"),
+            resource_dir)
+
+    def _createIndividualRouter(self, p_router, p_resourcedir):
+        """ Create the router answering individual shortest path queries
+
+        Args:
+            p_router (str): "table" for an all pairs table stored next to the
+                network (rebuilt only if the network changed), "astar" for
+                goal directed searches on node coordinates, "ch" for a
+                contraction hierarchy stored next to the network or "search"
+                for none (Phase2Routes falls back to a cooperative search without
+                penalty)
+            p_resourcedir (str): directory of the network files
+
+        Returns:
+            router with a paths(origins, destinations) method or None
+        """
+        if p_router == "table":
+            return ShortestPathTable.cached(
+                self._adjacencyMatrix,
+                os.path.join(p_resourcedir, 'reroute.paths.npz'),
+                self._adjacencyList)
+        if p_router == "astar":
+            coordinates = [self._roadNetwork["nodes"][node]["coordinates"]
+                           for node in self._nodes]
+            return AStarRouter.from_matrix(self._adjacencyMatrix, coordinates,
+                                           self._adjacencyList)
+        if p_router == "ch":
+            return ContractionHierarchy.cached(
+                self._adjacencyMatrix,
+                os.path.join(p_resourcedir, 'reroute.ch.npz'),
+                self._adjacencyList)
+        return None
+
+    def distanceRoad(self, p_fromEdgeID, p_fromPosition, p_toEdgeID,
+                     p_toPosition):
+        """ Driving distance between two positions in the road network
+
+        Answered by the contraction hierarchy if the individual router is one,
+        i.e. as sum of the edge lengths without internal junction lanes,
+        otherwise by SUMO.
+
+        Args:
+            p_fromEdgeID (str): edge of the start position
+            p_fromPosition (float): position on that edge
+            p_toEdgeID (str): edge of the end position
+            p_toPosition (float): position on that edge
+
+        Returns:
+            float: distance in meters
+        """
+        if not isinstance(self._individualRouter, ContractionHierarchy):
+            return traci.simulation.getDistanceRoad(
+                p_fromEdgeID, p_fromPosition, p_toEdgeID, p_toPosition, True)
+        if p_fromEdgeID == p_toEdgeID and p_fromPosition <= p_toPosition:
+            return p_toPosition - p_fromPosition
+        edges = self._roadNetwork["edges"]
+        between = self._individualRouter.distance(
+            self._nodeIndex[edges[p_fromEdgeID]["toNode"]],
+            self._nodeIndex[edges[p_toEdgeID]["fromNode"]])
+        return edges[p_fromEdgeID]["length"] - p_fromPosition + between + \
+            p_toPosition
+
     def loadParkingSpaces(self, p_run):
         """ Load parking spaces
 
@@ -116,9 +196,16 @@ class Environment(object):
         for edge in self._edges:
             self._roadNetwork["edges"][edge]["parkingSpaces"] = \
                     [p for p in self._allParkingSpaces if p.edgeID == edge]
+        self._initKnowledge()
         if self._config.getCfg("simulation").get("verbose"):
             print("  -> done.")
 
+    def _initKnowledge(self):
+        """ Reset the vehicles' parking knowledge for the run's spaces """
+        self._knowledge = None
+        if self._config.getCfg("simulation").get("communicationdistance"):
+            self._knowledge = ParkingKnowledge(self._allParkingSpaces)
+
     def initParkingSpaces(self, p_run):
         """ Initialize parking spaces
 
@@ -178,6 +265,12 @@ class Environment(object):
 
         # update parking spaces in run configuration
         self._config.updateRunCfgParkingspaces(p_run, self._allParkingSpaces)
+        self._initKnowledge()
+
+    @property
+    def knowledge(self):
+        """ Parking knowledge of the vehicles, None without communication """
+        return self._knowledge
 
     @property
     def nodes(self):
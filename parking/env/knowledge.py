@@ -0,0 +1,144 @@
+#!usr/bin/env python3
+from __future__ import print_function
+
+from collections import defaultdict
+
+
+def popcount(p_bits):
+    """ Number of set bits of a bitset """
+    return bin(p_bits).count("1")
+
+
+class ParkingKnowledge(object):
+
+    def __init__(self, p_parkingSpaces):
+        """ What every vehicle knows about the parking spaces.
+
+        A vehicle's knowledge is a pair of bitsets (Python ints) over the
+        parking table: bit i of the known-free set is set if the vehicle knows
+        that space i of p_parkingSpaces is available, bit i of the
+        known-occupied set if it knows that it is taken. Vehicles observe the
+        spaces of the edge they are driving on and share their knowledge
+        within their communication group with a bitwise OR, an occupied space
+        overrides an outdated free observation.
+
+        Args:
+            p_parkingSpaces (list): all parking spaces of the network, the
+                table the bits refer to
+        """
+        self._parkingSpaces = p_parkingSpaces
+        self._indexOf = dict((id(ps), i) for i, ps in enumerate(p_parkingSpaces))
+        # bitset of the spaces on every edge, for edge wise observations
+        self._edgeMask = defaultdict(int)
+        for i, ps in enumerate(p_parkingSpaces):
+            self._edgeMask[ps.edgeID] |= 1 << i
+        # ground truth, kept up to date by occupy()
+        self._available = 0
+        for i, ps in enumerate(p_parkingSpaces):
+            if ps.available:
+                self._available |= 1 << i
+        self._free = {}
+        self._occupied = {}
+
+    def index(self, p_parkingSpace):
+        """ Bit of a parking space """
+        return self._indexOf[id(p_parkingSpace)]
+
+    def spaces(self, p_bits):
+        """ Parking spaces of a bitset, in table order """
+        l_spaces = []
+        while p_bits:
+            l_lowest = p_bits & -p_bits
+            l_spaces.append(self._parkingSpaces[l_lowest.bit_length() - 1])
+            p_bits ^= l_lowest
+        return l_spaces
+
+    def edgeMask(self, p_edgeID):
+        """ Bitset of the spaces on an edge """
+        return self._edgeMask.get(p_edgeID, 0)
+
+    def observe(self, p_vehicle, p_edgeID):
+        """ A vehicle sees which spaces on an edge are free
+
+        Args:
+            p_vehicle: key of the vehicle, e.g. its fleet index
+            p_edgeID (str): edge the vehicle is driving on
+        """
+        l_mask = self._edgeMask.get(p_edgeID, 0)
+        if not l_mask:
+            return
+        l_free = self._available & l_mask
+        self._free[p_vehicle] = \
+            (self._free.get(p_vehicle, 0) & ~l_mask) | l_free
+        self._occupied[p_vehicle] = \
+            (self._occupied.get(p_vehicle, 0) & ~l_mask) | (l_mask ^ l_free)
+
+    def occupy(self, p_vehicle, p_parkingSpace):
+        """ A vehicle took a parking space
+
+        Args:
+            p_vehicle: key of the vehicle
+            p_parkingSpace (ParkingSpace): the space
+        """
+        l_bit = 1 << self.index(p_parkingSpace)
+        self._available &= ~l_bit
+        self._free[p_vehicle] = self._free.get(p_vehicle, 0) & ~l_bit
+        self._occupied[p_vehicle] = self._occupied.get(p_vehicle, 0) | l_bit
+
+    def share(self, p_groups):
+        """ Merge the knowledge within every group of communicating vehicles
+
+        Args:
+            p_groups (list): lists of vehicle keys, e.g. from
+                :func:`parking.runtime.communication.communication_groups`
+        """
+        for group in p_groups:
+            if len(group) < 2:
+                continue
+            l_free = 0
+            l_occupied = 0
+            for vehicle in group:
+                l_free |= self._free.get(vehicle, 0)
+                l_occupied |= self._occupied.get(vehicle, 0)
+            l_free &= ~l_occupied
+            for vehicle in group:
+                self._free[vehicle] = l_free
+                self._occupied[vehicle] = l_occupied
+
+    def forget(self, p_vehicle):
+        """ Drop a vehicle's knowledge, e.g. once it parked """
+        self._free.pop(p_vehicle, None)
+        self._occupied.pop(p_vehicle, None)
+
+    def knownFree(self, p_vehicle):
+        """ Bitset of the spaces a vehicle knows to be free """
+        return self._free.get(p_vehicle, 0)
+
+    def knownOccupied(self, p_vehicle):
+        """ Bitset of the spaces a vehicle knows to be taken """
+        return self._occupied.get(p_vehicle, 0)
+
+    def knownFreeOnEdge(self, p_vehicle, p_edgeID):
+        """ Number of spaces on an edge a vehicle knows to be free, e.g. for
+        phase 3 edge costs """
+        return popcount(self._free.get(p_vehicle, 0) &
+                        self._edgeMask.get(p_edgeID, 0))
+
+    def knownFreeAhead(self, p_vehicle, p_edgeID, p_position,
+                       p_maxDistance=None):
+        """ Spaces a vehicle knows to be free further down an edge
+
+        Args:
+            p_vehicle: key of the vehicle
+            p_edgeID (str): current edge
+            p_position (float): lane position of the vehicle
+            p_maxDistance (float): only spaces at most this far ahead
+
+        Returns:
+            list: parking spaces ahead, in table order
+        """
+        l_spaces = self.spaces(self._free.get(p_vehicle, 0) &
+                               self._edgeMask.get(p_edgeID, 0))
+        return [ps for ps in l_spaces if ps.position > p_position and
+                (p_maxDistance is None or
+                 ps.position - p_position <= p_maxDistance)]
@@ -0,0 +1,179 @@
+from __future__ import print_function
+
+import errno
+import glob
+import hashlib
+import json
+import os
+
+import traci
+
+
+def file_digest(p_filename):
+    """ Compute sha1 hex digest of a file's content.
+
+    Args:
+        p_filename (str): path to the file
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha1()
+    with open(p_filename, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def demand_key(p_netfile, *p_routefiles):
+    """ Key identifying a simulation prefix, i.e. a network and a demand.
+
+    Args:
+        p_netfile (str): SUMO network file
+        p_routefiles (str): SUMO route (demand) files, e.g. parking search
+            vehicles and background traffic
+
+    Returns:
+        str: hex digest over all file contents
+    """
+    digest = hashlib.sha1()
+    digest.update(file_digest(p_netfile).encode("ascii"))
+    for routefile in p_routefiles:
+        digest.update(file_digest(routefile).encode("ascii"))
+    return digest.hexdigest()
+
+
+def remove_stale(p_dir):
+    """ Remove temporary files of processes that no longer run.
+
+    Temporary files are named ``<file>.<pid>.tmp``.
+
+    Args:
+        p_dir (str): checkpoint directory
+    """
+    for tmpfile in glob.glob(os.path.join(p_dir, "*.tmp")):
+        try:
+            pid = int(tmpfile.rsplit(".", 2)[-2])
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            continue
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            if e.errno == errno.ESRCH:
+                os.remove(tmpfile)
+
+
+class Phase1Checkpoint(object):
+
+    def __init__(self, p_sim_config, p_generated=False):
+        """ Saved SUMO state at the phase 1 -> phase 2 boundary.
+
+        All vehicles depart at time 0 from entry edges and cruise without
+        searching until they leave the entry edge, so the simulation prefix
+        up to that point only depends on the network and the demand. The
+        state of the last step before the first vehicle leaves its entry edge
+        is stored once per network/demand and later runs (or other
+        configurations sharing the same demand) branch from it.
+
+        Saving the full state at every step is expensive, so the first run of
+        a demand only records the boundary step in the metadata. The next run
+        of the same demand saves the state once, at that step. A demand that
+        was just generated is unlikely to be simulated again and is not
+        recorded at all.
+
+        Args:
+            p_sim_config (dict): simulation part of the configuration
+            p_generated (bool): the demand was generated for this run
+        """
+        resource_dir = p_sim_config.get("resourcedir")
+        self._dir = os.path.join(resource_dir,
+                                 p_sim_config.get("checkpointdir", "checkpoints"))
+        l_routefiles = [p_sim_config.get("routefile")]
+        if p_sim_config.get("backgroundvehicles"):
+            # background traffic is part of the state as well
+            l_routefiles.append(p_sim_config.get("backgroundroutefile"))
+        self._key = demand_key(
+            os.path.join(resource_dir, "reroute.net.xml"),
+            *[os.path.join(resource_dir, x) for x in l_routefiles])
+        self._statefile = os.path.join(self._dir, self._key + ".state.xml")
+        self._metafile = os.path.join(self._dir, self._key + ".json")
+        # state saved at the boundary step, per process to allow several
+        # simulations to record the same prefix concurrently
+        self._pendingfile = "{}.{}.tmp".format(self._statefile, os.getpid())
+        self._pendingmeta = None
+        self._done = p_generated
+        if not os.path.isdir(self._dir):
+            os.makedirs(self._dir)
+        remove_stale(self._dir)
+        # boundary step recorded by an earlier run of the demand
+        self._boundary = None
+        if not p_generated and os.path.isfile(self._metafile):
+            with open(self._metafile, 'r') as fp:
+                self._boundary = json.load(fp)["step"]
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def done(self):
+        """ True once the checkpoint is stored (or can not be recorded) """
+        return self._done
+
+    def exists(self):
+        """ Check whether a checkpoint for this network and demand exists """
+        return os.path.isfile(self._statefile) and os.path.isfile(self._metafile)
+
+    def restore(self):
+        """ Load the saved state into the connected SUMO instance.
+
+        Returns:
+            tuple: (step, departed) where step is the simulation step of the
+                saved state and departed is a list of (vehicle ID, departure
+                step) pairs of the vehicles that are in the network
+        """
+        with open(self._metafile, 'r') as fp:
+            meta = json.load(fp)
+        traci.simulation.loadState(self._statefile)
+        self._done = True
+        return meta["step"], [tuple(x) for x in meta["departed"]]
+
+    def record(self, p_step, p_vehicles):
+        """ Record the checkpoint after a simulation step.
+
+        Without metadata the last step in which no vehicle has left its entry
+        edge is remembered and written as metadata once the first vehicle
+        leaves it. With metadata the state is saved at the recorded step.
+
+        Args:
+            p_step (int): current simulation step
+            p_vehicles (list): parking search vehicles created so far
+        """
+        if self._done:
+            return
+        if self._boundary is not None:
+            if p_step < self._boundary:
+                return
+            self._done = True
+            if p_step == self._boundary:
+                traci.simulation.saveState(self._pendingfile)
+                # rename is atomic, readers see either no or a complete
+                # checkpoint
+                os.rename(self._pendingfile, self._statefile)
+            return
+        if all(v.currentRouteIndex < 1 for v in p_vehicles):
+            self._pendingmeta = {
+                "step": p_step,
+                "departed": [(v.name, v.timeCreated) for v in p_vehicles]}
+            return
+
+        self._done = True
+        if self._pendingmeta is None:
+            # boundary crossed within the first step, nothing to branch from
+            return
+        metatmp = "{}.{}.tmp".format(self._metafile, os.getpid())
+        with open(metatmp, 'w') as fp:
+            json.dump(self._pendingmeta, fp)
+        os.rename(metatmp, self._metafile)
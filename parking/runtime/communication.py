@@ -1,8 +1,146 @@
-from collections import deque
+import math
+from collections import defaultdict
+
+import numpy
+
+# cells of the half neighbourhood of a grid cell, every pair of adjacent cells
+# is visited once
+HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+# vehicle count from which mark_neighbours uses the NumPy batch path
+NUMPY_THRESHOLD = 256
+
+
+def cell_size(distance):
+    """ Side length of the grid cells for a communication distance. Slightly
+    larger than the distance, so vehicles closer than the distance are in
+    the same or adjacent cells despite rounding of the cell coordinates. """
+    return distance * (1 + 1e-9)
+
+
+def grid_cell(position, size):
+    """ Cell of a position in a uniform grid with the given cell size """
+    return (int(math.floor(position[0] / size)),
+            int(math.floor(position[1] / size)))
+
+
+def grid_pairs(positions, distance):
+    """ Pairs of positions closer than distance, found with a uniform grid
+    spatial hash so only positions in adjacent cells are compared.
+
+    Args:
+        positions (list): (x, y) of every vehicle
+        distance (float): Maximum Manhattan distance (exclusive)
+
+    Returns:
+        list: sorted (i, j) index pairs with i < j
+    """
+    if distance <= 0:
+        return []
+    size = cell_size(distance)
+    cells = defaultdict(list)
+    for idx, position in enumerate(positions):
+        cells[grid_cell(position, size)].append(idx)
+
+    pairs = []
+    for (cell_x, cell_y), members in cells.items():
+        for d_x, d_y in HALF_NEIGHBOURHOOD:
+            others = cells.get((cell_x + d_x, cell_y + d_y))
+            if not others:
+                continue
+            same = d_x == 0 and d_y == 0
+            for pos, veh_idx in enumerate(members):
+                veh_x, veh_y = positions[veh_idx]
+                for oth_idx in (others[pos + 1:] if same else others):
+                    oth_x, oth_y = positions[oth_idx]
+                    if (abs(veh_x - oth_x) + abs(veh_y - oth_y)) < distance:
+                        pairs.append((veh_idx, oth_idx) if veh_idx < oth_idx
+                                     else (oth_idx, veh_idx))
+    pairs.sort()
+    return pairs
+
+
+def numpy_pairs(positions, distance):
+    """ NumPy batch version of :func:`grid_pairs`. Positions are sorted by
+    cell, the members of every neighbouring cell are a contiguous range that
+    is found with a binary search.
+
+    Args:
+        positions (array): n x 2 array (or list) of vehicle positions
+        distance (float): Maximum Manhattan distance (exclusive)
+
+    Returns:
+        tuple: two int arrays i and j with i < j, sorted by (i, j)
+    """
+    positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 2)
+    if distance <= 0 or len(positions) < 2:
+        return (numpy.empty(0, dtype=numpy.intp),
+                numpy.empty(0, dtype=numpy.intp))
+    cells = numpy.floor(positions / cell_size(distance)).astype(numpy.int64)
+    # shift by one cell so neighbouring cell keys never wrap around
+    cells -= cells.min(axis=0) - 1
+    width = cells[:, 1].max() + 2
+    keys = cells[:, 0] * width + cells[:, 1]
+    order = numpy.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_pos = positions[order]
+
+    found_i = []
+    found_j = []
+    ranks = numpy.arange(len(keys))
+    for d_x, d_y in HALF_NEIGHBOURHOOD:
+        target = sorted_keys + d_x * width + d_y
+        if d_x == 0 and d_y == 0:
+            low = ranks + 1
+        else:
+            low = numpy.searchsorted(sorted_keys, target, side="left")
+        high = numpy.searchsorted(sorted_keys, target, side="right")
+        counts = numpy.maximum(high - low, 0)
+        total = counts.sum()
+        if not total:
+            continue
+        first = numpy.repeat(ranks, counts)
+        starts = numpy.cumsum(counts) - counts
+        second = numpy.repeat(low, counts) + \
+            (numpy.arange(total) - numpy.repeat(starts, counts))
+        diff = numpy.abs(sorted_pos[first] - sorted_pos[second]).sum(axis=1)
+        close = diff < distance
+        found_i.append(order[first[close]])
+        found_j.append(order[second[close]])
+
+    if not found_i:
+        return (numpy.empty(0, dtype=numpy.intp),
+                numpy.empty(0, dtype=numpy.intp))
+    found_i = numpy.concatenate(found_i)
+    found_j = numpy.concatenate(found_j)
+    low = numpy.minimum(found_i, found_j)
+    high = numpy.maximum(found_i, found_j)
+    sort = numpy.lexsort((high, low))
+    return low[sort], high[sort]
+
+
+def neighbour_pairs(positions, distance):
+    """ Pairs of vehicles closer than distance, using the NumPy batch path
+    for many vehicles.
+
+    Args:
+        positions (list): (x, y) of every vehicle
+        distance (float): Maximum Manhattan distance (exclusive)
+
+    Returns:
+        list: sorted (i, j) index pairs with i < j
+    """
+    if len(positions) >= NUMPY_THRESHOLD:
+        first, second = numpy_pairs(positions, distance)
+        return list(zip(first.tolist(), second.tolist()))
+    return grid_pairs(positions, distance)
+
 
 def mark_neighbours(vehicles, distance):
     """ Discovers neighbors for a vehicles and saves them internally into
-    vehicle objects. Has complexity of approx O(len(vehicles)**2/2).
+    vehicle objects. Only vehicles in the same or adjacent cells of a grid
+    with the communication distance as cell size are compared, see
+    :func:`grid_pairs`. Neighbors are listed in the order of the vehicles.
 
     Args:
         vehicles (list): A list with vehicle object whose neighbors should be
@@ -15,48 +153,269 @@ def mark_neighbours(vehicles, distance):
     for v in vehicles:
         v.connected_neighbors = []
 
-    # loop over vehicles but in inner loop don't check vehicles that went
-    # through first loop because connections are symmetric
-    for veh_idx, veh in list(enumerate(vehicles))[:-1]:
-        for other in vehicles[veh_idx + 1:]:
-            veh_x, veh_y = veh.position
-            oth_x, oth_y = other.position
-            if (abs(veh_x - oth_x) + abs(veh_y - oth_y)) < distance:
-                veh.connected_neighbors.append(other)
-                other.connected_neighbors.append(veh)
-
-def communication_groups(vehicles):
+    # pairs are sorted, so every neighbor list ends up in vehicle order
+    for veh_idx, oth_idx in neighbour_pairs([v.position for v in vehicles],
+                                            distance):
+        vehicles[veh_idx].connected_neighbors.append(vehicles[oth_idx])
+        vehicles[oth_idx].connected_neighbors.append(vehicles[veh_idx])
+
+class DisjointSets(object):
+
+    def __init__(self, count):
+        """ Union-find over the integers 0..count-1 with union by size and
+        path halving, i.e. O(alpha(n)) amortized per operation.
+
+        Args:
+            count (int): number of elements
+        """
+        self.parent = list(range(count))
+        self.size = [1] * count
+
+    def extend(self, count):
+        """ Add singleton sets up to count elements """
+        for element in range(len(self.parent), count):
+            self.parent.append(element)
+            self.size.append(1)
+
+    def find(self, element):
+        """ Representative of the set containing element """
+        parent = self.parent
+        while parent[element] != element:
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+        return element
+
+    def union(self, first, second):
+        """ Merge the sets containing first and second
+
+        Returns:
+            bool: True if they were in different sets
+        """
+        first = self.find(first)
+        second = self.find(second)
+        if first == second:
+            return False
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return True
+
+    def groups(self):
+        """ All sets as sorted index lists, ordered by their smallest index """
+        groups = []
+        group_of = {}
+        for element in range(len(self.parent)):
+            root = self.find(element)
+            if root not in group_of:
+                group_of[root] = len(groups)
+                groups.append([])
+            groups[group_of[root]].append(element)
+        return groups
+
+
+def group_indices(count, pairs):
+    """ Connected components of count vehicles linked by neighbour pairs.
+
+    Args:
+        count (int): number of vehicles
+        pairs (iterable): (i, j) index pairs, e.g. from :func:`grid_pairs` or
+            ``zip(*numpy_pairs(...))``
+
+    Returns:
+        list(list): vehicle indices of every group in ascending order, groups
+            ordered by their first vehicle
+    """
+    sets = DisjointSets(count)
+    for first, second in pairs:
+        sets.union(first, second)
+    return sets.groups()
+
+
+def communication_groups(vehicles, pairs=None):
     """ Creates groups of vehicles that are connected at specific time step
     with an assumption that communication is instantaneous. For example if
     vehicle_0 is connected to vehicle_1 and vehicle_1 is connected to vehicle_2
     then all 3 vehicles share same knowledge about parking spaces.
 
+    Groups are ordered by their first vehicle in the list, vehicles within a
+    group keep the order of the list.
+
     Args:
         vehicles (list): A list with vehicle objects.
+        pairs (iterable): Optional (i, j) index pairs of connected vehicles,
+            e.g. from :func:`neighbour_pairs`. Without pairs the
+            ``connected_neighbors`` lists of the vehicles are used.
 
     Returns:
         list(list): A list of list where each inner list is a group of vehicles
             that share the same knowledge at that time instance
     """
-    vehicles = vehicles[:]
+    if pairs is None:
+        index_of = dict((id(v), idx) for idx, v in enumerate(vehicles))
+        pairs = ((idx, index_of[id(other)])
+                 for idx, veh in enumerate(vehicles)
+                 for other in veh.connected_neighbors)
+    return [[vehicles[idx] for idx in group]
+            for group in group_indices(len(vehicles), pairs)]
+
+
+# events of the incremental communication graph
+EDGE_ADDED = "added"
+EDGE_REMOVED = "removed"
+
+# neighbourhood of a grid cell including the cell itself
+NEIGHBOURHOOD = tuple((d_x, d_y) for d_x in (-1, 0, 1) for d_y in (-1, 0, 1))
+
+
+class CommunicationGraph(object):
+
+    def __init__(self, distance):
+        """ Neighbour graph of the communicating vehicles maintained across
+        simulation steps.
+
+        Vehicles move only a few meters per step, so the graph hardly
+        changes. An update only rechecks vehicles whose position changed
+        against the vehicles in their own and adjacent grid cells, and only
+        vehicles that changed their cell are moved in the grid. Changes are
+        reported as edge events. Groups are kept in a union-find that merges
+        on added edges and is rebuilt lazily, once groups are asked for,
+        after an edge was removed.
+
+        Args:
+            distance (float): Maximum Manhattan distance (exclusive) between
+                two communicating vehicles, see :func:`mark_neighbours`
+        """
+        self.distance = distance
+        self._size = cell_size(distance)
+        self._positions = {}
+        self._cell_of = {}
+        self._cells = defaultdict(set)
+        self._neighbours = {}
+        self._sets = DisjointSets(0)
+        self._stale = False
+        # number of union-find rebuilds, for telemetry
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self._positions)
+
+    def neighbours(self, vehicle):
+        """ Set of vehicles connected to a vehicle """
+        return self._neighbours[vehicle]
+
+    def pairs(self):
+        """ All edges as sorted (i, j) pairs with i < j """
+        return sorted((veh, other) for veh, others in self._neighbours.items()
+                      for other in others if veh < other)
+
+    def _add_edge(self, first, second, events):
+        self._neighbours[first].add(second)
+        self._neighbours[second].add(first)
+        if not self._stale:
+            self._sets.union(first, second)
+        events.append((EDGE_ADDED, min(first, second), max(first, second)))
+
+    def _leave_cell(self, vehicle, cell):
+        members = self._cells[cell]
+        members.discard(vehicle)
+        if not members:
+            del self._cells[cell]
+
+    def _remove_edge(self, first, second, events):
+        self._neighbours[first].discard(second)
+        self._neighbours[second].discard(first)
+        # splitting a group needs a rebuild
+        self._stale = True
+        events.append((EDGE_REMOVED, min(first, second), max(first, second)))
+
+    def update(self, positions):
+        """ Move the vehicles to their current positions
+
+        Args:
+            positions (dict): vehicle index -> (x, y) of all communicating
+                vehicles, vehicles that are missing are removed (e.g. parked
+                vehicles)
 
-    groups = []
-    while vehicles:
-        group = []
-        veh_queue = deque([vehicles[0]])
+        Returns:
+            list: (event, i, j) tuples with i < j, the event being
+                EDGE_ADDED or EDGE_REMOVED
+        """
+        events = []
+        for vehicle in sorted(set(self._positions) - set(positions)):
+            for other in sorted(self._neighbours[vehicle]):
+                self._remove_edge(vehicle, other, events)
+            self._leave_cell(vehicle, self._cell_of.pop(vehicle))
+            del self._positions[vehicle]
+            del self._neighbours[vehicle]
+            self._stale = True
 
-        while veh_queue:
-            veh = veh_queue.pop()
-            group.append(veh)
+        moved = []
+        for vehicle, position in positions.items():
+            if self._positions.get(vehicle) == position:
+                continue
+            moved.append(vehicle)
+            self._positions[vehicle] = position
+            cell = grid_cell(position, self._size)
+            previous = self._cell_of.get(vehicle)
+            if previous != cell:
+                if previous is not None:
+                    self._leave_cell(vehicle, previous)
+                self._cells[cell].add(vehicle)
+                self._cell_of[vehicle] = cell
+            if vehicle not in self._neighbours:
+                self._neighbours[vehicle] = set()
+                self._sets.extend(vehicle + 1)
 
-            # don't add to queue vehicles that are already in the group or are
-            # already in the queue
-            filtered = (v for v in veh.connected_neighbors
-                        if (v not in group) and (v not in veh_queue))
-            veh_queue.extend(filtered)
+        # a pair of two moved vehicles is checked by the smaller one
+        moved_set = set(moved)
+        positions = self._positions
+        distance = self.distance
+        for vehicle in sorted(moved):
+            cell_x, cell_y = self._cell_of[vehicle]
+            veh_x, veh_y = positions[vehicle]
+            current = self._neighbours[vehicle]
+            for d_x, d_y in NEIGHBOURHOOD:
+                for other in self._cells.get((cell_x + d_x, cell_y + d_y),
+                                             ()):
+                    if other == vehicle or (other < vehicle and
+                                            other in moved_set):
+                        continue
+                    oth_x, oth_y = positions[other]
+                    close = (abs(veh_x - oth_x) + abs(veh_y - oth_y)) < \
+                        distance
+                    if close != (other in current):
+                        if close:
+                            self._add_edge(vehicle, other, events)
+                        else:
+                            self._remove_edge(vehicle, other, events)
+            # neighbours that are no longer in an adjacent cell
+            for other in [o for o in current
+                          if abs(self._cell_of[o][0] - cell_x) > 1 or
+                          abs(self._cell_of[o][1] - cell_y) > 1]:
+                self._remove_edge(vehicle, other, events)
+        return events
 
-            if vehicles:
-                vehicles.remove(veh)
+    def groups(self):
+        """ Connected vehicles, see :func:`communication_groups`
 
-        groups.append(group)
-    return groups
+        Returns:
+            list(list): vehicle indices of every group in ascending order,
+                groups ordered by their first vehicle
+        """
+        if self._stale:
+            self._sets = DisjointSets(max(self._positions) + 1
+                                      if self._positions else 0)
+            for first, second in self.pairs():
+                self._sets.union(first, second)
+            self._stale = False
+            self.rebuilds += 1
+        groups = []
+        group_of = {}
+        for vehicle in sorted(self._positions):
+            root = self._sets.find(vehicle)
+            if root not in group_of:
+                group_of[root] = len(groups)
+                groups.append([])
+            groups[group_of[root]].append(vehicle)
+        return groups
@@ -4,6 +4,8 @@ import sys
 import os
 import gzip
 
+from parking.runtime import runStore
+
 # TODO: add run configuration, i.e. occupancy of parking spaces.
 # TODO: Generate for each run occupancy by POIid if config doesn't match, i.e
 # too few/many runs,parkingspaces configured,
@@ -25,7 +27,7 @@ class Configuration(object):
                 "headless": True,
                 "verbose": False,
                 "runs": 10,
-                "runconfiguration": "config.runs.json.gz",
+                "runconfiguration": "config.runs",
                 "resulttimestamped": False,
                 "parkingspaces": {
                     "total": 400,
@@ -34,6 +36,22 @@ class Configuration(object):
                 "vehicles": 5,
                 "coopratioPhase2": 1.0,
                 "coopratioPhase3": 0.0,
+                "checkpointphase1": False,
+                "checkpointdir": "checkpoints",
+                "phase2termination": "destinations",
+                "phase2backend": "heap",
+                "individualrouter": "table",
+                "routecache": False,
+                "routecachedir": "routecache",
+                "phase2seed": None,
+                "phase2prefetch": 0,
+                "phase2workers": None,
+                "hilliterations": 1000,
+                "hillbudget": None,
+                "backgroundvehicles": 0,
+                "backgroundperiod": 600.0,
+                "backgroundroutefile": "background.rou.xml",
+                "communicationdistance": None,
             },
             "vehicle": {
                 "parking": {
@@ -67,7 +85,14 @@ class Configuration(object):
         }
 
         self._configuration = {}
+        # runs created or changed in this process, stored runs are decoded
+        # from self._runstore on access
         self._runconfiguration = {}
+        self._runstore = None
+        self._runwriter = None
+        self._runcfgCache = (None, None)
+        # summaries of the runs in self._runconfiguration
+        self._runcfgSummaries = {}
 
         self._configdir = p_configdir
         self._args = p_args
@@ -112,14 +137,65 @@ class Configuration(object):
         Returns:
             dict: configuration for a given key
         """
-        return self._runconfiguration.get(p_key)
+        l_runcfg = self._runconfiguration.get(p_key)
+        if l_runcfg is not None or self._runstore is None:
+            return l_runcfg
+        # vehicles look up their run one after another, keep the last
+        # decoded run
+        if self._runcfgCache[0] != p_key:
+            self._runcfgCache = (p_key, self._runstore.get(p_key))
+        return self._runcfgCache[1]
+
+    def runCfgSummary(self, p_run):
+        """ Summary of a run configuration, read from the run store's index
+        or computed once for runs held in memory
+
+        Args:
+            p_run (int): run number
+        Returns:
+            tuple: number of available parking spaces, number of vehicles and
+            checksum, see :func:`parking.runtime.runStore.summarize_runcfg`,
+            None if there is no configuration for the run
+        """
+        l_run = str(p_run)
+        l_runcfg = self._runconfiguration.get(l_run)
+        if l_runcfg is not None:
+            if not l_runcfg:
+                return None
+            if l_run not in self._runcfgSummaries:
+                self._runcfgSummaries[l_run] = \
+                    runStore.summarize_runcfg(l_runcfg)
+            return self._runcfgSummaries[l_run]
+        if self._runstore is None:
+            return None
+        return self._runstore.summary(l_run)
+
+    def _numRunCfgs(self):
+        """ Number of runs with a configuration, stored or not """
+        if self._runstore is None:
+            return len(self._runconfiguration)
+        return len(self._runstore) + sum(
+            1 for run in self._runconfiguration if run not in self._runstore)
+
+    def _runCfgKeys(self):
+        """ All runs with a configuration, stored or not """
+        if self._runstore is None:
+            return set(self._runconfiguration)
+        return set(self._runstore.keys()) | set(self._runconfiguration)
+
+    def _editRunCfg(self, p_run):
+        """ Run configuration to be changed, decoded from the store if
+        necessary """
+        if p_run not in self._runconfiguration:
+            self._runconfiguration[p_run] = self.getRunCfg(p_run) or {}
+            self._runcfgCache = (None, None)
+        self._runcfgSummaries.pop(p_run, None)
+        return self._runconfiguration[p_run]
 
     def _writeCfg(self, p_config, p_location, p_sort_keys=True, p_indent=4,
                   p_separators=(',', ' : ')):
-        if sys.version_info > (3, ):
-            fp = open(p_location, 'w')
-        elif p_location.endswith(".gz"):
-            fp = gzip.GzipFile(p_location, 'w')
+        if p_location.endswith(".gz"):
+            fp = gzip.open(p_location, 'wt' if sys.version_info > (3, ) else 'w')
         else:
             fp = open(p_location, mode="w")
 
@@ -162,6 +238,23 @@ class Configuration(object):
             self._configuration["simulation"]["verbose"] = True
         if p_args.resulttimestamped:
             self._configuration["simulation"]["resulttimestamped"] = True
+        if p_args.checkpointphase1:
+            self._configuration["simulation"]["checkpointphase1"] = True
+        if p_args.routecache:
+            self._configuration["simulation"]["routecache"] = True
+        if p_args.phase2seed is not None:
+            self._configuration["simulation"]["phase2seed"] = p_args.phase2seed
+        if p_args.hillbudget is not None:
+            self._configuration["simulation"]["hillbudget"] = p_args.hillbudget
+        if p_args.backgroundvehicles is not None:
+            self._configuration["simulation"]["backgroundvehicles"] = \
+                    p_args.backgroundvehicles
+        if p_args.communicationdistance is not None:
+            self._configuration["simulation"]["communicationdistance"] = \
+                    p_args.communicationdistance
+        if p_args.phase2prefetch is not None:
+            self._configuration["simulation"]["phase2prefetch"] = \
+                    p_args.phase2prefetch
 
     def _sanitycheck(self):
         """ Sanity checks of the config """
@@ -182,6 +275,30 @@ class Configuration(object):
                        "number of vehicles, if run in headless mode.")
             raise BaseException(message)
 
+        # raise an exception for unknown phase 2 search termination modes
+        sim_termination = self._configuration["simulation"].get(
+            "phase2termination", "destinations")
+        if sim_termination not in ("full", "destinations", "own"):
+            message = ("Unknown phase2termination {}, expecting one of full, "
+                       "destinations or own").format(sim_termination)
+            raise BaseException(message)
+
+        # raise an exception for unknown phase 2 search backends
+        sim_backend = self._configuration["simulation"].get("phase2backend",
+                                                            "heap")
+        if sim_backend not in ("heap", "numpy"):
+            message = ("Unknown phase2backend {}, expecting heap or "
+                       "numpy").format(sim_backend)
+            raise BaseException(message)
+
+        # raise an exception for unknown individual routers
+        sim_router = self._configuration["simulation"].get("individualrouter",
+                                                           "table")
+        if sim_router not in ("table", "astar", "ch", "search"):
+            message = ("Unknown individualrouter {}, expecting table, astar, "
+                       "ch or search").format(sim_router)
+            raise BaseException(message)
+
         # raise an exception if provided basedir does not exist
         if not os.path.isdir(self._configuration["simulation"]["resourcedir"]):
             message = ("The provided directory {} does not exist for argument"
@@ -190,10 +307,21 @@ class Configuration(object):
             raise BaseException(message)
 
     def existRunCfg(self):
-        return len(self._runconfiguration) > 0
+        return self._numRunCfgs() > 0
+
+    def validateRunCfg(self):
+        """ Check the run configurations of all simulated runs
+
+        Returns:
+            list: runs whose configuration does not match the simulation
+            parameters
+        """
+        return [run for run in range(self._configuration["simulation"]["runs"])
+                if not self.isRunCfgOk(run)]
 
     def isRunCfgOk(self, p_runid):
-        """ Check running configuration
+        """ Check running configuration against the simulation parameters,
+        using the run's summary only
 
         Args:
             p_runid (int?): running ID
@@ -202,33 +330,31 @@ class Configuration(object):
         """
         sim_cfg = self._configuration["simulation"]
         # phase 1: check if runcfg for given runid exists
-        if not self._runconfiguration.get(str(p_runid)):
+        l_summary = self.runCfgSummary(p_runid)
+        if l_summary is None or l_summary[0] is None:
             print("There exists no run configuration for runid {}.".format(p_runid))
             return False
 
         # phase 2: check for enough stored runs
-        if len(self._runconfiguration) < sim_cfg["runs"]:
+        l_runs = self._numRunCfgs()
+        if l_runs < sim_cfg["runs"]:
             print("/!\ Run config does not match simulation parameters. "
                   "Expecting {} runs, read {} runs from {} config instead. "
-                  "".format(sim_cfg["runs"], len(self._runconfiguration),
+                  "".format(sim_cfg["runs"], l_runs,
                             self._runcfgfilename))
             return False
 
         # phase 3: check for enough available parkingspaces in each run (i.e.
         # #available parkingspaces >= #vehicles)
         # contains amount of runs with mismatching available parkingspaces
-        tmp_vals = self._runconfiguration[str(p_runid)]["parkingspaces"].values()
-        l_available = [v for v in tmp_vals if v["available"]]
-        # l_available = filter(lambda v: v["available"],
-        #                 self._runconfiguration[str(p_runid)]["parkingspaces"].values())
-
-        if len(l_available) < sim_cfg["vehicles"]:
+        l_available = l_summary[0]
+        if l_available < sim_cfg["vehicles"]:
             print("/!\ Run config does not match simulation parameters. "
                   "Expecting at least {} available parking spaces due to {} "
                   "searching vehicles. Found only {} in run {}"
                   "".format(sim_cfg["parkingspaces"]["free"],
                             sim_cfg["vehicles"],
-                            len(l_available),
+                            l_available,
                             p_runid))
             return False
         return True
@@ -238,18 +364,11 @@ class Configuration(object):
         if not os.path.isfile(self._runcfgfilename):
             return {}
 
-        if sys.version_info > (3, ):
-            fp = open(self._runcfgfilename, mode="r")
-        elif self._runcfgfilename.endswith(".gz"):
-            fp = gzip.GzipFile(self._runcfgfilename, 'r')
-        else:
-            fp = open(self._runcfgfilename, mode="r")
-
-        l_runcfg = json.load(fp)
-
-        fp.close()
+        if runStore.is_run_store(self._runcfgfilename):
+            self._runstore = runStore.RunStore(self._runcfgfilename)
+            return {}
 
-        return l_runcfg
+        return runStore.read_json(self._runcfgfilename)
 
     def writeCfg(self):
         """ Write configuration """
@@ -260,6 +379,21 @@ class Configuration(object):
     def writeRunCfg(self):
         """ Write run configuration """
         print("* writing run configuration to {}".format(self._runcfgfilename))
+        if self._runcfgfilename.endswith(runStore.EXTENSION):
+            l_writer = self._runStoreWriter()
+            for i_run in sorted(self._runconfiguration,
+                                key=lambda x: (len(x), x)):
+                l_writer.add(i_run, self._runconfiguration[i_run])
+            l_writer.close()
+            self._runwriter = None
+            self._runstore = runStore.RunStore(self._runcfgfilename)
+            self._runconfiguration = {}
+            self._runcfgSummaries = {}
+            self._runcfgCache = (None, None)
+            print("  -> done.")
+            return
+        for i_run in self._runCfgKeys():
+            self._editRunCfg(i_run)
         self._writeCfg(self._runconfiguration,
                        self._runcfgfilename,
                        p_sort_keys=True,
@@ -267,15 +401,55 @@ class Configuration(object):
                        p_separators=(',', ':'))
         print("  -> done.")
 
+    def saveRunCfg(self):
+        """ Write the run configuration at the end of a simulation
+
+        A run store is always finalized, runs are only appended to it. An
+        existing JSON run configuration is not overwritten.
+        """
+        if self._runcfgfilename.endswith(runStore.EXTENSION) or \
+                not os.path.isfile(self._runcfgfilename):
+            self.writeRunCfg()
+        else:
+            print("There exists a run cfg at {}! Refusing to overwrite it!"
+                  "".format(self._runcfgfilename))
+
+    def _runStoreWriter(self):
+        """ Writer appending to the run store, opened on first use """
+        if self._runwriter is None:
+            if self._runstore is not None:
+                self._runstore.close()
+            self._runwriter = runStore.RunStoreWriter(self._runcfgfilename,
+                                                      p_append=True)
+            self._runstore = self._runwriter
+        return self._runwriter
+
+    def finishRunCfg(self, p_run):
+        """ Persist the configuration of a finished run
+
+        With a run store the run is appended and synced to disk right away
+        and dropped from memory, so runs survive a crash of later runs.
+        :meth:`writeRunCfg` only adds the index. JSON run configurations are
+        still written as a whole by :meth:`writeRunCfg`.
+
+        Args:
+            p_run (int): run number
+        """
+        l_run = str(p_run)
+        if not self._runcfgfilename.endswith(runStore.EXTENSION) or \
+                l_run not in self._runconfiguration:
+            return
+        self._runStoreWriter().add(l_run, self._runconfiguration.pop(l_run))
+        self._runcfgSummaries.pop(l_run, None)
+        self._runcfgCache = (None, None)
+
     def updateRunCfgParkingspaces(self, p_run, p_parkingspaces):
         """ Update parking spaces in run configuration """
-        l_run = str(p_run)
-        if not self._runconfiguration.get(l_run):
-            self._runconfiguration[l_run] = {}
-        self._runconfiguration[l_run]["parkingspaces"] = {}
+        l_runcfg = self._editRunCfg(str(p_run))
+        l_runcfg["parkingspaces"] = {}
 
         for i_parkingspace in p_parkingspaces:
-            self._runconfiguration[l_run]["parkingspaces"][str(i_parkingspace.name)] = {
+            l_runcfg["parkingspaces"][str(i_parkingspace.name)] = {
                 "name": i_parkingspace.name,
                 "available": i_parkingspace.available,
                 "edgeID": i_parkingspace.edgeID,
@@ -292,9 +466,7 @@ class Configuration(object):
             p_run (int?): number of run???
             p_vcfg (dict): dictionary representing a vehicle???
         """
-        l_run = str(p_run)
-        if not self._runconfiguration.get(l_run):
-            self._runconfiguration[l_run] = {}
-        if not self._runconfiguration.get(l_run).get("vehicles"):
-            self._runconfiguration[l_run]["vehicles"] = {}
-        self._runconfiguration[l_run]["vehicles"][p_vcfg["name"]] = p_vcfg
+        l_runcfg = self._editRunCfg(str(p_run))
+        if not l_runcfg.get("vehicles"):
+            l_runcfg["vehicles"] = {}
+        l_runcfg["vehicles"][p_vcfg["name"]] = p_vcfg
@@ -4,10 +4,14 @@ from __future__ import print_function
 import os
 import random
 
-import sumolib
-
-from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import HeapCooperativeSearch
 from parking.common.cooperativeSearch import CoopSearchHillOptimized
+from parking.common.cooperativeSearch import termination
+from parking.common.shortestPaths import ShortestPathTable
+from parking.common.shortestPaths import graph_digest
+from parking.common.vectorizedSearch import NumpyCooperativeSearch
+from parking.common.vectorizedSearch import NumpyCoopSearchHillOptimized
+from parking.runtime.routeCache import route_key
 
 try:
     xrange
@@ -19,25 +23,187 @@ try:
 except ImportError:
     pass
 
+# values of the "phase2termination" simulation setting
+TERMINATION = {
+    "full": termination.FULL,
+    "destinations": termination.ALL_DESTINATIONS,
+    "own": termination.OWN_DESTINATION,
+}
+
+# values of the "phase2backend" simulation setting, i.e. search classes for
+# (individual, cooperative) routes
+BACKENDS = {
+    "heap": (HeapCooperativeSearch, CoopSearchHillOptimized),
+    "numpy": (NumpyCooperativeSearch, NumpyCoopSearchHillOptimized),
+}
+
+
+# network and routers of a process pool worker, see init_worker
+_WORKER = {}
+
+
+def init_worker(graph, adjacency, router, backend, stop):
+    """ Process pool initializer, installs the network once per worker
+    instead of sending it with every task.
+
+    Args:
+        graph (2d list): weighted adjacency matrix
+        adjacency (list): neighbor lists of the graph
+        router: individual router of the environment or None
+        backend (str): key of :data:`BACKENDS`
+        stop (int): termination of the cooperative search
+    """
+    _WORKER.update(graph=graph, adjacency=adjacency, router=router,
+                   backend=backend, stop=stop)
+    # forked workers would otherwise share the parent's random state
+    random.seed()
+
+
+def cooperative_paths(graph, adjacency, backend, stop, origins, destinations,
+                      penalty, seed=None, router=None, iterations=1000,
+                      budget=None):
+    """ Node paths of a cooperative search followed by hill climbing, the hill
+    climbing uses a random.Random(seed) unless seed is None, reconnects with
+    router if it is an all pairs table and stops after iterations moves or
+    budget seconds.
+
+    Returns:
+        tuple: node paths and the hill climbing telemetry
+    """
+    coopRouter = BACKENDS[backend][1](graph, origins, destinations, penalty,
+                                      adjacency, stop)
+    rng = None if seed is None else random.Random(seed)
+    table = router if isinstance(router, ShortestPathTable) else None
+    paths = coopRouter.shortest().optimized(rng, table, iterations, budget)
+    return paths, coopRouter.telemetry
+
+
+def individual_paths(graph, adjacency, backend, router, origins, destinations):
+    """ Node paths of shortest routes, from router if there is one
+
+    Returns:
+        tuple: node paths and None, like :func:`cooperative_paths`
+    """
+    if router is not None:
+        # static network, the paths come from a table lookup or a goal
+        # directed search
+        return router.paths(origins, destinations), None
+    # without penalty agents are independent, stopping each one at its
+    # destination gives the same paths
+    indyRouter = BACKENDS[backend][0](graph, origins, 0, adjacency,
+                                      destinations,
+                                      termination.OWN_DESTINATION)
+    indyRouter.shortest()
+    return indyRouter.paths(destinations), None
+
+
+def _worker_cooperative_paths(origins, destinations, penalty, seed,
+                              iterations, budget):
+    return cooperative_paths(_WORKER["graph"], _WORKER["adjacency"],
+                             _WORKER["backend"], _WORKER["stop"], origins,
+                             destinations, penalty, seed, _WORKER["router"],
+                             iterations, budget)
+
+
+def _worker_individual_paths(origins, destinations):
+    return individual_paths(_WORKER["graph"], _WORKER["adjacency"],
+                            _WORKER["backend"], _WORKER["router"], origins,
+                            destinations)
+
+
+class _Done(object):
+    """ Already computed result with the interface of a future """
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+class PendingRoutes(object):
+
+    def __init__(self, parts):
+        """ Phase 2 routes of some vehicles that may still be computed by a
+        process pool, the node paths are converted to edges on result().
+
+        Args:
+            parts (list): (future of node paths and telemetry, vehicle IDs,
+                edge ID matrix, node to edge conversion, route cache, cache
+                key) tuples, cache and key are None if the paths are not
+                cached
+        """
+        self._parts = parts
+        self._routes = None
+        # telemetry of the hill climbings, available after result()
+        self.telemetry = []
+
+    def result(self):
+        """ Wait for the node paths of all parts
+
+        Returns:
+            dict: keys are vehicle ID's, and edgeID's
+        """
+        if self._routes is None:
+            self._routes = {}
+            for future, vehicle_IDs, adjacency_edge_id, nodeToEdge, cache, \
+                    key in self._parts:
+                paths, telemetry = future.result()
+                if telemetry is not None:
+                    self.telemetry.append(telemetry)
+                if cache is not None:
+                    paths = cache.put(key, paths)
+                self._routes.update(
+                    (vehID, nodeToEdge(adjacency_edge_id, path))
+                    for vehID, path in zip(vehicle_IDs, paths))
+        return self._routes
+
+    def __add__(self, other):
+        return PendingRoutes(self._parts + other._parts)
+
 
 class Phase2Routes(object):
 
-    def __init__(self, parent_class):
+    def __init__(self, parent_class, routefile=None, executor=None):
         """ Phase 2 routing class with methods to compute mixed ratin
         cooperation during parking search
 
         Args:
             parent_class: currently this is Runtime object but this should be
                 solved better
+            routefile (str): demand to route, the configured route file by
+                default
+            executor: optional process pool initialized with
+                :func:`init_worker` that computes the searches in the
+                background, see the submit methods
         """
         # Take what you need from parent_class
         self._config = parent_class._config
         self._environment = parent_class._environment
-        self._routefile = parent_class._sim_config.get("routefile")
+        self._routefile = routefile or parent_class._sim_config.get("routefile")
+        self._executor = executor
         self.nodeToEdge = parent_class.convertNodeSequenceToEdgeSequence
+        self._termination = TERMINATION[
+            parent_class._sim_config.get("phase2termination", "destinations")]
+        self._backend = parent_class._sim_config.get("phase2backend", "heap")
+        self._individualRouter = parent_class._sim_config.get(
+            "individualrouter", "table")
+        # routes are shared across runs by content address, hill climbing
+        # results only if its random numbers are reproducible
+        self._routeCache = parent_class._routeCache
+        self._seed = parent_class._sim_config.get("phase2seed")
+        # anytime hill climbing: iteration and wall clock budget
+        self._iterations = parent_class._sim_config.get("hilliterations", 1000)
+        self._budget = parent_class._sim_config.get("hillbudget")
+
+        self._readDemand()
+
+    def _readDemand(self):
+        """ Prepare dictionaries with vehicle O/D data (IDs and indices) by
+        parsing the generated route XML file """
+        # sumolib is only needed to read the demand
+        import sumolib
 
-        # prepare dictionaries with vehicle O/D data (IDs and indices)
-        # by parsing the generated route XML file
         self.vehicleOriginNode = {}
         self.vehicleOriginNodeIndex = {}
         self.vehicleDestinationNode = {}
@@ -60,6 +226,26 @@ class Phase2Routes(object):
             self.allOriginNodeIndices.append(self.vehicleOriginNodeIndex[trip.id])
             self.allDestinationNodeIndices.append(self.vehicleDestinationNodeIndex[trip.id])
 
+    def _adjacencyList(self, kwargs):
+        """ Neighbor lists matching the adjacency matrix in kwargs, the
+        environment's precomputed lists are only valid for its own matrix """
+        if "adjacency_list" in kwargs:
+            return kwargs["adjacency_list"]
+        if "adjacency_matrix" in kwargs:
+            return None
+        return self._environment._adjacencyList
+
+    def _routeKey(self, kind, adjacency_matrix, origin_node_ind,
+                  destination_node_ind, **parts):
+        """ Content address of a routing problem for the route cache """
+        if adjacency_matrix is self._environment._adjacencyMatrix:
+            network = self._environment._graphDigest
+        else:
+            network = graph_digest(adjacency_matrix)
+        return route_key(kind=kind, network=network,
+                         origins=list(origin_node_ind),
+                         destinations=list(destination_node_ind), **parts)
+
     def cooperativeRoutes(self, penalty, **kwargs):
         """ Cooperative routes that are currently optimized.
 
@@ -68,6 +254,7 @@ class Phase2Routes(object):
                 of cooperative routing
             kwargs:
                 adjacency_matrix,
+                adjacency_list,
                 adjacency_edge_id,
                 origin_node_ind,
                 destination_node_ind,
@@ -76,9 +263,18 @@ class Phase2Routes(object):
         Returns:
             dict: keys are vehicle ID's, and edgeID's
         """
+        return self.submitCooperativeRoutes(penalty, **kwargs).result()
+
+    def submitCooperativeRoutes(self, penalty, **kwargs):
+        """ Start computing cooperative routes, see :meth:`cooperativeRoutes`
+
+        Returns:
+            PendingRoutes: the routes once computed
+        """
         # TODO: remove defaults? should there be so manz defaults?
         adjacency_matrix = kwargs.get("adjacency_matrix",
                                       self._environment._adjacencyMatrix)
+        adjacency_list = self._adjacencyList(kwargs)
         adjacency_edge_id = kwargs.get("adjacency_edge_id",
                                        self._environment._adjacencyEdgeID)
         origin_node_ind = kwargs.get("origin_node_ind",
@@ -87,14 +283,28 @@ class Phase2Routes(object):
                                           self.allDestinationNodeIndices)
         vehicle_IDs = kwargs.get("vehicle_IDs", self.allVehicleIDs)
 
-        coopRouter = CoopSearchHillOptimized(adjacency_matrix,
-                                             origin_node_ind,
-                                             destination_node_ind,
-                                             penalty)
-        coopPaths = coopRouter.shortest().optimized()
-        edges = (self.nodeToEdge(adjacency_edge_id, coopPaths[trip])
-                 for trip in xrange(len(vehicle_IDs)))
-        return dict(zip(vehicle_IDs, edges))
+        key = None
+        # a wall clock budget makes the climb depend on the machine load
+        if self._routeCache is not None and self._seed is not None \
+                and self._budget is None:
+            key = self._routeKey("cooperative", adjacency_matrix,
+                                 origin_node_ind, destination_node_ind,
+                                 penalty=penalty, backend=self._backend,
+                                 termination=self._termination,
+                                 seed=self._seed,
+                                 iterations=self._iterations)
+        return self._submit(
+            key, vehicle_IDs, adjacency_edge_id, "adjacency_matrix" in kwargs,
+            _worker_cooperative_paths,
+            (origin_node_ind, destination_node_ind, penalty, self._seed,
+             self._iterations, self._budget),
+            cooperative_paths,
+            (adjacency_matrix, adjacency_list, self._backend,
+             self._termination, origin_node_ind, destination_node_ind,
+             penalty, self._seed,
+             None if "adjacency_matrix" in kwargs
+             else self._environment._individualRouter,
+             self._iterations, self._budget))
 
     def individualRoutes(self, **kwargs):
         """ Just a shortest path routes for multiple agents.
@@ -102,6 +312,7 @@ class Phase2Routes(object):
         Args:
             kwargs:
                 adjacency_matrix,
+                adjacency_list,
                 adjacency_edge_id,
                 origin_node_ind,
                 destination_node_ind,
@@ -110,8 +321,17 @@ class Phase2Routes(object):
         Returns:
             dict: keys are vehicle ID's, and edgeID's
         """
+        return self.submitIndividualRoutes(**kwargs).result()
+
+    def submitIndividualRoutes(self, **kwargs):
+        """ Start computing individual routes, see :meth:`individualRoutes`
+
+        Returns:
+            PendingRoutes: the routes once computed
+        """
         adjacency_matrix = kwargs.get("adjacency_matrix",
                                       self._environment._adjacencyMatrix)
+        adjacency_list = self._adjacencyList(kwargs)
         adjacency_edge_id = kwargs.get("adjacency_edge_id",
                                        self._environment._adjacencyEdgeID)
         origin_node_ind = kwargs.get("origin_node_ind",
@@ -120,12 +340,48 @@ class Phase2Routes(object):
                                           self.allDestinationNodeIndices)
         vehicle_IDs = kwargs.get("vehicle_IDs", self.allVehicleIDs)
 
-        indyRouter = CooperativeSearch(adjacency_matrix, origin_node_ind, 0)
-        indyRouter.shortest()
-        indyPaths = indyRouter.paths(destination_node_ind)
-        edgesIndy = (self.nodeToEdge(adjacency_edge_id, indyPaths[trip])
-                     for trip in xrange(len(vehicle_IDs)))
-        return dict(zip(vehicle_IDs, edgesIndy))
+        router = self._environment._individualRouter
+        if "adjacency_matrix" in kwargs:
+            router = None
+
+        key = None
+        if self._routeCache is not None:
+            # routers may resolve ties between equally long paths differently
+            key = self._routeKey("individual", adjacency_matrix,
+                                 origin_node_ind, destination_node_ind,
+                                 router=self._individualRouter
+                                 if router is not None else "search")
+        return self._submit(
+            key, vehicle_IDs, adjacency_edge_id, "adjacency_matrix" in kwargs,
+            _worker_individual_paths,
+            (origin_node_ind, destination_node_ind),
+            individual_paths,
+            (adjacency_matrix, adjacency_list, self._backend, router,
+             origin_node_ind, destination_node_ind))
+
+    def _submit(self, key, vehicle_IDs, adjacency_edge_id, own_graph,
+                worker_fn, worker_args, fn, args):
+        """ Look up the node paths in the route cache, otherwise compute them
+        in the process pool (whose workers only know the environment's
+        network) or right away.
+
+        Returns:
+            PendingRoutes: the routes once computed
+        """
+        cache = None
+        paths = None
+        if key is not None:
+            paths = self._routeCache.get(key)
+            if paths is None:
+                cache = self._routeCache
+        if paths is not None:
+            future = _Done((paths, None))
+        elif self._executor is not None and not own_graph:
+            future = self._executor.submit(worker_fn, *worker_args)
+        else:
+            future = _Done(fn(*args))
+        return PendingRoutes([(future, vehicle_IDs, adjacency_edge_id,
+                               self.nodeToEdge, cache, key)])
 
     def routes(self, coop_share, penalty):
         """ Mixed cooperation routes.
@@ -138,10 +394,20 @@ class Phase2Routes(object):
         Returns:
             dict: keys are vehicle ID's, and edgeID's
         """
+        return self.submitRoutes(coop_share, penalty).result()
+
+    def submitRoutes(self, coop_share, penalty):
+        """ Start computing mixed cooperation routes, see :meth:`routes`. With
+        a process pool the cooperative and the individual subset are
+        computed concurrently.
+
+        Returns:
+            PendingRoutes: the routes once computed
+        """
         if coop_share == 1:
-            return self.cooperativeRoutes(penalty)
+            return self.submitCooperativeRoutes(penalty)
         if coop_share == 0:
-            return self.individualRoutes()
+            return self.submitIndividualRoutes()
         # prepare indices that will cooperate and the ones that wont
         len_vehIDs = len(self.allVehicleIDs)
         coop_num = int(round(len_vehIDs * coop_share))
@@ -165,17 +431,14 @@ class Phase2Routes(object):
                                  if ind not in coop_ind]
         coop_destinations = [self.allDestinationNodeIndices[x] for x in coop_ind]
 
-        coop_routes = self.cooperativeRoutes(
+        coop_routes = self.submitCooperativeRoutes(
             penalty, origin_node_ind=coop_origins,
             destination_node_ind=coop_destinations,
             vehicle_IDs=coop_IDs)
 
-        non_coop_routes = self.individualRoutes(
+        non_coop_routes = self.submitIndividualRoutes(
             origin_node_ind=non_coop_origins,
             destination_node_ind=non_coop_destinations,
             vehicle_IDs=non_coop_IDs)
 
-        routes = {}
-        routes.update(coop_routes)
-        routes.update(non_coop_routes)
-        return routes
+        return coop_routes + non_coop_routes
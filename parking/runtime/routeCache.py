@@ -0,0 +1,122 @@
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+def route_key(**p_parts):
+    """ Content address of a phase 2 routing problem.
+
+    Args:
+        p_parts: everything the routes depend on, e.g. network digest, origin
+            and destination node indices of the (cooperative) vehicles,
+            penalty, search backend and RNG seed; values must be JSON
+            serializable
+
+    Returns:
+        str: sha1 hex digest over the parts
+    """
+    l_blob = json.dumps(p_parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(l_blob.encode("utf-8")).hexdigest()
+
+
+class RouteCache(object):
+
+    def __init__(self, p_directory, p_capacity=64):
+        """ Phase 2 route cache shared by all runs of a sweep.
+
+        Node paths are stored by content address (see :func:`route_key`) in
+        an in memory LRU in front of one JSON file per key on disk, so runs
+        replaying the same demand and other processes or later sweeps with
+        the same network, demand and cooperation set skip the searches.
+
+        Args:
+            p_directory (str): directory of the on disk store
+            p_capacity (int): number of entries kept in memory
+        """
+        self._directory = p_directory
+        self._capacity = p_capacity
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+    def _filename(self, p_key):
+        return os.path.join(self._directory, p_key + ".json")
+
+    def _remember(self, p_key, p_paths):
+        # reinsert to mark as most recently used
+        self._memory.pop(p_key, None)
+        self._memory[p_key] = p_paths
+        while len(self._memory) > self._capacity:
+            self._memory.popitem(last=False)
+
+    def get(self, p_key):
+        """ Cached node paths for a key
+
+        Args:
+            p_key (str): content address
+
+        Returns:
+            list: node paths or None if the key is unknown
+        """
+        if p_key in self._memory:
+            l_paths = self._memory[p_key]
+            self._remember(p_key, l_paths)
+            self.hits += 1
+            return l_paths
+        l_filename = self._filename(p_key)
+        if os.path.isfile(l_filename):
+            with open(l_filename, 'r') as fp:
+                l_paths = json.load(fp)
+            self._remember(p_key, l_paths)
+            self.hits += 1
+            self.diskHits += 1
+            return l_paths
+        self.misses += 1
+        return None
+
+    def put(self, p_key, p_paths):
+        """ Store node paths for a key in memory and on disk
+
+        Args:
+            p_key (str): content address
+            p_paths (list): node paths, lists of node indices
+
+        Returns:
+            list: the stored node paths, as lists like the ones read back
+        """
+        l_paths = [list(path) for path in p_paths]
+        self._remember(p_key, l_paths)
+        l_filename = self._filename(p_key)
+        l_tmp = "{}.{}.tmp".format(l_filename, os.getpid())
+        with open(l_tmp, 'w') as fp:
+            json.dump(l_paths, fp, separators=(',', ':'))
+        # rename is atomic, concurrent sweeps never read partial entries
+        os.rename(l_tmp, l_filename)
+        return l_paths
+
+    def lookup(self, p_key, p_compute):
+        """ Cached node paths for a key, computed and stored on a miss
+
+        Args:
+            p_key (str): content address
+            p_compute (callable): returns the node paths
+
+        Returns:
+            list: node paths
+        """
+        l_paths = self.get(p_key)
+        if l_paths is None:
+            l_paths = self.put(p_key, p_compute())
+        return l_paths
+
+    def summary(self):
+        """ Hit and miss counters as printable line """
+        l_lookups = self.hits + self.misses
+        return ("route cache: {} lookups, {} hits ({} from disk), {} misses"
+                "".format(l_lookups, self.hits, self.diskHits, self.misses))
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+""" Random access store of run configurations.
+
+A run store replaces the single JSON document of all run configurations.
+Every run is a compressed record and an index at the end of the file maps
+runs to record offsets, so a run is only decoded when it is asked for.
+
+Layout::
+
+    header   MAGIC
+    record   type (1 byte), key length (uint16), payload length (uint32),
+             key, payload, crc32 of key and payload (uint32)
+    ...
+    footer   record of type INDEX holding the JSON index
+    trailer  offset of the footer (uint64), INDEX_MAGIC
+
+The index also holds a summary of every run: its number of available parking
+spaces, its number of vehicles and a checksum of its configuration. Runs are
+checked against the simulation parameters with the summary alone; summaries
+missing from the index are computed once and written with the next index.
+
+Names, edges and positions of the parking spaces are the same in all runs of
+a network and are stored once as TABLE record. A RUN record holds a bitmap of
+the available spaces and the flags of every vehicle. Runs that do not fit
+this schema are stored as compressed JSON.
+
+Convert an existing JSON run configuration with::
+
+    python3 -m parking.runtime.runStore config.runs.json.gz config.runs
+"""
+from __future__ import print_function
+
+import gzip
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy
+
+MAGIC = b"COPSRUN1"
+INDEX_MAGIC = b"COPSIDX1"
+# file name extension selecting the run store when writing
+EXTENSION = ".runs"
+
+# record types
+TABLE = b"T"
+RUN = b"R"
+JSON_RUN = b"J"
+INDEX = b"X"
+
+_RECORD = struct.Struct("<cHI")
+_CRC = struct.Struct("<I")
+_TRAILER = struct.Struct("<Q8s")
+_RUN_HEAD = struct.Struct("<IIB")
+_COUNT = struct.Struct("<I")
+_NAME = struct.Struct("<H")
+_VEHICLE = struct.Struct("<bB")
+
+SPACE_KEYS = frozenset(["name", "available", "edgeID", "position"])
+VEHICLE_KEYS = frozenset(["name", "isSearchingVehicle", "activity",
+                          "coopPhase2", "coopPhase3"])
+# vehicle flag bits
+SEARCHING = 1
+COOP_PHASE2 = 2
+COOP_PHASE3 = 4
+
+
+def is_run_store(p_filename):
+    """ Check whether a file is a run store (and not JSON) """
+    if not os.path.isfile(p_filename):
+        return False
+    with open(p_filename, 'rb') as fp:
+        return fp.read(len(MAGIC)) == MAGIC
+
+
+def read_json(p_filename):
+    """ Read a JSON run configuration, gzip compressed or not. Under Python 3
+    earlier versions wrote .gz files uncompressed.
+
+    Args:
+        p_filename (str): path to the JSON file
+
+    Returns:
+        dict: run configurations by run
+    """
+    with open(p_filename, 'rb') as fp:
+        l_compressed = fp.read(2) == b"\x1f\x8b"
+    if l_compressed:
+        with gzip.open(p_filename, 'rb') as fp:
+            return json.loads(fp.read().decode("utf-8"))
+    with open(p_filename, 'r') as fp:
+        return json.load(fp)
+
+
+def _parking_table(p_parkingspaces):
+    """ Names, edges and positions of a run's spaces, None if a space does not
+    fit the schema """
+    l_table = []
+    for key, space in p_parkingspaces.items():
+        if (not isinstance(space, dict) or set(space) != SPACE_KEYS or
+                str(space["name"]) != key or
+                not isinstance(space["available"], bool)):
+            return None
+        l_table.append([space["name"], space["edgeID"], space["position"]])
+    return l_table
+
+
+def _fits_schema(p_vehicles):
+    """ Check whether all vehicles fit the binary schema """
+    for key, vehicle in p_vehicles.items():
+        if (not isinstance(vehicle, dict) or set(vehicle) != VEHICLE_KEYS or
+                vehicle["name"] != key or
+                type(vehicle["activity"]) is not int or
+                not -128 <= vehicle["activity"] < 128 or
+                not all(isinstance(vehicle[flag], bool) for flag in
+                        ("isSearchingVehicle", "coopPhase2", "coopPhase3"))):
+            return False
+    return True
+
+
+def encode_run(p_runcfg, p_table):
+    """ Binary payload of a run that fits the schema
+
+    Args:
+        p_runcfg (dict): run configuration with parkingspaces (and vehicles)
+        p_table (int): number of the run's parking table
+
+    Returns:
+        bytes: uncompressed payload
+    """
+    l_vehicles = p_runcfg.get("vehicles")
+    l_available = numpy.array([space["available"] for space in
+                               p_runcfg["parkingspaces"].values()],
+                              dtype=bool)
+    l_parts = [_RUN_HEAD.pack(p_table, len(l_available),
+                              0 if l_vehicles is None else 1),
+               numpy.packbits(l_available).tobytes()]
+    if l_vehicles is not None:
+        l_parts.append(_COUNT.pack(len(l_vehicles)))
+        for name, vehicle in l_vehicles.items():
+            l_name = name.encode("utf-8")
+            l_parts.append(_NAME.pack(len(l_name)))
+            l_parts.append(l_name)
+            l_parts.append(_VEHICLE.pack(
+                vehicle["activity"],
+                (SEARCHING if vehicle["isSearchingVehicle"] else 0) |
+                (COOP_PHASE2 if vehicle["coopPhase2"] else 0) |
+                (COOP_PHASE3 if vehicle["coopPhase3"] else 0)))
+    return b"".join(l_parts)
+
+
+def decode_run(p_payload, p_tables):
+    """ Run configuration of a binary payload
+
+    Args:
+        p_payload (bytes): uncompressed payload
+        p_tables (callable): parking table of a table number
+
+    Returns:
+        dict: run configuration, as read from JSON
+    """
+    l_table, l_numSpaces, l_hasVehicles = _RUN_HEAD.unpack_from(p_payload)
+    l_offset = _RUN_HEAD.size
+    l_numBytes = (l_numSpaces + 7) // 8
+    l_available = numpy.unpackbits(numpy.frombuffer(
+        p_payload, dtype=numpy.uint8, count=l_numBytes,
+        offset=l_offset))[:l_numSpaces].astype(bool).tolist()
+    l_offset += l_numBytes
+    l_runcfg = {"parkingspaces": dict(
+        (str(name), {"name": name, "available": available, "edgeID": edge,
+                     "position": position})
+        for (name, edge, position), available in zip(p_tables(l_table),
+                                                     l_available))}
+    if l_hasVehicles:
+        l_vehicles = {}
+        l_numVehicles, = _COUNT.unpack_from(p_payload, l_offset)
+        l_offset += _COUNT.size
+        for _ in range(l_numVehicles):
+            l_length, = _NAME.unpack_from(p_payload, l_offset)
+            l_offset += _NAME.size
+            l_name = p_payload[l_offset:l_offset + l_length].decode("utf-8")
+            l_offset += l_length
+            l_activity, l_flags = _VEHICLE.unpack_from(p_payload, l_offset)
+            l_offset += _VEHICLE.size
+            l_vehicles[l_name] = {
+                "name": l_name,
+                "isSearchingVehicle": bool(l_flags & SEARCHING),
+                "activity": l_activity,
+                "coopPhase2": bool(l_flags & COOP_PHASE2),
+                "coopPhase3": bool(l_flags & COOP_PHASE3)}
+        l_runcfg["vehicles"] = l_vehicles
+    return l_runcfg
+
+
+def summarize_runcfg(p_runcfg):
+    """ Summary of a run configuration
+
+    Args:
+        p_runcfg (dict): run configuration
+
+    Returns:
+        tuple: number of available parking spaces (None without parking
+        spaces), number of vehicles and crc32 of the configuration as
+        compact JSON with sorted keys
+    """
+    l_spaces = p_runcfg.get("parkingspaces")
+    l_available = None
+    if isinstance(l_spaces, dict):
+        l_available = sum(1 for space in l_spaces.values()
+                          if space.get("available"))
+    l_checksum = zlib.crc32(json.dumps(
+        p_runcfg, sort_keys=True,
+        separators=(',', ':')).encode("utf-8")) & 0xffffffff
+    return l_available, len(p_runcfg.get("vehicles") or {}), l_checksum
+
+
+def _read_record(p_fp, p_offset, p_size):
+    """ Type, key, payload and end of a record, None if the record is cut off
+    or its checksum does not match """
+    if p_offset + _RECORD.size > p_size:
+        return None
+    p_fp.seek(p_offset)
+    l_kind, l_keyLength, l_length = _RECORD.unpack(p_fp.read(_RECORD.size))
+    l_end = p_offset + _RECORD.size + l_keyLength + l_length + _CRC.size
+    if l_kind not in (TABLE, RUN, JSON_RUN, INDEX) or l_end > p_size:
+        return None
+    l_key = p_fp.read(l_keyLength)
+    l_payload = p_fp.read(l_length)
+    l_crc, = _CRC.unpack(p_fp.read(_CRC.size))
+    if l_crc != zlib.crc32(l_key + l_payload) & 0xffffffff:
+        return None
+    return l_kind, l_key.decode("utf-8"), l_payload, l_end
+
+
+def _load_index(p_fp):
+    """ Index of a store, from its footer or by scanning the records
+
+    A store without valid trailer and footer was not finalized, e.g. the
+    writing process crashed. Its records are scanned up to the first one
+    that is cut off or corrupt, everything from there on is the tail of an
+    unfinished write.
+
+    Args:
+        p_fp (file): store opened for binary reading
+
+    Returns:
+        tuple: runs to record offsets, table record offsets, run summaries,
+        end of the last run or table record and whether the store was
+        finalized
+    """
+    p_fp.seek(0, os.SEEK_END)
+    l_size = p_fp.tell()
+    if l_size >= len(MAGIC) + _TRAILER.size:
+        p_fp.seek(l_size - _TRAILER.size)
+        l_offset, l_magic = _TRAILER.unpack(p_fp.read(_TRAILER.size))
+        l_footer = _read_record(p_fp, l_offset, l_size - _TRAILER.size) \
+            if l_magic == INDEX_MAGIC else None
+        if l_footer is not None and l_footer[0] == INDEX and \
+                l_footer[3] == l_size - _TRAILER.size:
+            l_index = json.loads(zlib.decompress(l_footer[2]).decode("utf-8"))
+            return (l_index["runs"], l_index["tables"],
+                    l_index.get("summaries", {}), l_offset, True)
+    l_runs = {}
+    l_tables = []
+    l_offset = l_end = len(MAGIC)
+    while True:
+        l_record = _read_record(p_fp, l_offset, l_size)
+        if l_record is None:
+            break
+        l_kind, l_key, l_payload, l_next = l_record
+        if l_kind == TABLE:
+            l_tables.append(l_offset)
+        elif l_kind != INDEX:
+            # a run written again replaces the earlier record
+            l_runs[l_key] = l_offset
+        if l_kind != INDEX:
+            l_end = l_next
+        l_offset = l_next
+    return l_runs, l_tables, {}, l_end, False
+
+
+class RunStore(object):
+
+    def __init__(self, p_filename):
+        """ Read a run store written by :class:`RunStoreWriter`. Only the
+        index is loaded, runs are decoded on access. A store that was not
+        finalized is read up to its last complete record.
+
+        Args:
+            p_filename (str): path to the store
+        """
+        self._filename = p_filename
+        self._fp = open(p_filename, 'rb')
+        self._check()
+
+    def _check(self):
+        if self._fp.read(len(MAGIC)) != MAGIC:
+            raise BaseException("{} is not a run store".format(
+                self._filename))
+        (self._runs, self._tableOffsets, self._summaries, self._end,
+         self.finalized) = _load_index(self._fp)
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, p_type, p_value, p_traceback):
+        self.close()
+
+    def close(self):
+        self._fp.close()
+
+    def _read(self, p_offset):
+        """ Type, key and payload of the record at an offset """
+        l_record = _read_record(self._fp, p_offset, float("inf"))
+        if l_record is None:
+            raise BaseException("Corrupt record at {} in {}".format(
+                p_offset, self._filename))
+        return l_record[:3]
+
+    def _table(self, p_table):
+        if p_table not in self._tables:
+            self._tables[p_table] = json.loads(zlib.decompress(self._read(
+                self._tableOffsets[p_table])[2]).decode("utf-8"))
+        return self._tables[p_table]
+
+    def __len__(self):
+        return len(self._runs)
+
+    def __contains__(self, p_run):
+        return str(p_run) in self._runs
+
+    def keys(self):
+        """ Stored runs """
+        return list(self._runs)
+
+    def get(self, p_run, p_default=None):
+        """ Decode the configuration of a run
+
+        Args:
+            p_run (str): run number
+            p_default: returned for runs not in the store
+
+        Returns:
+            dict: run configuration
+        """
+        l_offset = self._runs.get(str(p_run))
+        if l_offset is None:
+            return p_default
+        l_kind, l_key, l_payload = self._read(l_offset)
+        l_payload = zlib.decompress(l_payload)
+        if l_kind == JSON_RUN:
+            return json.loads(l_payload.decode("utf-8"))
+        return decode_run(l_payload, self._table)
+
+    def summary(self, p_run):
+        """ Summary of a run, see :func:`summarize_runcfg`. Only runs missing
+        from the index are decoded.
+
+        Args:
+            p_run (str): run number
+
+        Returns:
+            tuple: available parking spaces, vehicles and checksum, None for
+            runs not in the store
+        """
+        l_run = str(p_run)
+        if l_run not in self._runs:
+            return None
+        if l_run not in self._summaries:
+            self._summaries[l_run] = summarize_runcfg(self.get(l_run))
+        return tuple(self._summaries[l_run])
+
+    def __getitem__(self, p_run):
+        l_runcfg = self.get(p_run)
+        if l_runcfg is None:
+            raise KeyError(p_run)
+        return l_runcfg
+
+
+class RunStoreWriter(RunStore):
+
+    def __init__(self, p_filename, p_append=False, p_sync=None):
+        """ Write a run store, runs written so far can be read back.
+
+        By default records go to a temporary file which replaces p_filename
+        on :meth:`close`, readers never see a partial store. With p_append
+        the store is extended in place: an unfinished tail left by a crashed
+        writer is truncated, every run is synced to disk when it is added
+        and :meth:`close` appends the index. Until then readers recover the
+        runs by scanning the records.
+
+        Args:
+            p_filename (str): path to the store
+            p_append (bool): extend the store in place
+            p_sync (bool): sync every run to disk, defaults to p_append
+        """
+        self._filename = p_filename
+        self._append = p_append
+        self._sync = p_append if p_sync is None else p_sync
+        if p_append and os.path.isfile(p_filename) and \
+                os.path.getsize(p_filename) >= len(MAGIC):
+            self._tmp = None
+            self._fp = open(p_filename, 'r+b')
+            self._check()
+            # drop the footer and anything after the last complete record
+            self._fp.truncate(self._end)
+        else:
+            self._tmp = p_filename if p_append else \
+                "{}.{}.tmp".format(p_filename, os.getpid())
+            self._fp = open(self._tmp, 'w+b')
+            self._fp.write(MAGIC)
+            self._flush()
+            self._runs = {}
+            self._tableOffsets = []
+            self._tables = {}
+            self._summaries = {}
+            self.finalized = False
+        self._lastTable = self._table(len(self._tableOffsets) - 1) \
+            if self._tableOffsets else None
+
+    def __exit__(self, p_type, p_value, p_traceback):
+        if p_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _flush(self):
+        self._fp.flush()
+        if self._sync:
+            os.fsync(self._fp.fileno())
+
+    def _record(self, p_kind, p_key, p_payload):
+        self._fp.seek(0, os.SEEK_END)
+        l_offset = self._fp.tell()
+        l_key = p_key.encode("utf-8")
+        self._fp.write(_RECORD.pack(p_kind, len(l_key), len(p_payload)))
+        self._fp.write(l_key)
+        self._fp.write(p_payload)
+        self._fp.write(_CRC.pack(zlib.crc32(l_key + p_payload) & 0xffffffff))
+        return l_offset
+
+    def add(self, p_run, p_runcfg):
+        """ Append the configuration of a run, a run added again replaces the
+        earlier one
+
+        Args:
+            p_run (str): run number
+            p_runcfg (dict): its configuration
+        """
+        l_run = str(p_run)
+        self._summaries[l_run] = summarize_runcfg(p_runcfg)
+        l_table = None
+        if set(p_runcfg) <= set(["parkingspaces", "vehicles"]) and \
+                isinstance(p_runcfg.get("parkingspaces"), dict) and \
+                _fits_schema(p_runcfg.get("vehicles") or {}):
+            l_table = _parking_table(p_runcfg["parkingspaces"])
+        if l_table is None:
+            self._runs[l_run] = self._record(
+                JSON_RUN, l_run, zlib.compress(json.dumps(
+                    p_runcfg, sort_keys=True,
+                    separators=(',', ':')).encode("utf-8")))
+        else:
+            if l_table != self._lastTable:
+                self._tableOffsets.append(self._record(
+                    TABLE, str(len(self._tableOffsets)),
+                    zlib.compress(json.dumps(
+                        l_table, separators=(',', ':')).encode("utf-8"))))
+                self._lastTable = l_table
+            self._runs[l_run] = self._record(
+                RUN, l_run, zlib.compress(encode_run(
+                    p_runcfg, len(self._tableOffsets) - 1)))
+        self._flush()
+
+    def close(self):
+        """ Finalize the store: write the index and move the store into place
+
+        The trailer pointing to the index is written once the index is on
+        disk, a store is either finalized or its index is recovered by
+        scanning.
+        """
+        for run in self._runs:
+            self.summary(run)
+        l_index = {"runs": self._runs, "tables": self._tableOffsets,
+                   "summaries": self._summaries}
+        l_offset = self._record(INDEX, "", zlib.compress(
+            json.dumps(l_index, separators=(',', ':')).encode("utf-8")))
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._fp.write(_TRAILER.pack(l_offset, INDEX_MAGIC))
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._fp.close()
+        if not self._append:
+            os.rename(self._tmp, self._filename)
+
+    def abort(self):
+        """ Stop writing. A temporary store is discarded, an appended store
+        keeps the runs added so far. """
+        self._fp.close()
+        if not self._append:
+            os.remove(self._tmp)
+
+
+def write_store(p_filename, p_runs):
+    """ Write run configurations to a store, in run order
+
+    Args:
+        p_filename (str): path to the store
+        p_runs: mapping of runs to configurations, e.g. a dict or a
+            :class:`RunStore`
+    """
+    with RunStoreWriter(p_filename) as writer:
+        for run in sorted(p_runs.keys(), key=lambda x: (len(x), x)):
+            writer.add(run, p_runs.get(run))
+
+
+def convert(p_source, p_target):
+    """ Convert a JSON run configuration into a run store
+
+    Args:
+        p_source (str): JSON file, gzip compressed or not
+        p_target (str): path to the store
+    """
+    write_store(p_target, read_json(p_source))
+
+
+def compact(p_filename):
+    """ Rewrite a store without replaced runs and unfinished tails
+
+    Args:
+        p_filename (str): path to the store
+    """
+    with RunStore(p_filename) as store:
+        write_store(p_filename, store)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: {} SOURCE.json[.gz] TARGET{}".format(sys.argv[0],
+                                                              EXTENSION))
+    convert(sys.argv[1], sys.argv[2])
@@ -5,6 +5,7 @@ import os
 import subprocess
 import sys
 import random
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     xrange
@@ -30,9 +31,18 @@ except KeyError:
 import traci
 
 from parking.vehicle.parkingSearchVehicle import ParkingSearchVehicle
+from parking.vehicle.fleet import VehicleFleet
 from parking.common.vehicleFactory import generatePsvDemand
+from parking.common.vehicleFactory import generateBackgroundDemand
 from parking.env.environment import Environment
 from parking.runtime.phase2 import Phase2Routes
+from parking.runtime.phase2 import TERMINATION
+from parking.runtime.phase2 import init_worker
+from parking.runtime.checkpoint import Phase1Checkpoint
+from parking.runtime.routeCache import RouteCache
+from parking.runtime.scheduler import UpdateScheduler
+from parking.runtime.communication import CommunicationGraph
+from parking.vehicle.fleet import state
 
 
 class Runtime(object):
@@ -49,6 +59,149 @@ class Runtime(object):
         self._sim_config = self._config.getCfg("simulation")
         self._environment = Environment(self._config)
         self._vehicle_config = self._config.getCfg("vehicle")
+        self._routeCache = None
+        if self._sim_config.get("routecache"):
+            self._routeCache = RouteCache(os.path.join(
+                self._sim_config.get("resourcedir"),
+                self._sim_config.get("routecachedir", "routecache")))
+
+        # phase 2 routes of upcoming runs are computed by a process pool
+        # while the current run simulates
+        self._prefetch = self._sim_config.get("phase2prefetch", 0)
+        self._pending = {}
+        # simulation configuration of the run in progress
+        self._current = None
+        self._executor = None
+        # hill climbing telemetry of the last run
+        self._phase2Telemetry = []
+        if self._prefetch:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._sim_config.get("phase2workers") or None,
+                initializer=init_worker,
+                initargs=(self._environment._adjacencyMatrix,
+                          self._environment._adjacencyList,
+                          self._environment._individualRouter,
+                          self._sim_config.get("phase2backend", "heap"),
+                          TERMINATION[self._sim_config.get(
+                              "phase2termination", "destinations")]))
+
+    @property
+    def routeCache(self):
+        """ Phase 2 route cache shared by all runs, None if disabled """
+        return self._routeCache
+
+    @property
+    def phase2Telemetry(self):
+        """ Hill climbing telemetry of the last run's cooperative routes """
+        return self._phase2Telemetry
+
+    def logPhase2Telemetry(self, i_run, pendingRoutes):
+        """ Keep and print the hill climbing telemetry of a run
+
+        Args:
+            i_run (int): run number
+            pendingRoutes (tuple): computed individual and cooperative routes
+        """
+        self._phase2Telemetry = []
+        for i, pending in enumerate(pendingRoutes):
+            # with full or no cooperation both entries are the same object
+            if pending not in pendingRoutes[:i]:
+                self._phase2Telemetry.extend(pending.telemetry)
+        if self._sim_config.get("verbose"):
+            for telemetry in self._phase2Telemetry:
+                print("* run {} phase 2 hill climbing: {}".format(
+                    i_run, telemetry.summary()))
+
+    def close(self):
+        """ Shut down the phase 2 process pool and remove the route files of
+        prefetched runs """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for l_simConfig, l_pendingRoutes in self._pending.values():
+            self.removeRunFiles(l_simConfig)
+        self._pending.clear()
+        # a run that failed
+        if self._current is not None:
+            self.removeRunFiles(self._current)
+            self._current = None
+
+    def removeRunFiles(self, p_simConfig):
+        """ Remove the route files of a run written by :meth:`prepareRun`,
+        files shared by all runs are kept
+
+        Args:
+            p_simConfig (dict): simulation configuration of the run
+        """
+        if p_simConfig is self._sim_config:
+            return
+        for key in ("routefile", "backgroundroutefile"):
+            l_file = os.path.join(p_simConfig.get("resourcedir"),
+                                  p_simConfig.get(key))
+            if os.path.isfile(l_file):
+                os.remove(l_file)
+
+    def runSimConfig(self, i_run):
+        """ Simulation configuration of a run. When routes are prefetched
+        and demand is generated every run gets its own route file, so the
+        demand of upcoming runs can be written ahead.
+
+        Args:
+            i_run (int): run number
+
+        Returns:
+            dict: simulation part of the configuration
+        """
+        route_file = os.path.join(self._sim_config.get("resourcedir"),
+                                  self._sim_config.get("routefile"))
+        if not self._prefetch or (os.path.isfile(route_file) and
+                                  self._sim_config.get("forceroutefile")):
+            return self._sim_config
+        l_simConfig = dict(self._sim_config)
+        l_simConfig["routefile"] = "run{}.{}".format(
+            i_run, self._sim_config.get("routefile"))
+        l_simConfig["backgroundroutefile"] = "run{}.{}".format(
+            i_run, self._sim_config.get("backgroundroutefile"))
+        return l_simConfig
+
+    def prepareBackground(self, p_simConfig, p_force=False):
+        """ Generate the background traffic of a run, unless it exists and
+        the route files are forced
+
+        Args:
+            p_simConfig (dict): simulation configuration of the run
+            p_force (bool): generate even if the file exists
+        """
+        if not p_simConfig.get("backgroundvehicles"):
+            return
+        background_file = os.path.join(p_simConfig.get("resourcedir"),
+                                       p_simConfig.get("backgroundroutefile"))
+        if (p_force or not os.path.isfile(background_file)
+                or not p_simConfig.get("forceroutefile")):
+            generateBackgroundDemand(p_simConfig.get("backgroundvehicles"),
+                                     p_simConfig.get("backgroundperiod"),
+                                     p_simConfig.get("resourcedir"),
+                                     p_simConfig.get("backgroundroutefile"))
+
+    def prepareRun(self, i_run):
+        """ Generate the demand of a run and start computing its phase 2
+        routes in the process pool
+
+        Args:
+            i_run (int): run number
+        """
+        if i_run in self._pending or i_run >= self._sim_config.get("runs"):
+            return
+        l_simConfig = self.runSimConfig(i_run)
+        if l_simConfig is not self._sim_config:
+            generatePsvDemand(self._sim_config.get("vehicles"),
+                              self._sim_config.get("resourcedir"),
+                              l_simConfig.get("routefile"))
+        self.prepareBackground(l_simConfig, l_simConfig is not self._sim_config)
+        l_routes = Phase2Routes(self, l_simConfig.get("routefile"),
+                                self._executor)
+        self._pending[i_run] = (l_simConfig,
+                                self.submitPhase2Routings(l_routes))
 
     def run(self, i_run):
         """ Runs the simulation on both SUMO and Python layers
@@ -58,7 +211,7 @@ class Runtime(object):
         """
         # if there is a run configuration loaded use it to populate
         # parkingspaces in environment otherwise initialize new
-        if not self._config.getRunCfg(str(i_run)):
+        if self._config.runCfgSummary(i_run) is None:
             if self._sim_config.get("verbose"):
                 print("* no run cfg found. Initializing random parking spaces.")
             self._environment.initParkingSpaces(i_run)
@@ -73,13 +226,32 @@ class Runtime(object):
         # this simulation run using the given number of parking search vehicles
         route_file = os.path.join(self._sim_config.get("resourcedir"),
                                   self._sim_config.get("routefile"))
-        if not (os.path.isfile(route_file) and self._sim_config.get("forceroutefile")):
-            generatePsvDemand(self._sim_config.get("vehicles"),
-                              self._sim_config.get("resourcedir"),
-                              self._sim_config.get("routefile"))
+        # demand generated for this run
+        l_generated = not (os.path.isfile(route_file) and
+                           self._sim_config.get("forceroutefile"))
+        l_pendingRoutes = None
+        if self._prefetch:
+            # demand and routes of this and the next runs are computed in
+            # the background
+            for i_next in xrange(i_run, i_run + self._prefetch + 1):
+                self.prepareRun(i_next)
+            l_simConfig, l_pendingRoutes = self._pending.pop(i_run)
+            self._current = l_simConfig
+        else:
+            l_simConfig = self._sim_config
+            if l_generated:
+                generatePsvDemand(self._sim_config.get("vehicles"),
+                                  self._sim_config.get("resourcedir"),
+                                  self._sim_config.get("routefile"))
+            self.prepareBackground(l_simConfig)
+
+        # shared phase 1 prefix, keyed by network and demand
+        l_checkpoint = None
+        if self._sim_config.get("checkpointphase1"):
+            l_checkpoint = Phase1Checkpoint(l_simConfig, l_generated)
 
         # start sumo as a subprocess otherwise it wont work (because reasons)
-        l_sumoProcess = open_sumo(self._sim_config)
+        l_sumoProcess = open_sumo(l_simConfig)
 
         # execute the TraCI control loop
         traci.init(self._sim_config.get("sumoport"))
@@ -87,11 +259,43 @@ class Runtime(object):
         # internal clock variable, start with 0
         step = 0
 
-        # create empty list for parking search vehicles
+        # create empty list for parking search vehicles, their state is kept
+        # in the fleet's arrays
         l_parkingSearchVehicles = []
+        l_fleet = VehicleFleet()
+        # only vehicles whose state can change are updated at a step
+        l_scheduler = UpdateScheduler()
+        l_maneuverDuration = self._vehicle_config["parking"]["duration"]
+        # route version of every vehicle when its edge counts were stored
+        l_countedRoutes = {}
+        # searching vehicles within the distance share their knowledge of
+        # parking spaces
+        l_communication = None
+        if self._environment.knowledge is not None:
+            l_communication = CommunicationGraph(
+                self._sim_config.get("communicationdistance"))
 
         # compute phase 2 routing information (individual and cooperative)
-        l_individualRoutes, l_cooperativeRoutes = self.computePhase2Routings()
+        if l_pendingRoutes is None:
+            l_pendingRoutes = self.submitPhase2Routings(Phase2Routes(self))
+        l_individualRoutes, l_cooperativeRoutes = \
+            (x.result() for x in l_pendingRoutes)
+        self.logPhase2Telemetry(i_run, l_pendingRoutes)
+        l_searchVehicleIDs = frozenset(l_individualRoutes)
+
+        # branch from the stored end of phase 1 if there is one, vehicles that
+        # departed before are recreated with this run's routes
+        if l_checkpoint is not None and l_checkpoint.exists():
+            step, l_departed = l_checkpoint.restore()
+            if self._sim_config.get("verbose"):
+                print("* restored phase 1 checkpoint {} at step {}".format(
+                    l_checkpoint.key, step))
+            for vehID, timeCreated in l_departed:
+                psv = self.createParkingSearchVehicle(vehID, i_run,
+                    timeCreated, l_individualRoutes, l_cooperativeRoutes,
+                    l_fleet)
+                l_parkingSearchVehicles.append(psv)
+                l_scheduler.add(psv.index, psv.activity)
 
         self.initPOI()
         self.updatePOIColors()
@@ -114,31 +318,41 @@ class Runtime(object):
             # TODO: arr list is always empty? Possible bug i.e. we dont set
             # vehicles to arrived or something
             arr_list = traci.simulation.getArrivedIDList()
-            l_departedVehicles = (x for x in dep_list if x not in arr_list)
+            # background traffic is left to SUMO, only vehicles with phase 2
+            # routes get a Python representation
+            l_departedVehicles = (x for x in dep_list
+                                  if x in l_searchVehicleIDs and
+                                  x not in arr_list)
 
             # TODO: from one debugging session I got the order of
             # parkinSearchVehicles = [veh0, veh1, veh3, veh2, veh4]
             # probably arr_list is not given in order...
-            l_parkingSearchVehicles.extend(
-                    ParkingSearchVehicle(vehID, self._environment,
-                        self._config, i_run, step,
-                        self._environment._net.getEdge(l_individualRoutes[vehID][-1]).getToNode().getID(),
-                        l_cooperativeRoutes[vehID],
-                        l_individualRoutes[vehID])
-                    for vehID in l_departedVehicles)
-
-            # update status of all vehicles
-            for psv in (v for v in l_parkingSearchVehicles if v.is_parked() is False):
+            for vehID in l_departedVehicles:
+                psv = self.createParkingSearchVehicle(vehID, i_run, step,
+                    l_individualRoutes, l_cooperativeRoutes, l_fleet)
+                l_parkingSearchVehicles.append(psv)
+                l_scheduler.add(psv.index, psv.activity)
+
+            # update status of all vehicles whose state can change, cruising
+            # vehicles only once they entered another edge
+            for i_vehicle in l_scheduler.due(step):
+                psv = l_fleet[i_vehicle]
+                if l_scheduler.polled(i_vehicle) and not psv.advanced():
+                    continue
+                l_activity = psv.activity
                 psv.update(step)
-                env_edges = self._environment._roadNetwork["edges"]
-                for edge in env_edges:
-                    oppositeEdgeID = env_edges[edge]["oppositeEdgeID"]
-                    visitCount = (psv.traversed_route.count(str(edge)) +
-                                  psv.traversed_route.count(oppositeEdgeID))
-                    plannedCount = (psv.active_route.count(str(edge)) +
-                                    psv.active_route.count(oppositeEdgeID))
-                    env_edges[edge]["visitCount"][psv.name] = visitCount
-                    env_edges[edge]["plannedCount"][psv.name] = plannedCount
+                if psv.activity != l_activity:
+                    l_scheduler.move(i_vehicle, psv.activity,
+                                     psv.timeBeginManeuvering +
+                                     l_maneuverDuration + 1)
+                    if (l_communication is not None and
+                            psv.activity == state.PARKED):
+                        self._environment.knowledge.forget(i_vehicle)
+
+                # visit and planned counts only change with the route
+                if l_countedRoutes.get(i_vehicle) != psv.routeVersion:
+                    l_countedRoutes[i_vehicle] = psv.routeVersion
+                    self.updateEdgeCounts(psv)
 
                 # if last edge, choose next possible edges to continue
                 if psv.last_edge():
@@ -173,22 +387,32 @@ class Runtime(object):
 
                     psv.append_route(next_link)
 
+            if l_communication is not None:
+                self.shareKnowledge(l_fleet, l_communication)
+
+            # store the last state before the first vehicle left phase 1
+            if l_checkpoint is not None and not l_checkpoint.done:
+                l_checkpoint.record(step, l_parkingSearchVehicles)
+
             # break the while-loop if all SUMO vehicles have parked
-            if remaining_vehicles(l_parkingSearchVehicles) == 0:
+            if l_scheduler.remaining == 0:
                 if self._sim_config.get("verbose"):
                     print("SUCCESSFULLY PARKED:",
-                          parked_vehicles(l_parkingSearchVehicles), "OUT OF",
+                          parked_vehicles(l_fleet), "OUT OF",
                                           self._sim_config.get("vehicles"))
                 break
 
         sumo_close(l_sumoProcess)
+        self.removeRunFiles(l_simConfig)
+        self._current = None
+        self._config.finishRunCfg(i_run)
 
-        total_parked = parked_vehicles(l_parkingSearchVehicles)
-        searchTimes = [veh.search_time for veh in l_parkingSearchVehicles]
-        searchDistances = [veh.search_distance for veh in l_parkingSearchVehicles]
-        walkingTimes = [veh.walk_time for veh in l_parkingSearchVehicles]
-        walkingDistances = [veh.walk_distance for veh in l_parkingSearchVehicles]
-        searchPhases = [veh.search_phase for veh in l_parkingSearchVehicles]
+        total_parked = parked_vehicles(l_fleet)
+        searchTimes = l_fleet.values("searchTime")
+        searchDistances = l_fleet.values("searchDistance")
+        walkingTimes = l_fleet.values("walkTime")
+        walkingDistances = l_fleet.values("walkDistance")
+        searchPhases = l_fleet.values("phase")
 
         # TODO: this should probably just return vehicles and leave processing
         # to other instances
@@ -199,6 +423,59 @@ class Runtime(object):
                 walkingDistances,
                 searchPhases)
 
+    def createParkingSearchVehicle(self, vehID, i_run, step, individualRoutes,
+                                   cooperativeRoutes, fleet=None):
+        """ Create the Python representation of a departed vehicle
+
+        Args:
+            vehID (str): vehicle ID
+            i_run (int): run number
+            step (int): departure step
+            individualRoutes (dict): individual phase 2 routes by vehicle ID
+            cooperativeRoutes (dict): cooperative phase 2 routes by vehicle ID
+            fleet (VehicleFleet): fleet holding the vehicle's state
+
+        Returns:
+            ParkingSearchVehicle: vehicle object
+        """
+        return ParkingSearchVehicle(vehID, self._environment,
+            self._config, i_run, step,
+            self._environment._net.getEdge(individualRoutes[vehID][-1]).getToNode().getID(),
+            cooperativeRoutes[vehID],
+            individualRoutes[vehID],
+            fleet)
+
+    def shareKnowledge(self, fleet, communication):
+        """ Merge the parking knowledge of searching vehicles that are close
+        enough to communicate
+
+        Args:
+            fleet (VehicleFleet): vehicles of the run
+            communication (CommunicationGraph): neighbour graph of the
+                previous step
+        """
+        communication.update(dict(
+            (i_vehicle, fleet[i_vehicle].position)
+            for i_vehicle in fleet.inState(state.SEARCHING).tolist()))
+        self._environment.knowledge.share(communication.groups())
+
+    def updateEdgeCounts(self, psv):
+        """ Store how often a vehicle traversed and plans to traverse every
+        edge (or its opposite edge) for the phase 3 edge costs
+
+        Args:
+            psv: parking search vehicle
+        """
+        env_edges = self._environment._roadNetwork["edges"]
+        for edge in env_edges:
+            oppositeEdgeID = env_edges[edge]["oppositeEdgeID"]
+            visitCount = (psv.traversed_route.count(str(edge)) +
+                          psv.traversed_route.count(oppositeEdgeID))
+            plannedCount = (psv.active_route.count(str(edge)) +
+                            psv.active_route.count(oppositeEdgeID))
+            env_edges[edge]["visitCount"][psv.name] = visitCount
+            env_edges[edge]["plannedCount"][psv.name] = plannedCount
+
     def edgeCost(self, psv, edge):
         """ Calculate cost of an edge for a specific parking search vehicle.
         This is Phase 3 search strategy.
@@ -272,23 +549,35 @@ class Runtime(object):
 
     def computePhase2Routings(self):
         """ Computes phase 2 routing """
-        routes = Phase2Routes(self)
+        l_individualRoutes, l_cooperativeRoutes = (
+            x.result() for x in self.submitPhase2Routings(Phase2Routes(self)))
+
+        # For tests
+        # assert routes.routes(1.0, penalty=0.2) == routes.cooperativeRoutes(0.2)
+        # assert routes.routes(0.0, penalty=0.2) == l_cooperativeRoutes
+
+        return l_individualRoutes, l_cooperativeRoutes
+
+    def submitPhase2Routings(self, routes):
+        """ Start computing phase 2 routing
+
+        Args:
+            routes (Phase2Routes): demand to route
+
+        Returns:
+            tuple: pending individual and cooperative routes
+        """
         cooperation = self._sim_config["coopratioPhase2"]
         # TODO: this is still hardcoded
         if cooperation == 1.0:
-            l_cooperativeRoutes = routes.routes(1.0, penalty=0.2)
+            l_cooperativeRoutes = routes.submitRoutes(1.0, penalty=0.2)
             l_individualRoutes = l_cooperativeRoutes
         elif cooperation == 0.0:
-            l_individualRoutes = routes.routes(0.0, penalty=0)
+            l_individualRoutes = routes.submitRoutes(0.0, penalty=0)
             l_cooperativeRoutes = l_individualRoutes
         else:
-            l_cooperativeRoutes = routes.routes(cooperation, penalty=0.2)
-            l_individualRoutes = routes.individualRoutes()
-
-        # For tests
-        # assert routes.routes(1.0, penalty=0.2) == routes.cooperativeRoutes(0.2)
-        # assert routes.routes(0.0, penalty=0.2) == l_cooperativeRoutes
-
+            l_cooperativeRoutes = routes.submitRoutes(cooperation, penalty=0.2)
+            l_individualRoutes = routes.submitIndividualRoutes()
         return l_individualRoutes, l_cooperativeRoutes
 
 
@@ -296,22 +585,28 @@ def remaining_vehicles(psvList):
     """ Get number of remaining searching vehicles.
 
     Args:
-        psvList (list): List of parking search vehicle objects
+        psvList (list): List of parking search vehicle objects or a
+            VehicleFleet
 
     Returns:
         int: Number of remaining vehicles which are not parked
     """
+    if isinstance(psvList, VehicleFleet):
+        return psvList.remaining()
     return sum(1 for psv in psvList if not psv.is_parked())
 
 def parked_vehicles(psvList):
     """ Get number of successfully parked vehicles.
 
     Args:
-        psvList (list): List of parking search vehicle objects
+        psvList (list): List of parking search vehicle objects or a
+            VehicleFleet
 
     Returns:
         int: Number of parked vehicles
     """
+    if isinstance(psvList, VehicleFleet):
+        return psvList.parked()
     return sum(1 for psv in psvList if psv.is_parked())
 
 def open_sumo(sim_config):
@@ -327,14 +622,16 @@ def open_sumo(sim_config):
     """
     # run sumo with gui or headless, depending on the --gui flag
     sumo_binary = checkBinary('sumo') if sim_config.get("headless") else checkBinary('sumo-gui')
-    route_file = sim_config.get("routefile")
+    route_files = [sim_config.get("routefile")]
+    if sim_config.get("backgroundvehicles"):
+        route_files.append(sim_config.get("backgroundroutefile"))
     resource_dir = sim_config.get("resourcedir")
     return subprocess.Popen(
                 [sumo_binary,
                  "-n",
                  os.path.join(resource_dir, "reroute.net.xml"),
                  "-r",
-                 os.path.join(resource_dir, route_file),
+                 ",".join(os.path.join(resource_dir, x) for x in route_files),
                  "--tripinfo-output",
                  os.path.join(resource_dir, "tripinfo.xml"),
                  "--gui-settings-file",
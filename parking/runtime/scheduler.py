@@ -0,0 +1,118 @@
+from __future__ import print_function
+
+from heapq import heappush, heappop
+
+from parking.vehicle.fleet import state
+
+# vehicles updated at every step
+EVERY_STEP = (state.SEARCHING, state.FOUND_PARKING_SPACE)
+# vehicles whose state only changes at edge boundaries, the caller checks
+# whether they advanced on their route before updating them
+POLLED = (state.CRUISING,)
+# vehicles sleeping until a wake-up time
+TIMED = (state.MANEUVERING_TO_PARK,)
+
+
+class UpdateScheduler(object):
+
+    def __init__(self):
+        """ Per step work list of the vehicles of a run.
+
+        Vehicles are kept in one active set per activity state. Searching
+        vehicles and vehicles approaching a found space are due at every
+        step, cruising vehicles are due but only need an update once they
+        advanced on their route, maneuvering vehicles sleep until their
+        wake-up time and parked vehicles are dropped.
+
+        Vehicles are referred to by their row index in the
+        :class:`parking.vehicle.fleet.VehicleFleet`, due vehicles are returned
+        in that order so the simulation does not depend on the scheduling.
+        """
+        self._members = dict((activity, set()) for activity in
+                             EVERY_STEP + POLLED + TIMED)
+        self._activityOf = {}
+        self._wakeups = []
+        self._wakeupOf = {}
+        # sleepers past their wake-up time, due until they change state
+        self._awake = set()
+        self._remaining = 0
+
+    @property
+    def remaining(self):
+        """ Number of scheduled vehicles which are not parked """
+        return self._remaining
+
+    def add(self, p_index, p_activity, p_wakeup=None):
+        """ Schedule a vehicle
+
+        Args:
+            p_index (int): row index of the vehicle
+            p_activity (int): its activity state
+            p_wakeup (int): step to wake up at for timed states
+        """
+        if p_index in self._activityOf:
+            raise BaseException("Vehicle {} is already scheduled".format(
+                p_index))
+        self._activityOf[p_index] = p_activity
+        if p_activity == state.PARKED:
+            return
+        self._remaining += 1
+        self._enter(p_index, p_activity, p_wakeup)
+
+    def _enter(self, p_index, p_activity, p_wakeup):
+        self._members[p_activity].add(p_index)
+        if p_activity in TIMED:
+            if p_wakeup is None:
+                raise BaseException("Vehicle {} needs a wake-up time in "
+                                    "state {}".format(p_index, p_activity))
+            self._wakeupOf[p_index] = p_wakeup
+            heappush(self._wakeups, (p_wakeup, p_index))
+
+    def move(self, p_index, p_activity, p_wakeup=None):
+        """ Move a vehicle to another activity state
+
+        Args:
+            p_index (int): row index of the vehicle
+            p_activity (int): its new activity state
+            p_wakeup (int): step to wake up at for timed states
+        """
+        l_previous = self._activityOf[p_index]
+        if l_previous == p_activity:
+            return
+        self._activityOf[p_index] = p_activity
+        if l_previous == state.PARKED:
+            self._remaining += 1
+        else:
+            self._members[l_previous].discard(p_index)
+            # a stale heap entry is skipped when popped
+            self._wakeupOf.pop(p_index, None)
+            self._awake.discard(p_index)
+        if p_activity == state.PARKED:
+            self._remaining -= 1
+            return
+        self._enter(p_index, p_activity, p_wakeup)
+
+    def polled(self, p_index):
+        """ Check whether a vehicle only needs an update once it advanced on
+        its route """
+        return self._activityOf[p_index] in POLLED
+
+    def due(self, p_step):
+        """ Vehicles whose state can change at a step
+
+        Args:
+            p_step (int): current simulation step
+
+        Returns:
+            list: row indices in ascending order
+        """
+        while self._wakeups and self._wakeups[0][0] <= p_step:
+            l_wakeup, l_index = heappop(self._wakeups)
+            if self._wakeupOf.get(l_index) == l_wakeup:
+                del self._wakeupOf[l_index]
+                self._awake.add(l_index)
+        l_due = list(self._awake)
+        for activity in EVERY_STEP + POLLED:
+            l_due.extend(self._members[activity])
+        l_due.sort()
+        return l_due
@@ -0,0 +1,213 @@
+from __future__ import print_function
+
+import numpy
+
+from parking.common.enum import Enum
+
+# Activity states of a vehicle
+state = Enum(
+    ["CRUISING",
+     "SEARCHING",
+     "FOUND_PARKING_SPACE",
+     "MANEUVERING_TO_PARK",
+     "PARKED"]
+)
+
+# -1001 is used for unset simulation times and positions like in the SUMO
+# examples, NaN (UNSET for integer results) for results that are only known
+# once a vehicle has parked
+UNSET = int(numpy.iinfo(numpy.int64).min)
+
+COLUMNS = (
+    ("speed", numpy.float64, 0.0),
+    ("edge", numpy.int32, -1),
+    ("lanePosition", numpy.float64, -1001.0),
+    ("activity", numpy.int8, state.CRUISING),
+    ("phase", numpy.int8, 1),
+    ("timeCreated", numpy.int64, -1001),
+    ("timeBeginSearch", numpy.int64, -1001),
+    ("timeBeginManeuvering", numpy.int64, -1001),
+    ("timeParked", numpy.int64, -1001),
+    ("coopPhase2", numpy.bool_, False),
+    ("coopPhase3", numpy.bool_, False),
+    ("searching", numpy.bool_, True),
+    # difference of simulation times, an int like in the results files
+    ("searchTime", numpy.int64, UNSET),
+    ("searchDistance", numpy.float64, numpy.nan),
+    ("walkTime", numpy.float64, numpy.nan),
+    ("walkDistance", numpy.float64, numpy.nan),
+)
+
+
+class VehicleFleet(object):
+
+    def __init__(self, p_capacity=64):
+        """ Struct of arrays holding the state of all parking search vehicles
+        of a run.
+
+        Every column of :data:`COLUMNS` is a NumPy array indexed by the
+        vehicle's position in the fleet, so counts and phase transitions over
+        all vehicles are single array operations. Edge IDs are interned, the
+        edge column holds indices into :attr:`edgeIDs`. Per vehicle objects
+        like :class:`parking.vehicle.parkingSearchVehicle.ParkingSearchVehicle`
+        are thin views reading and writing their row.
+
+        Args:
+            p_capacity (int): initial number of rows, doubled when exceeded
+        """
+        self._size = 0
+        self._capacity = max(1, p_capacity)
+        for name, dtype, default in COLUMNS:
+            setattr(self, name, numpy.full(self._capacity, default, dtype))
+        self.names = []
+        self.vehicles = []
+        self._indexOf = {}
+        self.edgeIDs = []
+        self._edgeIndexOf = {}
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(self.vehicles)
+
+    def __getitem__(self, p_index):
+        return self.vehicles[p_index]
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, dtype, default in COLUMNS:
+            l_column = numpy.full(self._capacity, default, dtype)
+            l_column[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, l_column)
+
+    def add(self, p_name, p_vehicle=None):
+        """ Append a row for a vehicle
+
+        Args:
+            p_name (str): vehicle ID
+            p_vehicle: per vehicle view of the row, returned by indexing
+
+        Returns:
+            int: row index of the vehicle
+        """
+        if p_name in self._indexOf:
+            raise BaseException("Vehicle {} is already part of the fleet"
+                                "".format(p_name))
+        if self._size == self._capacity:
+            self._grow()
+        l_index = self._size
+        self._size += 1
+        self.names.append(p_name)
+        self.vehicles.append(p_vehicle)
+        self._indexOf[p_name] = l_index
+        return l_index
+
+    def index(self, p_name):
+        """ Row index of a vehicle ID """
+        return self._indexOf[p_name]
+
+    def edgeIndex(self, p_edgeID):
+        """ Interned index of an edge ID, "" is -1 """
+        if not p_edgeID:
+            return -1
+        l_index = self._edgeIndexOf.get(p_edgeID)
+        if l_index is None:
+            l_index = len(self.edgeIDs)
+            self.edgeIDs.append(p_edgeID)
+            self._edgeIndexOf[p_edgeID] = l_index
+        return l_index
+
+    def edgeID(self, p_index):
+        """ Edge ID of an interned index, "" for -1 """
+        if p_index < 0:
+            return ""
+        return self.edgeIDs[p_index]
+
+    def column(self, p_name):
+        """ Column restricted to the vehicles of the fleet (no copy) """
+        return getattr(self, p_name)[:self._size]
+
+    def values(self, p_name):
+        """ Column as list of Python values, NaN and UNSET as None """
+        l_column = self.column(p_name)
+        if l_column.dtype.kind == 'f':
+            return [None if x != x else x for x in l_column.tolist()]
+        if l_column.dtype == numpy.int64:
+            return [None if x == UNSET else x for x in l_column.tolist()]
+        return l_column.tolist()
+
+    def inState(self, p_activity):
+        """ Row indices of the vehicles in an activity state """
+        return numpy.flatnonzero(self.column("activity") == p_activity)
+
+    def unparked(self):
+        """ Row indices of the vehicles that have not parked yet """
+        return numpy.flatnonzero(self.column("activity") != state.PARKED)
+
+    def transition(self, p_indices, p_activity):
+        """ Move vehicles to an activity state
+
+        Args:
+            p_indices: row indices or boolean mask of the vehicles
+            p_activity (int): new activity state
+        """
+        self.column("activity")[p_indices] = p_activity
+
+    def maneuverDone(self, p_timestep, p_duration):
+        """ Row indices of the vehicles that finished maneuvering into their
+        parking space at a time step
+
+        Args:
+            p_timestep (int): current simulation time
+            p_duration (int): time needed to maneuver into a space
+        """
+        return numpy.flatnonzero(
+            (self.column("activity") == state.MANEUVERING_TO_PARK) &
+            (p_timestep > self.column("timeBeginManeuvering") + p_duration))
+
+    def remaining(self):
+        """ Number of vehicles which are not parked """
+        return self._size - self.parked()
+
+    def parked(self):
+        """ Number of vehicles which are parked """
+        return int(numpy.count_nonzero(
+            self.column("activity") == state.PARKED))
+
+
+def fleetColumn(p_column, p_edge=False):
+    """ Property reading and writing a vehicle's row of a fleet column
+
+    The owning object needs ``_fleet`` and ``_index`` attributes. Values are
+    returned as Python scalars, NaN and UNSET as None; None is stored as the
+    column default.
+
+    Args:
+        p_column (str): name of the column
+        p_edge (bool): column holds interned edge IDs
+
+    Returns:
+        property: accessor for the column
+    """
+    if p_edge:
+        def getter(self):
+            return self._fleet.edgeID(int(self._fleet.edge[self._index]))
+
+        def setter(self, p_value):
+            self._fleet.edge[self._index] = self._fleet.edgeIndex(p_value)
+    else:
+        # unset (None) values are stored as the column default, i.e. NaN
+        # or UNSET for results
+        l_default = dict((name, default) for name, dtype, default
+                         in COLUMNS)[p_column]
+
+        def getter(self):
+            l_value = getattr(self._fleet, p_column)[self._index].item()
+            return None if l_value != l_value or l_value == UNSET \
+                else l_value
+
+        def setter(self, p_value):
+            getattr(self._fleet, p_column)[self._index] = \
+                l_default if p_value is None else p_value
+    return property(getter, setter, doc="fleet column {}".format(p_column))
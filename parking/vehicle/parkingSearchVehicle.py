@@ -3,19 +3,30 @@ import random
 
 import traci
 
-from parking.common.enum import Enum
-
-# Activity states of a vehicle
-state = Enum(
-    ["CRUISING",
-     "SEARCHING",
-     "FOUND_PARKING_SPACE",
-     "MANEUVERING_TO_PARK",
-     "PARKED"]
-)
+from parking.vehicle.fleet import VehicleFleet
+from parking.vehicle.fleet import fleetColumn
+from parking.vehicle.fleet import state
 
 
 class ParkingSearchVehicle(object):
+
+    # per step and result state lives in the fleet's arrays
+    _speed = fleetColumn("speed")
+    _currentEdgeID = fleetColumn("edge", p_edge=True)
+    _currentLanePosition = fleetColumn("lanePosition")
+    _activity = fleetColumn("activity")
+    _search_phase = fleetColumn("phase")
+    _timeCreated = fleetColumn("timeCreated")
+    _timeBeginSearch = fleetColumn("timeBeginSearch")
+    _timeBeginManeuvering = fleetColumn("timeBeginManeuvering")
+    _timeParked = fleetColumn("timeParked")
+    _driverCooperatesPhase2 = fleetColumn("coopPhase2")
+    _driverCooperatesPhase3 = fleetColumn("coopPhase3")
+    _isSearchingVehicle = fleetColumn("searching")
+    _search_time = fleetColumn("searchTime")
+    _search_distance = fleetColumn("searchDistance")
+    _walk_time = fleetColumn("walkTime")
+    _walk_distance = fleetColumn("walkDistance")
     def __init__(self,
                  p_name,
                  p_environment,
@@ -24,7 +35,8 @@ class ParkingSearchVehicle(object):
                  p_timestep=-1001,
                  p_destinationNodeID="",
                  p_cooperativeRoute=None,
-                 p_individualRoute=None):
+                 p_individualRoute=None,
+                 p_fleet=None):
         """ Initializer for searching vehicles, initializes vehicle attributes
 
         Args:
@@ -38,11 +50,15 @@ class ParkingSearchVehicle(object):
             p_destinationNodeID (str): Destination ID
             p_cooperativeRoute (list): predefined route
             p_individualRoute (list): predefined route
+            p_fleet (VehicleFleet): fleet holding the vehicle's state, a
+                fleet of its own if not given
         """
         self._environment = p_environment
         self._config = p_config
 
         self._name = p_name
+        self._fleet = p_fleet if p_fleet is not None else VehicleFleet(1)
+        self._index = self._fleet.add(p_name, self)
         self._speed = 0.0
 
         # information about relevant simulation times; -1001 seems to be used
@@ -133,15 +149,23 @@ class ParkingSearchVehicle(object):
             self._activity = l_vcfg.get("activity")
             self._isSearchingVehicle = l_vcfg.get("isSearchingVehicle")
 
-        self._current_route = []
+        # route bookkeeping: every edge the vehicle was routed over is
+        # appended to _route, SUMO's route is _route[_routeBase:] and
+        # _currentRouteIndex is SUMO's index into it. The traversed and active
+        # slices are only rebuilt when the index or the route changes.
+        self._route = []
+        self._routeBase = 0
         self._currentRouteIndex = -1
+        self._routeChanged = False
+        # incremented whenever the slices are rebuilt
+        self._routeVersion = 0
         self._activeRoute = []
         self._traversedRoute = []
         if self._driverCooperatesPhase2:
-            traci.vehicle.setRoute(self._name, self._cooperative_route)
+            self._setRoute(self._cooperative_route)
             self._destinationEdgeID = self._cooperative_route[-1]
         else:
-            traci.vehicle.setRoute(self._name, self._individual_route)
+            self._setRoute(self._individual_route)
             self._destinationEdgeID = self._individual_route[-1]
 
     def __eq__(self, p_other):
@@ -178,20 +202,12 @@ class ParkingSearchVehicle(object):
         except KeyError:
             self._oppositeEdgeID = ""
 
-        self._current_route = traci.vehicle.getRoute(self._name)
-        self._currentRouteIndex = traci.vehicle.getRouteIndex(self._name)
-
-        # create a copy of the _current_route for further modification
-        # and divide current route into remaining segments ('active') and
-        # traversed segments
-        self._activeRoute = self._current_route[:]
-        self._traversedRoute = []
-        # TODO: sumo returns -1 if vehicle has not departed solve this in a
-        # better way without this check i.e. check at the beginning of update
-        # if vehicle departed or not.
-        if self._currentRouteIndex > 0:
-            self._traversedRoute = self._activeRoute[:self._currentRouteIndex]
-            self._activeRoute = self._activeRoute[self._currentRouteIndex:]
+        # the route itself only changes through this object, SUMO just
+        # advances the index at edge boundaries
+        l_routeIndex = traci.vehicle.getRouteIndex(self._name)
+        if l_routeIndex != self._currentRouteIndex or self._routeChanged:
+            self._currentRouteIndex = l_routeIndex
+            self._syncRoute()
 
         # if the vehicle has turned due to a seen opposite parking space,
         # (i.e. as soon as the current edge equals the previoulsy opposite edge)
@@ -240,7 +256,54 @@ class ParkingSearchVehicle(object):
             return self._park()
         return 0
 
+    def _routeCursor(self):
+        """ Position of the current edge in the route buffer """
+        # TODO: sumo returns -1 if vehicle has not departed solve this in a
+        # better way without this check i.e. check at the beginning of update
+        # if vehicle departed or not.
+        return self._routeBase + max(self._currentRouteIndex, 0)
+
+    def _syncRoute(self):
+        """ Divide the route into remaining segments ('active') and traversed
+        segments of SUMO's current route """
+        l_cursor = self._routeCursor()
+        self._traversedRoute = self._route[self._routeBase:l_cursor]
+        self._activeRoute = self._route[l_cursor:]
+        self._routeChanged = False
+        self._routeVersion += 1
+
+    def _setRoute(self, p_route):
+        """ Replace the whole route in SUMO and in the buffer """
+        traci.vehicle.setRoute(self._name, p_route)
+        self._route = list(p_route)
+        self._routeBase = 0
+        self._routeChanged = True
+
+    def _setActiveRoute(self, p_activeRoute):
+        """ Replace the route ahead of the current edge. SUMO restarts the
+        route index at the current edge, which is the first edge of the
+        active route. """
+        traci.vehicle.setRoute(self._name, p_activeRoute)
+        l_cursor = self._routeCursor()
+        del self._route[l_cursor:]
+        self._route.extend(p_activeRoute)
+        self._routeBase = l_cursor
+        self._currentRouteIndex = 0
+        self._syncRoute()
+        # let the next update pick up the new route
+        self._routeChanged = True
+
+    @property
+    def _current_route(self):
+        """ SUMO's current route """
+        return self._route[self._routeBase:]
+
     def _search(self):
+        # remember what is seen on the current edge, shared with the
+        # communication group
+        l_knowledge = self._environment.knowledge
+        if l_knowledge is not None:
+            l_knowledge.observe(self._index, self._currentEdgeID)
         # if parking space is found ahead on current edge, change vehicle
         # status accordingly
         if ((self._timestep >= self._timeBeginSearch)
@@ -289,15 +352,15 @@ class ParkingSearchVehicle(object):
         self._activity = state.PARKED
 
         if "entry" in self._destinationEdgeID:
-            l_distanceRoad = traci.simulation.getDistanceRoad(
+            l_distanceRoad = self._environment.distanceRoad(
                 self._destinationEdgeID, self._environment._roadNetwork[
                     "edges"][self._destinationEdgeID]["length"],
-                self._currentEdgeID, self._currentLanePosition, True)
+                self._currentEdgeID, self._currentLanePosition)
         else:
-            l_distanceRoad = traci.simulation.getDistanceRoad(
+            l_distanceRoad = self._environment.distanceRoad(
                 self._currentEdgeID, self._currentLanePosition,
                 self._destinationEdgeID, self._environment._roadNetwork[
-                    "edges"][self._destinationEdgeID]["length"], True)
+                    "edges"][self._destinationEdgeID]["length"])
 
         l_walkingDistance = l_distanceRoad
         l_walkingTime = l_distanceRoad / 1.111  # assume 4 km/h walking speed
@@ -334,6 +397,8 @@ class ParkingSearchVehicle(object):
                     # (from now, parking space is no longer available to
                     # other vehicles)
                     ps.assignToVehicle(self._name)
+                    if self._environment.knowledge is not None:
+                        self._environment.knowledge.occupy(self._index, ps)
                     self._assignedParkingPosition = ps.position
                     return True
         return False
@@ -363,17 +428,17 @@ class ParkingSearchVehicle(object):
                     # if an opposite parking space has been found,
                     # insert a loop to the active route (just once back
                     # and forth)
-                    self._activeRoute.insert(0, p_oppositeEdgeID)
-                    self._activeRoute.insert(0, self._currentEdgeID)
                     # communicate the modified active route to the
                     # vehicle via TraCI
-                    traci.vehicle.setRoute(self._name, self._activeRoute)
+                    self._setActiveRoute([self._currentEdgeID,
+                                          p_oppositeEdgeID] +
+                                         self._activeRoute)
                     return self._oppositeEdgeID
         return ""
 
     def last_edge(self):
         """ Check if vehicle is on the last segment of planned route """
-        if self._currentRouteIndex == len(self._current_route) - 1:
+        if self._currentRouteIndex == len(self._route) - self._routeBase - 1:
             if not self._search_phase == 3 and not self._lastEdgeBeforePhase3:
                 self._lastEdgeBeforePhase3 = self._currentEdgeID
             return True
@@ -382,10 +447,15 @@ class ParkingSearchVehicle(object):
     def append_route(self, p_edgeID):
         """ Add edge to vehicle active route and to vehicle representation in
         SUMO """
-        self._activeRoute.append(p_edgeID)
-        # TODO: Is adding a whole active route to SUMO ok to do like this? Is
-        # there a better way?
-        traci.vehicle.setRoute(self._name, self._activeRoute)
+        # TraCI has no way to extend a route, the active route starting at
+        # the current edge is the least that has to be sent
+        self._setActiveRoute(self._activeRoute + [p_edgeID])
+
+    def advanced(self):
+        """ Check whether the vehicle moved on on its route or got a new route
+        since the last update. Cruising vehicles only need an update then. """
+        return (self._routeChanged or self._currentRouteIndex !=
+                traci.vehicle.getRouteIndex(self._name))
 
     def is_parked(self):
         """ Check if vehicle has successfully parked """
@@ -402,7 +472,7 @@ class ParkingSearchVehicle(object):
     def cooperative_route(self, value):
         self._cooperative_route = value
         if self._driverCooperatesPhase2:
-            traci.vehicle.setRoute(self._name, self._cooperative_route)
+            self._setRoute(self._cooperative_route)
 
     @property
     def individual_route(self):
@@ -413,7 +483,7 @@ class ParkingSearchVehicle(object):
     def individual_route(self, value):
         self._individual_route = value
         if not self._driverCooperatesPhase2:
-            traci.vehicle.setRoute(self._name, self._individual_route)
+            self._setRoute(self._individual_route)
 
     @property
     def destination_edge_id(self):
@@ -437,9 +507,18 @@ class ParkingSearchVehicle(object):
 
     @active_route.setter
     def active_route(self, activeRoute):
+        # Python side only, like before; SUMO is not informed
+        l_cursor = self._routeCursor()
+        del self._route[l_cursor:]
+        self._route.extend(activeRoute)
         self._activeRoute = activeRoute
 
     def __getattr__(self, name):
+        # only called for missing attributes, a missing private one would
+        # otherwise recurse through hasattr
+        if name.startswith("_"):
+            raise AttributeError("{} has no attribute {}".format(
+                type(self).__name__, name))
         class_name = "_" + name
         if hasattr(self, class_name):
             return getattr(self, class_name)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+""" Benchmark of the neighbour discovery for V2V communication: all pairs
+comparison against the grid spatial hash and its NumPy batch path.
+
+Run from the repository root:
+
+    python3 tests/bench_communication.py [vehicles] [distance] [area]
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+import numpy
+
+from parking.runtime.communication import CommunicationGraph
+from parking.runtime.communication import grid_pairs, numpy_pairs
+
+
+def all_pairs(positions, distance):
+    """ O(n**2) comparison of the original mark_neighbours """
+    pairs = []
+    for veh_idx, (veh_x, veh_y) in enumerate(positions):
+        for oth_idx in range(veh_idx + 1, len(positions)):
+            oth_x, oth_y = positions[oth_idx]
+            if (abs(veh_x - oth_x) + abs(veh_y - oth_y)) < distance:
+                pairs.append((veh_idx, oth_idx))
+    return pairs
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    distance = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    area = float(sys.argv[3]) if len(sys.argv) > 3 else 2000.0
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, area), rng.uniform(0, area))
+                 for _ in range(num)]
+    array = numpy.array(positions)
+    print("{} vehicles, distance {}, area {}x{}".format(num, distance, area,
+                                                       area))
+    for label, fn, args in (("all pairs", all_pairs, positions),
+                            ("grid", grid_pairs, positions),
+                            ("numpy grid", numpy_pairs, array)):
+        repeat = 3
+        seconds = timeit.timeit(lambda: fn(args, distance), number=repeat)
+        print("{:<12} {:>10.2f} ms".format(label, seconds * 1e3 / repeat))
+
+    # steps of the incremental graph with a share of the vehicles moving
+    # up to 8.3 m, the others stand (queueing, maneuvering)
+    for share in (0.1, 0.67):
+        graph = CommunicationGraph(distance)
+        graph.update(dict(enumerate(positions)))
+        steps = 10
+        moves = []
+        current = list(positions)
+        for _ in range(steps):
+            current = [(x + rng.uniform(-8.3, 8.3), y + rng.uniform(-8.3, 8.3))
+                       if rng.random() < share else (x, y)
+                       for x, y in current]
+            moves.append(dict(enumerate(current)))
+        seconds = timeit.timeit(lambda: [graph.update(m) for m in moves],
+                                number=1)
+        print("{:<12} {:>10.2f} ms/step with {:.0%} moving".format(
+            "incremental", seconds * 1e3 / steps, share))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Build and query benchmark of the contraction hierarchy, on a bundled
+network or on a synthetic grid of city size that has no dense adjacency
+matrix.
+
+Run from the repository root:
+
+    python3 tests/bench_contraction_hierarchy.py [network | grid SIZE] [queries]
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from parking.common.aStar import AStarRouter
+from parking.common.contractionHierarchy import ContractionHierarchy
+
+from networks import load_network
+
+
+def grid(size, seed=0):
+    """ Two way grid with 100 m blocks and slightly varying edge lengths """
+    rnd = random.Random(seed)
+    coordinates = [(100.0 * (n % size), 100.0 * (n // size))
+                   for n in range(size * size)]
+    successors = [[] for _ in range(size * size)]
+    for node in range(size * size):
+        x, y = node % size, node // size
+        for dx, dy in ((1, 0), (0, 1)):
+            if x + dx < size and y + dy < size:
+                other = node + dx + dy * size
+                length = rnd.uniform(90.0, 100.0)
+                successors[node].append((other, length))
+                successors[other].append((node, length))
+    return coordinates, successors
+
+
+def network(name):
+    dummy, coordinates, graph = load_network(name)
+    successors = [[(v, w) for v, w in enumerate(row) if w] for row in graph]
+    return coordinates, successors
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "grid":
+        label = "grid {0}x{0}".format(sys.argv[2])
+        coordinates, successors = grid(int(sys.argv[2]))
+        queries = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    else:
+        label = sys.argv[1] if len(sys.argv) > 1 else \
+            "hannover-suedstadt-mitte"
+        coordinates, successors = network(label)
+        queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    num_nodes = len(successors)
+    print("{}: {} nodes, {} edges".format(
+        label, num_nodes, sum(len(s) for s in successors)))
+
+    start = time.time()
+    hierarchy = ContractionHierarchy.build(successors)
+    print("build {:.2f} s, {} edges incl. shortcuts".format(
+        time.time() - start, len(hierarchy.edges)))
+
+    rnd = random.Random(1)
+    pairs = [(rnd.randrange(num_nodes), rnd.randrange(num_nodes))
+             for _ in range(queries)]
+    routers = (("contraction hierarchy", hierarchy),
+               ("A*", AStarRouter(successors, coordinates)),
+               ("Dijkstra", AStarRouter(successors)))
+    for name, router in routers:
+        settled = 0
+        for origin, destination in pairs:
+            router.distance(origin, destination)
+            settled += router.settled
+        seconds = min(timeit.repeat(
+            lambda: [router.distance(o, d) for o, d in pairs],
+            number=1, repeat=3))
+        print("{:<22} {:>10.1f} us/query {:>10.1f} settled".format(
+            name, seconds * 1e6 / queries, settled / float(queries)))
+
+
+if __name__ == "__main__":
+    main()
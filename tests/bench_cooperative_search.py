@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Benchmark of the phase 2 searches on the bundled networks.
+
+Run from the repository root:
+
+    python3 tests/bench_cooperative_search.py [vehicles] [network]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.cooperativeSearch import termination
+from parking.common.vectorizedSearch import NumpyCooperativeSearch
+
+from networks import demand, load_network
+
+
+def bench(label, factory, repeat=5):
+    search = factory()
+    seconds = min(timeit.repeat(factory, number=1, repeat=repeat))
+    print("{:<34} {:>9.2f} ms {:>8} settled".format(
+        label, seconds * 1000, sum(sum(v) for v in search.bool_lst)))
+    return search
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    network = sys.argv[2] if len(sys.argv) > 2 else "hannover-suedstadt-mitte"
+    node_ids, _, graph = load_network(network)
+    adjacency = adjacency_lists(graph)
+    agents, dest = demand(node_ids, graph, num)
+    print("{}: {} nodes, {} vehicles".format(network, len(graph), num))
+
+    for penalty in (0.2, 0):
+        print("penalty {}".format(penalty))
+        bench("  dense CooperativeSearch",
+              lambda: CooperativeSearch(graph, agents, penalty).shortest())
+        bench("  numpy, FULL", lambda: NumpyCooperativeSearch(
+            graph, agents, penalty).shortest())
+        full = bench("  heap, FULL", lambda: HeapCooperativeSearch(
+            graph, agents, penalty, adjacency).shortest())
+        for name in ("ALL_DESTINATIONS", "OWN_DESTINATION"):
+            stop = getattr(termination, name)
+            early = bench("  heap, " + name, lambda: HeapCooperativeSearch(
+                graph, agents, penalty, adjacency, dest, stop).shortest())
+            changed = sum(a != b for a, b in zip(full.paths(dest),
+                                                 early.paths(dest)))
+            print("{:<34} {:>12} paths differ from FULL".format("", changed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" Route quality of single and multi start hill climbing and annealing on
+the bundled networks, sequential and in a process pool.
+
+Run from the repository root:
+
+    python3 tests/bench_hill_climb.py [vehicles] [network] [starts]
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.hill_climb import hill, multi_start, total_cost
+from parking.common.shortestPaths import ShortestPathTable
+
+from networks import demand, load_network
+
+
+def report(label, start, routes):
+    print("{:<34} {:>9.1f} ms  cost {}".format(
+        label, (time.time() - start) * 1000, total_cost(routes)))
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    network = sys.argv[2] if len(sys.argv) > 2 else "hannover-suedstadt-mitte"
+    starts = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 4
+    node_ids, dummy, graph = load_network(network)
+    adjacency = adjacency_lists(graph)
+    table = ShortestPathTable.build(graph, adjacency)
+    agents, dest = demand(node_ids, graph, num)
+    search = CooperativeSearch(graph, agents, 0.2).shortest()
+    routes = [search.reconstruct_path(p, d, a)
+              for p, d, a in zip(search.path_lst, dest, agents)]
+    print("{}: {} vehicles, {} starts, cooperative search cost {}".format(
+        network, num, starts, total_cost(routes)))
+
+    start = time.time()
+    report("hill", start, hill(routes, graph, adjacency, random.Random(0),
+                               table))
+    for method in ("hill", "anneal"):
+        start = time.time()
+        report("multi start {}, sequential".format(method), start,
+               multi_start(routes, graph, adjacency, table, starts,
+                           method=method))
+        with ProcessPoolExecutor(starts) as executor:
+            # exclude the pool start up
+            list(executor.map(abs, range(starts)))
+            start = time.time()
+            report("multi start {}, pool".format(method), start,
+                   multi_start(routes, graph, adjacency, table, starts,
+                               method=method, executor=executor))
+
+
+if __name__ == "__main__":
+    main()
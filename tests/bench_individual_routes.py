@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Benchmark of individual (penalty free) route queries on the bundled
+networks: settled nodes and latency per vehicle.
+
+Run from the repository root:
+
+    python3 tests/bench_individual_routes.py [vehicles] [network]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from parking.common.aStar import AStarRouter
+from parking.common.contractionHierarchy import ContractionHierarchy
+from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.cooperativeSearch import termination
+from parking.common.shortestPaths import ShortestPathTable
+
+from networks import demand, load_network
+
+
+def report(label, seconds, num, settled=None):
+    print("{:<28} {:>10.1f} us/vehicle {:>10}".format(
+        label, seconds * 1e6 / num,
+        "" if settled is None else "{:.1f} settled".format(settled / num)))
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    network = sys.argv[2] if len(sys.argv) > 2 else "hannover-suedstadt-mitte"
+    node_ids, coordinates, graph = load_network(network)
+    adjacency = adjacency_lists(graph)
+    agents, dest = demand(node_ids, graph, num)
+    print("{}: {} nodes, {} vehicles".format(network, len(graph), num))
+
+    def timed(factory):
+        return min(timeit.repeat(factory, number=1, repeat=5))
+
+    dense = CooperativeSearch(graph, agents, 0).shortest()
+    report("CooperativeSearch penalty 0",
+           timed(lambda: CooperativeSearch(graph, agents, 0).shortest()
+                 .paths(dest)), num,
+           sum(sum(v) for v in dense.bool_lst))
+
+    heap = HeapCooperativeSearch(graph, agents, 0, adjacency, dest,
+                                 termination.OWN_DESTINATION).shortest()
+    report("heap, OWN_DESTINATION",
+           timed(lambda: HeapCooperativeSearch(
+               graph, agents, 0, adjacency, dest,
+               termination.OWN_DESTINATION).shortest().paths(dest)), num,
+           heap.settled)
+
+    router = AStarRouter.from_matrix(graph, coordinates, adjacency)
+    settled = 0
+    for origin, destination in zip(agents, dest):
+        router.path(origin, destination)
+        settled += router.settled
+    report("A*", timed(lambda: router.paths(agents, dest)), num, settled)
+
+    hierarchy = ContractionHierarchy.from_matrix(graph, adjacency)
+    settled = 0
+    for origin, destination in zip(agents, dest):
+        hierarchy.path(origin, destination)
+        settled += hierarchy.settled
+    report("contraction hierarchy",
+           timed(lambda: hierarchy.paths(agents, dest)), num, settled)
+
+    table = ShortestPathTable.build(graph, adjacency)
+    report("table lookup", timed(lambda: table.paths(agents, dest)), num, 0)
+    print("table build {:.1f} ms".format(
+        timed(lambda: ShortestPathTable.build(graph, adjacency)) * 1000))
+
+
+if __name__ == "__main__":
+    main()
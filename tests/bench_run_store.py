@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+""" Benchmark of loading one run configuration: the JSON document of all runs
+against the random access run store, and of reading the run summaries used to
+validate a run configuration.
+
+Run from the repository root:
+
+    python3 tests/bench_run_store.py [runs] [parkingspaces] [vehicles]
+"""
+from __future__ import print_function
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from parking.runtime import runStore
+from test_run_store import run_configurations
+
+
+def measure(label, fn):
+    """ Print time and peak memory of a call """
+    tracemalloc.start()
+    start = timeit.default_timer()
+    fn()
+    seconds = timeit.default_timer() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{:<28} {:9.2f} ms {:9.1f} MiB".format(label, seconds * 1000.0,
+                                                 peak / 2.0 ** 20))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    spaces = int(sys.argv[2]) if len(sys.argv) > 2 else 576
+    vehicles = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    tmpdir = tempfile.mkdtemp()
+    try:
+        jsonfile = os.path.join(tmpdir, "config.runs.json.gz")
+        storefile = os.path.join(tmpdir, "config.runs")
+        cfg = run_configurations(runs, spaces, vehicles)
+        with gzip.open(jsonfile, 'wt') as fp:
+            json.dump(cfg, fp, sort_keys=True, separators=(',', ':'))
+        del cfg
+        runStore.convert(jsonfile, storefile)
+        print("{} runs, {} parking spaces, {} vehicles".format(runs, spaces,
+                                                               vehicles))
+        print("JSON {:.1f} KiB, store {:.1f} KiB".format(
+            os.path.getsize(jsonfile) / 1024.0,
+            os.path.getsize(storefile) / 1024.0))
+        last = str(runs - 1)
+        measure("JSON, load run {}".format(last),
+                lambda: runStore.read_json(jsonfile)[last])
+
+        def load_store():
+            with runStore.RunStore(storefile) as store:
+                store.get(last)
+        measure("store, load run {}".format(last), load_store)
+
+        with runStore.RunStore(storefile) as store:
+            store.get(last)
+            measure("store, next run", lambda: store.get("0"))
+            measure("store, summaries of all runs",
+                    lambda: [store.summary(run) for run in store.keys()])
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+""" Graphs shared by the routing tests. """
+import os
+import random
+import xml.etree.ElementTree as ET
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         os.pardir, "resources")
+NETWORKS = ["original-rectangular-grid", "hannover-suedstadt-mitte"]
+
+graph_ort = [[0, 0, 0, 1, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 1, 0, 1, 0, 1, 0, 1, 0, 0],
+             [0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 0, 1, 0, 0],
+             [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0],
+             [0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0, 0],
+             [0, 0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0],
+             [1, 1, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0],
+             [0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 1, 0, 0, 1, 0, 0],
+             [1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+             [0, 0, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0],
+             [0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 1],
+             [0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0],
+             [0, 1, 1, 0, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0],
+             [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 0, 0]]
+
+gg_bug = [[0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 90.5, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [65.5, 0, 0, 0, 0, 0, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 0, 0, 90.5, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 90.5, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 65.5, 0, 0, 0, 0, 90.5, 0, 0, 0, 0, 0],
+          [8.0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 8.0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 8.0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+          [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 8.0, 0, 0, 0, 0]]
+
+
+def load_network(name):
+    """ Build node coordinates and the weighted adjacency matrix of a bundled
+    network the same way Environment does, without needing sumolib.
+
+    Returns:
+        tuple: (node IDs, coordinates, adjacency matrix)
+    """
+    net_dir = os.path.join(RESOURCES, name)
+    nodes = ET.parse(os.path.join(net_dir, "reroute.nod.xml")).getroot()
+    node_ids = [n.get("id") for n in nodes.iter("node")]
+    index = dict((n, i) for i, n in enumerate(node_ids))
+    net = ET.parse(os.path.join(net_dir, "reroute.net.xml")).getroot()
+    junctions = dict((j.get("id"), (float(j.get("x")), float(j.get("y"))))
+                     for j in net.iter("junction"))
+    coordinates = [junctions[n] for n in node_ids]
+    matrix = [[0] * len(node_ids) for _ in node_ids]
+    for edge in net.iter("edge"):
+        if edge.get("function") == "internal":
+            continue
+        length = float(edge.find("lane").get("length"))
+        matrix[index[edge.get("from")]][index[edge.get("to")]] = length
+    return node_ids, coordinates, matrix
+
+
+def demand(node_ids, graph, num, seed=0):
+    """ Random origins on entry nodes and destinations like generatePsvDemand """
+    rnd = random.Random(seed)
+    entries = [i for i, n in enumerate(node_ids) if "entry" in n]
+    targets = [i for i in range(len(graph))
+               if any(row[i] for row in graph) and i not in entries]
+    return ([rnd.choice(entries) for _ in range(num)],
+            [rnd.choice(targets) for _ in range(num)])
+
+
+def graphs():
+    """ All test networks as (name, adjacency matrix) """
+    yield "gg_bug", gg_bug
+    yield "graph_ort", graph_ort
+    for name in NETWORKS:
+        yield name, load_network(name)[2]
+
+
+def path_length(graph, path):
+    """ Total weight of a node path """
+    return sum(graph[u][v] for u, v in zip(path, path[1:]))
@@ -0,0 +1,32 @@
+import pytest
+
+from parking.common.aStar import AStarRouter
+from parking.common.shortestPaths import ShortestPathTable
+
+from networks import NETWORKS, gg_bug, load_network, path_length
+
+
+@pytest.mark.parametrize("name", NETWORKS)
+def test_astar_finds_shortest_paths(name):
+    dummy, coordinates, graph = load_network(name)
+    table = ShortestPathTable.build(graph)
+    router = AStarRouter.from_matrix(graph, coordinates)
+    assert router.scale > 0
+    for origin in range(len(graph)):
+        for destination in range(len(graph)):
+            expected = table.distance(origin, destination)
+            if expected == float("inf"):
+                with pytest.raises(ValueError):
+                    router.path(origin, destination)
+                continue
+            path = router.path(origin, destination)
+            assert path[0] == origin and path[-1] == destination
+            assert path_length(graph, path) == pytest.approx(expected)
+
+
+def test_astar_without_coordinates_is_dijkstra():
+    table = ShortestPathTable.build(gg_bug)
+    router = AStarRouter.from_matrix(gg_bug)
+    for destination in range(24):
+        assert router.distance(25, destination) == \
+            table.distance(25, destination)
@@ -0,0 +1,161 @@
+import json
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+
+class Vehicle(object):
+
+    def __init__(self, name, routeIndex=0, timeCreated=0):
+        self.name = name
+        self.currentRouteIndex = routeIndex
+        self.timeCreated = timeCreated
+
+
+@pytest.fixture
+def calls():
+    """ Saved and loaded SUMO states """
+    return []
+
+
+@pytest.fixture
+def sumo(monkeypatch, calls):
+    """ The checkpoint module with SUMO's save/load state replaced """
+    def saveState(filename):
+        calls.append(("save", filename))
+        with open(filename, 'w') as fp:
+            fp.write("<snapshot/>")
+
+    def loadState(filename):
+        calls.append(("load", filename))
+
+    traci = types.ModuleType("traci")
+    traci.simulation = types.ModuleType("traci.simulation")
+    traci.simulation.saveState = saveState
+    traci.simulation.loadState = loadState
+    # traci is only available next to a SUMO installation
+    monkeypatch.setitem(sys.modules, "traci", traci)
+    from parking.runtime import checkpoint
+    monkeypatch.setattr(checkpoint, "traci", traci)
+    return checkpoint
+
+
+@pytest.fixture
+def sim_config(tmp_path):
+    for name, content in (("reroute.net.xml", "<net/>"),
+                          ("reroute.rou.xml", "<routes>1</routes>"),
+                          ("background.rou.xml", "<routes>2</routes>")):
+        (tmp_path / name).write_text(content)
+    return {"resourcedir": str(tmp_path), "routefile": "reroute.rou.xml",
+            "backgroundvehicles": True,
+            "backgroundroutefile": "background.rou.xml"}
+
+
+def drive(checkpoint, p_boundary, p_steps):
+    """ Record p_steps simulation steps, the first vehicle leaves its entry
+    edge after p_boundary """
+    for step in range(p_steps):
+        vehicles = [Vehicle("veh0", 1 if step > p_boundary else 0),
+                    Vehicle("veh1", 0, 1)]
+        if not checkpoint.done:
+            checkpoint.record(step, vehicles[:step + 1])
+
+
+def test_demand_key_covers_all_route_files(sumo, sim_config, tmp_path):
+    net = str(tmp_path / "reroute.net.xml")
+    routes = str(tmp_path / "reroute.rou.xml")
+    background = str(tmp_path / "background.rou.xml")
+    key = sumo.demand_key(net, routes, background)
+    assert key == sumo.demand_key(net, routes, background)
+    assert key != sumo.demand_key(net, routes)
+    assert key != sumo.demand_key(net, background, routes)
+    (tmp_path / "background.rou.xml").write_text("<routes>3</routes>")
+    assert key != sumo.demand_key(net, routes, background)
+
+    with_background = sumo.Phase1Checkpoint(sim_config).key
+    sim_config["backgroundvehicles"] = False
+    assert sumo.Phase1Checkpoint(sim_config).key != with_background
+
+
+def test_remove_stale(sumo, tmp_path):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    names = ["a.state.xml.{}.tmp".format(process.pid),
+             "a.state.xml.{}.tmp".format(os.getpid()),
+             "a.json.{}.tmp".format(os.getppid()),
+             "a.state.xml.tmp",
+             "a.state.xml"]
+    for name in names:
+        (tmp_path / name).write_text("")
+    sumo.remove_stale(str(tmp_path))
+    assert sorted(os.listdir(str(tmp_path))) == sorted(names[1:])
+
+
+def test_record_and_restore(sumo, sim_config, calls):
+    # first run: the boundary step is written, the state is not saved
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    assert not checkpoint.exists()
+    drive(checkpoint, 2, 5)
+    assert checkpoint.done
+    assert calls == []
+    assert not checkpoint.exists()
+    with open(checkpoint._metafile) as fp:
+        assert json.load(fp) == {"step": 2,
+                                 "departed": [["veh0", 0], ["veh1", 1]]}
+
+    # second run: the state is saved once, at the boundary step
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    assert not checkpoint.exists()
+    drive(checkpoint, 2, 5)
+    assert checkpoint.done
+    assert calls == [("save", checkpoint._pendingfile)]
+    assert checkpoint.exists()
+    assert not os.path.exists(checkpoint._pendingfile)
+
+    # later runs branch from it
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    assert checkpoint.exists()
+    assert checkpoint.restore() == (2, [("veh0", 0), ("veh1", 1)])
+    assert checkpoint.done
+    assert calls[-1] == ("load", checkpoint._statefile)
+
+
+def test_generated_demand_is_not_recorded(sumo, sim_config, calls):
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    drive(checkpoint, 2, 5)
+
+    checkpoint = sumo.Phase1Checkpoint(sim_config, True)
+    assert checkpoint.done
+    checkpoint.record(2, [Vehicle("veh0")])
+    assert calls == []
+    assert not checkpoint.exists()
+
+
+def test_boundary_crossed_in_first_step(sumo, sim_config, calls):
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    checkpoint.record(0, [Vehicle("veh0", 1)])
+    assert checkpoint.done
+    assert not os.path.exists(checkpoint._metafile)
+    assert calls == []
+
+
+def test_boundary_step_not_reached(sumo, sim_config, calls):
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    drive(checkpoint, 3, 5)
+
+    # the simulation ends before the boundary
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    drive(checkpoint, 3, 2)
+    assert not checkpoint.done
+    assert calls == []
+
+    # the boundary step is skipped
+    checkpoint = sumo.Phase1Checkpoint(sim_config)
+    checkpoint.record(1, [Vehicle("veh0")])
+    checkpoint.record(4, [Vehicle("veh0", 1)])
+    assert checkpoint.done
+    assert calls == []
+    assert not checkpoint.exists()
@@ -1,8 +1,18 @@
+import random
 import sys
+from collections import deque
 sys.path.append("../parking")
 
+import numpy
+import pytest
+
+from parking.runtime.communication import grid_pairs, numpy_pairs
 from parking.runtime.communication import mark_neighbours
 from parking.runtime.communication import communication_groups
+from parking.runtime.communication import CommunicationGraph
+from parking.runtime.communication import EDGE_ADDED, EDGE_REMOVED
+from parking.runtime.communication import group_indices
+from parking.runtime.communication import neighbour_pairs
 
 # Proper vehicle class is harder to use hence a quick mock
 class Vehicle():
@@ -67,3 +77,137 @@ def test_communication_groups():
 
     assert len(res[2]) == 3
     assert (veh3 and veh4 and veh5) in res[2]
+
+
+def reference_neighbours(positions, distance):
+    """ All pairs comparison of the original mark_neighbours """
+    neighbours = [[] for _ in positions]
+    for veh_idx in range(len(positions)):
+        for oth_idx in range(veh_idx + 1, len(positions)):
+            veh_x, veh_y = positions[veh_idx]
+            oth_x, oth_y = positions[oth_idx]
+            if (abs(veh_x - oth_x) + abs(veh_y - oth_y)) < distance:
+                neighbours[veh_idx].append(oth_idx)
+                neighbours[oth_idx].append(veh_idx)
+    return neighbours
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("count", [0, 1, 40, 300])
+def test_mark_neighbours_matches_all_pairs(seed, count):
+    rng = random.Random(seed)
+    distance = rng.choice([25.0, 100.0, 333.3])
+    # integer coordinates put many vehicles exactly on cell borders and at
+    # exactly the communication distance
+    positions = [(rng.randint(-500, 500) * 0.5, rng.uniform(-200, 800))
+                 if i % 2 else (rng.randint(-20, 20) * distance / 4,
+                                rng.randint(-20, 20) * distance / 4)
+                 for i in range(count)]
+    expected = reference_neighbours(positions, distance)
+
+    vehicles = [Vehicle(p) for p in positions]
+    mark_neighbours(vehicles, distance)
+    assert [[vehicles.index(n) for n in v.connected_neighbors]
+            for v in vehicles] == expected
+
+    pairs = sorted((i, j) for i, ns in enumerate(expected) for j in ns if i < j)
+    assert grid_pairs(positions, distance) == pairs
+    first, second = numpy_pairs(numpy.array(positions), distance)
+    assert list(zip(first.tolist(), second.tolist())) == pairs
+
+
+def reference_groups(vehicles):
+    """ Breadth first grouping of the original communication_groups """
+    vehicles = vehicles[:]
+    groups = []
+    while vehicles:
+        group = []
+        veh_queue = deque([vehicles[0]])
+        while veh_queue:
+            veh = veh_queue.pop()
+            group.append(veh)
+            filtered = (v for v in veh.connected_neighbors
+                        if (v not in group) and (v not in veh_queue))
+            veh_queue.extend(filtered)
+            if vehicles:
+                vehicles.remove(veh)
+        groups.append(group)
+    return groups
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_communication_groups_match_reference(seed):
+    rng = random.Random(seed)
+    vehicles = [Vehicle((rng.uniform(0, 2000), rng.uniform(0, 2000)))
+                for _ in range(150)]
+    rng.shuffle(vehicles)
+    mark_neighbours(vehicles, 150)
+    expected = reference_groups(vehicles)
+    groups = communication_groups(vehicles)
+    # same groups in the same order, members in list order
+    assert [set(g) for g in groups] == [set(g) for g in expected]
+    assert [g[0] for g in groups] == [g[0] for g in expected]
+    for group in groups:
+        assert group == sorted(group, key=vehicles.index)
+
+    pairs = neighbour_pairs([v.position for v in vehicles], 150)
+    assert communication_groups(vehicles, pairs) == groups
+    first, second = numpy_pairs([v.position for v in vehicles], 150)
+    assert communication_groups(vehicles, zip(first, second)) == groups
+
+
+def test_group_indices():
+    assert group_indices(0, []) == []
+    assert group_indices(6, [(4, 5), (0, 1), (3, 5)]) == [[0, 1], [2],
+                                                          [3, 4, 5]]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_communication_graph_follows_moving_vehicles(seed):
+    rng = random.Random(seed)
+    distance = 60.0
+    graph = CommunicationGraph(distance)
+    positions = {}
+    edges = set()
+    for step in range(60):
+        # vehicles depart, park and move a few meters per step
+        for vehicle in range(40):
+            if vehicle not in positions and rng.random() < 0.3:
+                positions[vehicle] = (rng.uniform(0, 400), rng.uniform(0, 400))
+            elif vehicle in positions and rng.random() < 0.02:
+                del positions[vehicle]
+            elif vehicle in positions and rng.random() < 0.7:
+                x, y = positions[vehicle]
+                positions[vehicle] = (x + rng.uniform(-8.3, 8.3),
+                                      y + rng.uniform(-8.3, 8.3))
+        for event, first, second in graph.update(dict(positions)):
+            assert first < second
+            if event == EDGE_ADDED:
+                assert (first, second) not in edges
+                edges.add((first, second))
+            else:
+                assert event == EDGE_REMOVED
+                edges.remove((first, second))
+
+        vehicles = sorted(positions)
+        expected = [(vehicles[i], vehicles[j]) for i, j in grid_pairs(
+            [positions[v] for v in vehicles], distance)]
+        assert graph.pairs() == expected
+        assert sorted(edges) == expected
+        if step % 3 == 0:
+            assert graph.groups() == [
+                [vehicles[i] for i in group]
+                for group in group_indices(len(vehicles), [
+                    (vehicles.index(a), vehicles.index(b))
+                    for a, b in expected])]
+
+
+def test_communication_graph_skips_standing_vehicles():
+    graph = CommunicationGraph(10)
+    assert graph.update({0: (0, 0), 1: (5, 0), 2: (50, 0)}) == [
+        (EDGE_ADDED, 0, 1)]
+    assert graph.update({0: (0, 0), 1: (5, 0), 2: (50, 0)}) == []
+    assert graph.groups() == [[0, 1], [2]]
+    assert graph.update({0: (0, 0), 2: (45, 0)}) == [(EDGE_REMOVED, 0, 1)]
+    assert graph.groups() == [[0], [2]]
+    assert graph.rebuilds == 1
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from parking.common.contractionHierarchy import ContractionHierarchy
+from parking.common.shortestPaths import ShortestPathTable
+
+from networks import gg_bug, graph_ort, graphs, path_length
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+def test_hierarchy_finds_shortest_paths(name, graph):
+    table = ShortestPathTable.build(graph)
+    hierarchy = ContractionHierarchy.from_matrix(graph)
+    for origin in range(len(graph)):
+        for destination in range(len(graph)):
+            expected = table.distance(origin, destination)
+            if expected == float("inf"):
+                assert hierarchy.distance(origin, destination) == expected
+                with pytest.raises(ValueError):
+                    hierarchy.path(origin, destination)
+                continue
+            assert hierarchy.distance(origin, destination) == \
+                pytest.approx(expected)
+            path = hierarchy.path(origin, destination)
+            assert path[0] == origin and path[-1] == destination
+            assert path_length(graph, path) == pytest.approx(expected)
+
+
+def test_hierarchy_on_random_sparse_graph():
+    rnd = random.Random(4)
+    size = 60
+    graph = [[0] * size for _ in range(size)]
+    for _ in range(200):
+        u, v = rnd.randrange(size), rnd.randrange(size)
+        if u != v:
+            graph[u][v] = rnd.choice([5.0, 10.0, rnd.uniform(1, 50)])
+    table = ShortestPathTable.build(graph)
+    hierarchy = ContractionHierarchy.from_matrix(graph)
+    for origin in range(size):
+        for destination in range(size):
+            assert hierarchy.distance(origin, destination) == \
+                pytest.approx(table.distance(origin, destination))
+
+
+def test_hierarchy_cache(tmp_path):
+    filename = str(tmp_path / "ch.npz")
+    hierarchy = ContractionHierarchy.cached(gg_bug, filename)
+    loaded = ContractionHierarchy.cached(gg_bug, filename)
+    assert loaded.key == hierarchy.key
+    assert loaded.rank == hierarchy.rank
+    assert loaded.edges == hierarchy.edges
+    assert loaded.paths([25, 26], [3, 7]) == hierarchy.paths([25, 26], [3, 7])
+    assert ContractionHierarchy.cached(graph_ort, filename).key != \
+        hierarchy.key
@@ -0,0 +1,114 @@
+import random
+from sys import maxsize
+
+import pytest
+
+from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.cooperativeSearch import HistoryCooperativeSearch
+from parking.common.cooperativeSearch import termination
+
+from networks import gg_bug, graphs
+
+
+def assert_same_search(dense, sparse):
+    assert sparse.output_lst == dense.output_lst
+    assert sparse.path_lst == dense.path_lst
+    for row, dynamic in zip(dense.dynamic_graph, sparse.dynamic_graph):
+        assert dict((n, w) for n, w in enumerate(row) if w) == dynamic
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+@pytest.mark.parametrize("penalty", [0, 0.2])
+def test_heap_search_matches_dense(name, graph, penalty):
+    rnd = random.Random(name)
+    for agents in ([0], [len(graph) - 1] * 3,
+                   [rnd.randrange(len(graph)) for _ in range(5)]):
+        dense = CooperativeSearch(graph, agents, penalty).shortest()
+        sparse = HeapCooperativeSearch(graph, agents, penalty).shortest()
+        assert_same_search(dense, sparse)
+
+
+def test_heap_search_same_paths_gg_bug():
+    cars = [25, 25, 25, 25, 25]
+    dest = [12, 12, 12, 12, 12]
+    dense = CooperativeSearch(gg_bug, cars).shortest().paths(dest)
+    sparse = HeapCooperativeSearch(gg_bug, cars).shortest().paths(dest)
+    assert sparse == dense
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+def test_early_termination(name, graph):
+    rnd = random.Random(name)
+    # entry nodes have no incoming edges and can not be destinations
+    targets = [n for n in range(len(graph)) if any(row[n] for row in graph)]
+    agents = [rnd.randrange(len(graph)) for _ in range(8)]
+    dest = [rnd.choice(targets) for _ in range(8)]
+
+    full = HeapCooperativeSearch(graph, agents, 0.2).shortest()
+    exact = HeapCooperativeSearch(graph, agents, 0.2, None, dest,
+                                  termination.ALL_DESTINATIONS).shortest()
+    assert exact.paths(dest) == full.paths(dest)
+    assert exact.settled <= full.settled
+
+    own = HeapCooperativeSearch(graph, agents, 0.2, None, dest,
+                                termination.OWN_DESTINATION).shortest()
+    for car, visited in enumerate(own.bool_lst):
+        assert visited[dest[car]]
+    assert own.settled <= exact.settled
+
+    indy = HeapCooperativeSearch(graph, agents, 0).shortest()
+    indy_own = HeapCooperativeSearch(graph, agents, 0, None, dest,
+                                     termination.OWN_DESTINATION).shortest()
+    assert indy_own.paths(dest) == indy.paths(dest)
+
+
+def copying_dijkstra_inner(self, car_index):
+    """ dijkstra_inner as it was before the penalty overlay, copies the whole
+    dynamic graph for every settled node """
+    output = self.output_lst[car_index]
+    bool_list = self.bool_lst[car_index]
+    path = self.path_lst[car_index]
+    min_index = self._neighbors(output, bool_list)
+    bool_list[min_index] = True
+    driver_graph = [x[:] for x in self.dynamic_graph]
+    history = self.history[car_index]
+    for position in history:
+        driver_graph[position[0]][position[1]] -= \
+            self.graph[position[0]][position[1]] * self.penalty
+    temp_l = []
+    for node in range(len(self.graph)):
+        if ((not bool_list[node])
+                and driver_graph[min_index][node]
+                and output[min_index] != maxsize
+                and output[min_index] + driver_graph[min_index][node] <
+                output[node]):
+            output[node] = output[min_index] + driver_graph[min_index][node]
+            path[node] = min_index
+            temp_l.append(node)
+    if temp_l:
+        _, temp = min(((output[x], x) for x in temp_l), key=lambda p: p[0])
+        self.dynamic_graph[min_index][temp] += \
+            self.graph[min_index][temp] * self.penalty
+        self.dynamic_graph[temp][min_index] += \
+            self.graph[temp][min_index] * self.penalty
+        history.append((min_index, temp))
+        history.append((temp, min_index))
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+def test_dijkstra_inner_overlay(name, graph):
+    rnd = random.Random(name)
+    agents = [rnd.randrange(len(graph)) for _ in range(6)]
+    reference = CooperativeSearch(graph, agents, 0.2)
+    dense = CooperativeSearch(graph, agents, 0.2)
+    for dummy in range(len(graph) - 1):
+        for car in range(len(agents)):
+            copying_dijkstra_inner(reference, car)
+            dense.dijkstra_inner(car)
+    assert dense.history == reference.history
+    assert_same_search(reference, HistoryCooperativeSearch(
+        graph, agents, 0.2).shortest())
+    assert dense.output_lst == reference.output_lst
+    assert dense.path_lst == reference.path_lst
+    assert dense.dynamic_graph == reference.dynamic_graph
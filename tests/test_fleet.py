@@ -0,0 +1,62 @@
+import numpy
+
+from parking.vehicle.fleet import VehicleFleet, fleetColumn, state
+
+
+class View(object):
+    """ Minimal per vehicle view like ParkingSearchVehicle """
+    _activity = fleetColumn("activity")
+    _currentEdgeID = fleetColumn("edge", p_edge=True)
+    _search_time = fleetColumn("searchTime")
+
+    def __init__(self, name, fleet):
+        self._fleet = fleet
+        self._index = fleet.add(name, self)
+
+
+def test_fleet_grows_and_keeps_rows():
+    fleet = VehicleFleet(p_capacity=2)
+    views = [View("veh{}".format(i), fleet) for i in range(100)]
+    for i, view in enumerate(views):
+        view._currentEdgeID = "e{}".format(i % 7)
+    assert len(fleet) == 100
+    assert fleet.index("veh42") == 42
+    assert fleet[42] is views[42]
+    assert [v._currentEdgeID for v in views] == \
+        ["e{}".format(i % 7) for i in range(100)]
+    assert len(fleet.edgeIDs) == 7
+    views[3]._currentEdgeID = ""
+    assert views[3]._currentEdgeID == ""
+
+
+def test_fleet_counts_and_transitions():
+    fleet = VehicleFleet()
+    views = [View("veh{}".format(i), fleet) for i in range(10)]
+    assert (fleet.remaining(), fleet.parked()) == (10, 0)
+    fleet.transition(numpy.arange(10) % 3 == 0, state.PARKED)
+    assert (fleet.remaining(), fleet.parked()) == (6, 4)
+    assert views[3]._activity == state.PARKED
+    assert fleet.unparked().tolist() == [1, 2, 4, 5, 7, 8]
+    views[1]._activity = state.MANEUVERING_TO_PARK
+    fleet.timeBeginManeuvering[1] = 5
+    views[2]._activity = state.MANEUVERING_TO_PARK
+    fleet.timeBeginManeuvering[2] = 10
+    assert fleet.inState(state.MANEUVERING_TO_PARK).tolist() == [1, 2]
+    assert fleet.maneuverDone(18, 12).tolist() == [1]
+
+
+def test_fleet_results_as_python_values():
+    fleet = VehicleFleet()
+    views = [View("veh{}".format(i), fleet) for i in range(3)]
+    views[1]._search_time = 12
+    assert views[0]._search_time is None
+    assert fleet.values("searchTime") == [None, 12, None]
+    # search times are ints like in the results files
+    assert isinstance(fleet.values("searchTime")[1], int)
+    assert isinstance(views[1]._search_time, int)
+    fleet.searchDistance[1] = 80.5
+    assert fleet.values("searchDistance") == [None, 80.5, None]
+    views[1]._search_time = None
+    assert fleet.values("searchTime") == [None, None, None]
+    assert fleet.values("phase") == [1, 1, 1]
+    assert isinstance(views[0]._activity, int)
@@ -0,0 +1,162 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from parking.common.cooperativeSearch import CoopSearchHillOptimized
+from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.hill_climb import RouteCost, anneal, count_overlap, hill
+from parking.common.hill_climb import multi_start
+from parking.common.hill_climb import total_cost
+from parking.common.shortestPaths import ShortestPathTable
+
+from networks import NETWORKS, demand, graph_ort, load_network
+
+reconstruct_path = CooperativeSearch.reconstruct_path
+
+
+def reference_hill(driver_matrix, adjacency_matrix, rng):
+    """ hill() before the incremental cost, recomputing total_cost """
+    costs = [total_cost(driver_matrix)]
+    feasible_ind = [x[0] for x in enumerate(driver_matrix) if len(x[1]) > 3]
+    if not feasible_ind:
+        return driver_matrix
+    adjacency = adjacency_lists(adjacency_matrix)
+
+    def hill_runner(driver_matrix):
+        cost = total_cost(driver_matrix)
+        d = rng.choice(feasible_ind)
+        path = driver_matrix[d]
+        path_end = len(path) - 1
+        node_ind = rng.randint(1, path_end - 1)
+        node = path[node_ind]
+        path_neighbors = (path[node_ind - 1], path[node_ind + 1])
+        move_to = [x for x in enumerate(adjacency_matrix[node])
+                   if x[1] != 0 and x[0] not in path_neighbors]
+        if not move_to:
+            return driver_matrix
+        move_to = rng.choice(move_to)[0]
+        left_ind = 0 if node_ind == 1 else node_ind - 2
+        righ_ind = path_end if node_ind == path_end - 1 else node_ind + 2
+        left = path[left_ind]
+        right = path[righ_ind]
+        left_route, righ_route = HeapCooperativeSearch(
+            adjacency_matrix, [left, move_to], 0, adjacency).shortest().path_lst
+        left_path = reconstruct_path(left_route, move_to, left)
+        right_path = reconstruct_path(righ_route, right, move_to)
+        new_path = path[:left_ind] + left_path + right_path[1:-1] + \
+            path[righ_ind:]
+        if len(new_path) - len(set(new_path)):
+            return driver_matrix
+        temp_matrix = [x[:] for x in driver_matrix]
+        temp_matrix[d] = new_path
+        if total_cost(temp_matrix) < cost:
+            return temp_matrix
+        return driver_matrix
+
+    for i in range(1000):
+        driver_matrix = hill_runner(driver_matrix)
+        costs.append(total_cost(driver_matrix))
+        if len(costs) > 100 and len(set(costs[-100:])) == 1:
+            return driver_matrix
+    return driver_matrix
+
+
+def cooperative_routes(graph, agents, destinations):
+    search = CooperativeSearch(graph, agents, 0.2).shortest()
+    return [search.reconstruct_path(path, dest, agent) for path, dest, agent
+            in zip(search.path_lst, destinations, agents)]
+
+
+def test_route_cost_matches_total_cost():
+    rnd = random.Random(3)
+    paths = [[rnd.randrange(6) for _ in range(rnd.randint(1, 8))]
+             for _ in range(5)]
+    state = RouteCost(paths)
+    for _ in range(200):
+        assert state.overlap == count_overlap(state.paths)
+        assert state.cost == total_cost(state.paths)
+        index = rnd.randrange(len(paths))
+        new = [rnd.randrange(6) for _ in range(rnd.randint(0, 8))]
+        old = state.replace(index, new)
+        if rnd.random() < 0.5:
+            state.replace(index, old)
+
+
+@pytest.mark.parametrize("name", NETWORKS)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_hill_matches_reference(name, seed):
+    node_ids, dummy, graph = load_network(name)
+    agents, destinations = demand(node_ids, graph, 20, seed)
+    routes = cooperative_routes(graph, agents, destinations)
+    expected = reference_hill([r[:] for r in routes], graph,
+                              random.Random(seed))
+    result = hill([r[:] for r in routes], graph, rng=random.Random(seed))
+    assert result == expected
+    table = ShortestPathTable.build(graph)
+    assert hill([r[:] for r in routes], graph, rng=random.Random(seed),
+                table=table) == expected
+    assert total_cost(result) <= total_cost(routes)
+
+
+def test_hill_on_unit_grid():
+    agents = [0, 3, 11, 12, 5]
+    routes = cooperative_routes(graph_ort, agents, [15] * 5)
+    expected = reference_hill([r[:] for r in routes], graph_ort,
+                              random.Random(5))
+    assert hill(routes, graph_ort, rng=random.Random(5)) == expected
+
+
+def hannover_routes(seed=0, vehicles=20):
+    node_ids, dummy, graph = load_network("hannover-suedstadt-mitte")
+    agents, destinations = demand(node_ids, graph, vehicles, seed)
+    return graph, cooperative_routes(graph, agents, destinations)
+
+
+def test_multi_start_returns_best_start():
+    graph, routes = hannover_routes()
+    seeds = random.Random(7)
+    singles = [hill(routes, graph, rng=random.Random(seeds.getrandbits(64)))
+               for _ in range(4)]
+    best = multi_start(routes, graph, starts=4, seed=7)
+    assert total_cost(best) == min(total_cost(r) for r in singles)
+    assert best in singles
+
+
+def test_multi_start_in_process_pool():
+    graph, routes = hannover_routes(1)
+    with ProcessPoolExecutor(2) as executor:
+        parallel = multi_start(routes, graph, starts=3, seed=1,
+                               method="anneal", executor=executor)
+    assert parallel == multi_start(routes, graph, starts=3, seed=1,
+                                   method="anneal")
+
+
+def test_anneal_and_budget():
+    graph, routes = hannover_routes(2)
+    annealed = anneal(routes, graph, rng=random.Random(2), iterations=2000)
+    assert total_cost(annealed) <= total_cost(routes)
+    assert multi_start(routes, graph, budget=0) == routes
+
+
+def test_optimized_telemetry_and_budget():
+    node_ids, dummy, graph = load_network("hannover-suedstadt-mitte")
+    agents, destinations = demand(node_ids, graph, 20, 3)
+    search = CoopSearchHillOptimized(graph, agents, destinations, 0.2)
+    routes = search.shortest().optimized(random.Random(3))
+    telemetry = search.telemetry
+    assert telemetry.iterations == len(telemetry.costs) == \
+        len(telemetry.times)
+    assert telemetry.accepted + telemetry.rejected + telemetry.infeasible == \
+        telemetry.iterations
+    assert telemetry.costs[-1] == telemetry.best_cost == total_cost(routes)
+    assert telemetry.costs == sorted(telemetry.costs, reverse=True)
+    assert "iterations" in telemetry.summary()
+
+    capped = search.optimized(random.Random(3), iterations=10)
+    assert search.telemetry.iterations == 10
+    assert total_cost(capped) >= total_cost(routes)
+    search.optimized(random.Random(3), budget=0)
+    assert search.telemetry.iterations == 0
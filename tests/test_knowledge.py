@@ -0,0 +1,75 @@
+import random
+
+from parking.env.knowledge import ParkingKnowledge, popcount
+from parking.env.parkingSpace import ParkingSpace
+
+
+def parking_table():
+    spaces = [ParkingSpace(i, "e{}".format(i // 4), 20.0 + 7.0 * (i % 4))
+              for i in range(12)]
+    for i in (1, 3, 6, 11):
+        spaces[i].unassign()
+    return spaces
+
+
+def test_observe_and_query():
+    spaces = parking_table()
+    knowledge = ParkingKnowledge(spaces)
+    knowledge.observe(0, "e0")
+    assert knowledge.spaces(knowledge.knownFree(0)) == [spaces[1], spaces[3]]
+    assert knowledge.spaces(knowledge.knownOccupied(0)) == [spaces[0],
+                                                            spaces[2]]
+    assert knowledge.knownFreeOnEdge(0, "e0") == 2
+    assert knowledge.knownFreeOnEdge(0, "e1") == 0
+    assert knowledge.knownFreeAhead(0, "e0", 30.0) == [spaces[3]]
+    assert knowledge.knownFreeAhead(0, "e0", 10.0, 20.0) == [spaces[1]]
+    assert knowledge.knownFree(1) == 0
+
+    spaces[3].assignToVehicle("veh1")
+    knowledge.occupy(1, spaces[3])
+    # vehicle 0 still believes the space is free until it looks again
+    assert knowledge.knownFreeOnEdge(0, "e0") == 2
+    knowledge.observe(0, "e0")
+    assert knowledge.spaces(knowledge.knownFree(0)) == [spaces[1]]
+
+
+def test_share_within_groups():
+    spaces = parking_table()
+    knowledge = ParkingKnowledge(spaces)
+    knowledge.observe(0, "e0")
+    knowledge.observe(1, "e1")
+    knowledge.observe(2, "e2")
+    # vehicle 2 took the space vehicle 0 saw as free, occupied wins
+    spaces[1].assignToVehicle("veh2")
+    knowledge.occupy(2, spaces[1])
+    knowledge.share([[0, 2], [1]])
+    assert knowledge.knownFree(0) == knowledge.knownFree(2)
+    assert knowledge.spaces(knowledge.knownFree(0)) == [spaces[3],
+                                                        spaces[11]]
+    assert knowledge.spaces(knowledge.knownFree(1)) == [spaces[6]]
+    assert popcount(knowledge.knownOccupied(0)) == 6
+    knowledge.forget(2)
+    assert knowledge.knownFree(2) == 0
+
+
+def test_share_matches_set_semantics():
+    rng = random.Random(0)
+    spaces = [ParkingSpace(i, "e{}".format(i % 50), 20.0 + i)
+              for i in range(3000)]
+    for ps in rng.sample(spaces, 600):
+        ps.unassign()
+    knowledge = ParkingKnowledge(spaces)
+    seen = {}
+    for vehicle in range(100):
+        edges = rng.sample(range(50), 3)
+        for edge in edges:
+            knowledge.observe(vehicle, "e{}".format(edge))
+        seen[vehicle] = set(edges)
+    groups = [list(range(i, min(i + 7, 100))) for i in range(0, 100, 7)]
+    knowledge.share(groups)
+    for group in groups:
+        edges = set().union(*(seen[v] for v in group))
+        expected = [ps for ps in spaces
+                    if ps.available and int(ps.edgeID[1:]) in edges]
+        for vehicle in group:
+            assert knowledge.spaces(knowledge.knownFree(vehicle)) == expected
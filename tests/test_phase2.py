@@ -0,0 +1,182 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from parking.common.cooperativeSearch import adjacency_lists
+from parking.common.shortestPaths import ShortestPathTable, graph_digest
+from parking.runtime.phase2 import TERMINATION, Phase2Routes, PendingRoutes
+from parking.runtime.phase2 import cooperative_paths, individual_paths
+from parking.runtime.phase2 import _Done, init_worker
+from parking.runtime.routeCache import RouteCache
+
+from networks import gg_bug, graph_ort
+
+PENALTY = 0.2
+SEED = 7
+
+
+class Environment(object):
+    """ The parts of parking.env.environment.Environment phase 2 uses """
+
+    def __init__(self, graph, router):
+        self._adjacencyMatrix = graph
+        self._adjacencyList = adjacency_lists(graph)
+        self._adjacencyEdgeID = [["e{}_{}".format(i, j) if w else ""
+                                  for j, w in enumerate(row)]
+                                 for i, row in enumerate(graph)]
+        self._graphDigest = graph_digest(graph)
+        self._individualRouter = router
+
+
+class Runtime(object):
+    """ The parts of parking.runtime.runner.Runtime phase 2 uses """
+
+    def __init__(self, graph, router=None, cache=None, **sim_config):
+        self._config = None
+        self._environment = Environment(graph, router)
+        self._sim_config = dict(phase2seed=SEED, hilliterations=200,
+                                **sim_config)
+        self._routeCache = cache
+
+    def convertNodeSequenceToEdgeSequence(self, adjacencyEdgeID, nodeSequence):
+        return [adjacencyEdgeID[row][col]
+                for row, col in zip(nodeSequence, nodeSequence[1:])]
+
+
+class Demand(Phase2Routes):
+    """ Phase 2 routes of random trips instead of a route file """
+
+    def _readDemand(self):
+        graph = self._environment._adjacencyMatrix
+        table = ShortestPathTable.build(graph)
+        rnd = random.Random(len(graph))
+        # entry nodes only have outgoing edges
+        origins = [i for i in range(len(graph))
+                   if not any(row[i] for row in graph)] or range(len(graph))
+        self.allVehicleIDs = []
+        self.allOriginNodeIndices = []
+        self.allDestinationNodeIndices = []
+        while len(self.allVehicleIDs) < 8:
+            origin = rnd.choice(origins)
+            destination = rnd.randrange(len(graph))
+            if origin != destination and \
+                    table.distances[origin][destination] < float("inf"):
+                self.allVehicleIDs.append("veh{}".format(
+                    len(self.allVehicleIDs)))
+                self.allOriginNodeIndices.append(origin)
+                self.allDestinationNodeIndices.append(destination)
+
+
+class NoExecutor(object):
+    """ Executor that must not be used """
+
+    def submit(self, *args):
+        raise AssertionError("the process pool was used")
+
+
+def pool(runtime):
+    environment = runtime._environment
+    return ProcessPoolExecutor(
+        max_workers=2, initializer=init_worker,
+        initargs=(environment._adjacencyMatrix, environment._adjacencyList,
+                  environment._individualRouter, "heap",
+                  TERMINATION["destinations"]))
+
+
+def edges(runtime, vehicle_IDs, paths):
+    return dict((vehID, runtime.convertNodeSequenceToEdgeSequence(
+        runtime._environment._adjacencyEdgeID, path))
+        for vehID, path in zip(vehicle_IDs, paths))
+
+
+def routers():
+    for graph in (gg_bug, graph_ort):
+        yield graph, None
+        yield graph, ShortestPathTable.build(graph)
+
+
+@pytest.mark.parametrize("graph, router", list(routers()))
+def test_pool_matches_synchronous_paths(graph, router):
+    runtime = Runtime(graph, router)
+    environment = runtime._environment
+    with pool(runtime) as executor:
+        routes = Demand(runtime, executor=executor)
+        cooperative = routes.submitCooperativeRoutes(PENALTY)
+        individual = routes.submitIndividualRoutes()
+        assert not isinstance(cooperative._parts[0][0], _Done)
+        assert not isinstance(individual._parts[0][0], _Done)
+        expected, telemetry = cooperative_paths(
+            graph, environment._adjacencyList, "heap",
+            TERMINATION["destinations"], routes.allOriginNodeIndices,
+            routes.allDestinationNodeIndices, PENALTY, SEED, router, 200)
+        assert cooperative.result() == edges(
+            runtime, routes.allVehicleIDs, expected)
+        assert len(cooperative.telemetry) == 1
+        expected, telemetry = individual_paths(
+            graph, environment._adjacencyList, "heap", router,
+            routes.allOriginNodeIndices, routes.allDestinationNodeIndices)
+        assert individual.result() == edges(
+            runtime, routes.allVehicleIDs, expected)
+        assert individual.telemetry == []
+
+
+@pytest.mark.parametrize("graph, router", list(routers()))
+def test_mixed_cooperation_in_pool(graph, router):
+    runtime = Runtime(graph, router)
+    random.seed(3)
+    expected = Demand(runtime).submitRoutes(0.5, PENALTY)
+    assert isinstance(expected, PendingRoutes)
+    assert len(expected._parts) == 2
+    with pool(runtime) as executor:
+        random.seed(3)
+        mixed = Demand(runtime, executor=executor).submitRoutes(0.5, PENALTY)
+        assert len(mixed._parts) == 2
+        assert mixed.result() == expected.result()
+        assert len(mixed.result()) == 8
+
+
+def test_cache_hit_skips_executor(tmpdir):
+    cache = RouteCache(str(tmpdir))
+    runtime = Runtime(graph_ort, cache=cache)
+    with pool(runtime) as executor:
+        cooperative = Demand(runtime, executor=executor).submitRoutes(
+            1, PENALTY).result()
+        individual = Demand(runtime, executor=executor).submitRoutes(
+            0, PENALTY).result()
+    assert cache.misses == 2
+
+    # another sweep reads the routes from disk
+    runtime = Runtime(graph_ort, cache=RouteCache(str(tmpdir)))
+    routes = Demand(runtime, executor=NoExecutor())
+    assert routes.submitRoutes(1, PENALTY).result() == cooperative
+    assert routes.submitRoutes(0, PENALTY).result() == individual
+    assert runtime._routeCache.diskHits == 2
+
+
+def test_own_graph_is_routed_synchronously():
+    runtime = Runtime(gg_bug)
+    routes = Demand(runtime, executor=NoExecutor())
+    # the workers only know the environment's network
+    graph = [[2 * w for w in row] for row in gg_bug]
+    pending = routes.submitCooperativeRoutes(PENALTY, adjacency_matrix=graph)
+    expected, telemetry = cooperative_paths(
+        graph, None, "heap", TERMINATION["destinations"],
+        routes.allOriginNodeIndices, routes.allDestinationNodeIndices,
+        PENALTY, SEED, None, 200)
+    assert pending.result() == edges(runtime, routes.allVehicleIDs, expected)
+
+
+def test_budgeted_climbs_are_not_cached(tmpdir):
+    cache = RouteCache(str(tmpdir))
+    routes = Demand(Runtime(graph_ort, cache=cache, hillbudget=10.0))
+    routes.submitCooperativeRoutes(PENALTY).result()
+    routes.submitCooperativeRoutes(PENALTY).result()
+    assert cache.misses == 0
+    assert len(tmpdir.listdir()) == 0
+
+    routes = Demand(Runtime(graph_ort, cache=cache))
+    routes.submitCooperativeRoutes(PENALTY).result()
+    routes.submitCooperativeRoutes(PENALTY).result()
+    assert cache.misses == 1
+    assert cache.hits == 1
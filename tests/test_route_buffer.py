@@ -0,0 +1,170 @@
+import sys
+import types
+
+import pytest
+
+from parking.vehicle.fleet import state
+
+
+class SUMO(object):
+    """ The vehicle routes as SUMO keeps them """
+
+    def __init__(self):
+        self.routes = {}
+        self.index = {}
+
+    def setRoute(self, vehID, route):
+        if self.index.get(vehID, -1) >= 0:
+            # the new route has to start at the current edge
+            assert route[0] == self.getRoadID(vehID)
+            self.index[vehID] = 0
+        else:
+            self.index[vehID] = -1
+        self.routes[vehID] = list(route)
+
+    def getRoute(self, vehID):
+        return list(self.routes[vehID])
+
+    def getRouteIndex(self, vehID):
+        return self.index[vehID]
+
+    def getRoadID(self, vehID):
+        if self.index[vehID] < 0:
+            return ""
+        return self.routes[vehID][self.index[vehID]]
+
+    def getLaneID(self, vehID):
+        return self.getRoadID(vehID) + "_0"
+
+    def advance(self, vehID):
+        self.index[vehID] += 1
+
+
+class ParkingSpace(object):
+
+    def __init__(self, edgeID, position):
+        self.edgeID = edgeID
+        self.position = position
+        self.available = True
+
+
+class Environment(object):
+    _oppositeEdgeID = {"b": "-b", "-b": "b"}
+    knowledge = None
+
+
+class Configuration(object):
+
+    def getRunCfg(self, p_run):
+        return {"vehicles": {"veh0": {
+            "coopPhase2": True, "coopPhase3": False,
+            "activity": state.CRUISING, "isSearchingVehicle": False}}}
+
+    def getCfg(self, p_key):
+        if p_key == "vehicle":
+            return {"parking": {"distance": {"min": 5, "max": 30}}}
+        return {}
+
+
+@pytest.fixture
+def sumo(monkeypatch):
+    sumo = SUMO()
+    traci = types.ModuleType("traci")
+    traci.vehicle = types.ModuleType("traci.vehicle")
+    for name in ("setRoute", "getRoute", "getRouteIndex", "getRoadID",
+                 "getLaneID"):
+        setattr(traci.vehicle, name, getattr(sumo, name))
+    traci.vehicle.getSpeed = lambda vehID: 10.0
+    traci.vehicle.getPosition = lambda vehID: (0.0, 0.0)
+    traci.vehicle.getLanePosition = lambda vehID: 5.0
+    traci.lane = types.ModuleType("traci.lane")
+    traci.lane.getLength = lambda laneID: 100.0
+    # traci is only available next to a SUMO installation
+    monkeypatch.setitem(sys.modules, "traci", traci)
+    from parking.vehicle import parkingSearchVehicle
+    monkeypatch.setattr(parkingSearchVehicle, "traci", traci)
+    sumo.vehicle = parkingSearchVehicle.ParkingSearchVehicle(
+        "veh0", Environment(), Configuration(), 0,
+        p_cooperativeRoute=["a", "b", "c"], p_individualRoute=["a", "c"])
+    return sumo
+
+
+def check(sumo, vehicle):
+    """ Compare the route buffer with slicing SUMO's route """
+    route = sumo.getRoute("veh0")
+    index = sumo.getRouteIndex("veh0")
+    assert vehicle.current_route == route
+    assert vehicle.traversed_route == route[:max(index, 0)]
+    assert vehicle.active_route == route[max(index, 0):]
+    assert vehicle.last_edge() == (index == len(route) - 1)
+
+
+def drive(sumo, vehicle):
+    """ Update the vehicle on every edge up to the end of its route """
+    while True:
+        vehicle.update()
+        check(sumo, vehicle)
+        if vehicle.last_edge():
+            return
+        sumo.advance("veh0")
+        assert vehicle.advanced()
+
+
+def test_route_follows_sumo(sumo):
+    vehicle = sumo.vehicle
+    assert sumo.getRoute("veh0") == ["a", "b", "c"]
+    # not departed yet
+    vehicle.update()
+    check(sumo, vehicle)
+    assert not vehicle.advanced()
+
+    sumo.advance("veh0")
+    drive(sumo, vehicle)
+    assert vehicle.traversed_route == ["a", "b"]
+
+    version = vehicle.routeVersion
+    vehicle.append_route("d")
+    assert sumo.getRoute("veh0") == ["c", "d"]
+    check(sumo, vehicle)
+    assert vehicle.routeVersion > version
+    drive(sumo, vehicle)
+    vehicle.append_route("e")
+    drive(sumo, vehicle)
+    assert vehicle.current_route == ["d", "e"]
+    assert vehicle._route == ["a", "b", "c", "d", "e"]
+
+
+def test_opposite_parking_space_loop(sumo):
+    vehicle = sumo.vehicle
+    sumo.advance("veh0")
+    vehicle.update()
+    sumo.advance("veh0")
+    vehicle.update()
+    check(sumo, vehicle)
+    assert vehicle.oppositeEdgeID == "-b"
+
+    assert vehicle.lookoutForOppositeParkingSpace(
+        [ParkingSpace("-b", 80.0)], "-b") == "-b"
+    assert sumo.getRoute("veh0") == ["b", "-b", "b", "c"]
+    check(sumo, vehicle)
+    drive(sumo, vehicle)
+    assert vehicle.traversed_route == ["b", "-b", "b"]
+    assert vehicle._route == ["a", "b", "-b", "b", "c"]
+
+
+def test_route_setters(sumo):
+    vehicle = sumo.vehicle
+    sumo.advance("veh0")
+    vehicle.update()
+
+    # the active route is only changed on the Python side
+    vehicle.active_route = ["a", "x"]
+    assert vehicle.active_route == ["a", "x"]
+    assert vehicle.current_route == ["a", "x"]
+    assert sumo.getRoute("veh0") == ["a", "b", "c"]
+
+    vehicle.cooperative_route = ["a", "c"]
+    vehicle.update()
+    check(sumo, vehicle)
+    assert vehicle.current_route == ["a", "c"]
+    drive(sumo, vehicle)
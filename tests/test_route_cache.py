@@ -0,0 +1,36 @@
+from parking.runtime.routeCache import RouteCache, route_key
+
+
+def test_route_key_depends_on_all_parts():
+    key = route_key(network="abc", origins=[1, 2], destinations=[3, 4],
+                    penalty=0.2, seed=1)
+    assert key == route_key(seed=1, penalty=0.2, destinations=[3, 4],
+                            origins=[1, 2], network="abc")
+    assert key != route_key(network="abc", origins=[2, 1],
+                            destinations=[3, 4], penalty=0.2, seed=1)
+    assert key != route_key(network="abc", origins=[1, 2],
+                            destinations=[3, 4], penalty=0.2, seed=2)
+
+
+def test_route_cache_memory_and_disk(tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [(0, 1, 2), [3, 4]]
+
+    cache = RouteCache(str(tmp_path), p_capacity=1)
+    assert cache.lookup("a", compute) == [[0, 1, 2], [3, 4]]
+    assert cache.lookup("a", compute) == [[0, 1, 2], [3, 4]]
+    assert (cache.hits, cache.diskHits, cache.misses) == (1, 0, 1)
+    # evicts "a" from memory, it is still on disk
+    cache.put("b", [[5]])
+    assert cache.get("a") == [[0, 1, 2], [3, 4]]
+    assert cache.diskHits == 1
+    assert len(calls) == 1
+
+    other = RouteCache(str(tmp_path))
+    assert other.get("b") == [[5]]
+    assert other.get("c") is None
+    assert (other.hits, other.misses) == (1, 1)
+    assert "1 hits" in other.summary()
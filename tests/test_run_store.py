@@ -0,0 +1,207 @@
+import gzip
+import json
+import os
+import random
+
+import pytest
+
+from parking.runtime import runStore
+from parking.runtime.runStore import RunStore, RunStoreWriter
+
+
+def run_configurations(runs=5, spaces=20, vehicles=6, seed=0):
+    """ Run configurations as written by Configuration.writeRunCfg """
+    rng = random.Random(seed)
+    cfg = {}
+    for run in range(runs):
+        cfg[str(run)] = {
+            "parkingspaces": dict(
+                (str(i), {"name": i, "available": rng.random() < 0.3,
+                          "edgeID": "e{}".format(i // 4),
+                          "position": 10.0 + 7.5 * (i % 4)})
+                for i in range(spaces)),
+            "vehicles": dict(
+                ("veh{}".format(i),
+                 {"name": "veh{}".format(i),
+                  "isSearchingVehicle": rng.random() < 0.8,
+                  "activity": rng.randrange(5),
+                  "coopPhase2": rng.random() < 0.5,
+                  "coopPhase3": rng.random() < 0.5})
+                for i in range(vehicles))}
+    return cfg
+
+
+def test_round_trip(tmpdir):
+    cfg = run_configurations()
+    # a run without vehicles and one that does not fit the schema
+    del cfg["1"]["vehicles"]
+    cfg["2"]["vehicles"]["veh0"]["coopPhase3"] = None
+    filename = str(tmpdir.join("config.runs"))
+    runStore.write_store(filename, cfg)
+    assert runStore.is_run_store(filename)
+    with RunStore(filename) as store:
+        assert len(store) == len(cfg)
+        assert sorted(store.keys()) == sorted(cfg)
+        assert "3" in store and 3 in store and "9" not in store
+        for run in cfg:
+            assert store.get(run) == cfg[run]
+        assert store.get("9") is None
+        with pytest.raises(KeyError):
+            store["9"]
+
+
+def test_parking_table_stored_once(tmpdir):
+    cfg = run_configurations(runs=10, spaces=200)
+    filename = str(tmpdir.join("config.runs"))
+    runStore.write_store(filename, cfg)
+    with RunStore(filename) as store:
+        assert len(store._tableOffsets) == 1
+    # the store is much smaller than the JSON document
+    jsonfile = str(tmpdir.join("config.runs.json.gz"))
+    with gzip.open(jsonfile, 'wt') as fp:
+        json.dump(cfg, fp)
+    assert os.path.getsize(filename) < os.path.getsize(jsonfile)
+
+
+def test_convert(tmpdir):
+    cfg = run_configurations()
+    # plain JSON named .gz, as written by earlier versions under Python 3
+    for compress in (False, True):
+        source = str(tmpdir.join("config.runs.json.gz"))
+        if compress:
+            with gzip.open(source, 'wt') as fp:
+                json.dump(cfg, fp)
+        else:
+            with open(source, 'w') as fp:
+                json.dump(cfg, fp)
+        assert not runStore.is_run_store(source)
+        assert runStore.read_json(source) == cfg
+        target = str(tmpdir.join("config.runs"))
+        runStore.convert(source, target)
+        with RunStore(target) as store:
+            assert dict((run, store[run]) for run in store.keys()) == cfg
+
+
+def test_writer_is_atomic(tmpdir):
+    filename = str(tmpdir.join("config.runs"))
+    with pytest.raises(ValueError):
+        with RunStoreWriter(filename) as writer:
+            writer.add(0, run_configurations(runs=1)["0"])
+            raise ValueError()
+    assert tmpdir.listdir() == []
+
+
+def test_corrupt_record(tmpdir):
+    filename = str(tmpdir.join("config.runs"))
+    runStore.write_store(filename, run_configurations(runs=2))
+    with RunStore(filename) as store:
+        offset = store._runs["1"]
+    with open(filename, 'r+b') as fp:
+        fp.seek(offset + 12)
+        byte = fp.read(1)
+        fp.seek(offset + 12)
+        fp.write(bytes(bytearray([ord(byte) ^ 0xff])))
+    with RunStore(filename) as store:
+        assert store.get("0") is not None
+        with pytest.raises(BaseException):
+            store.get("1")
+
+
+def test_append_and_finalize(tmpdir):
+    cfg = run_configurations(runs=6)
+    filename = str(tmpdir.join("config.runs"))
+    writer = RunStoreWriter(filename, p_append=True)
+    for run in ("0", "1", "2"):
+        writer.add(run, cfg[run])
+        # every added run can be read back, by the writer and other readers
+        assert writer.get(run) == cfg[run]
+        with RunStore(filename) as store:
+            assert not store.finalized
+            assert store.get(run) == cfg[run]
+    writer.close()
+    with RunStore(filename) as store:
+        assert store.finalized
+        assert sorted(store.keys()) == ["0", "1", "2"]
+
+    # appending to a finalized store replaces its index
+    with RunStoreWriter(filename, p_append=True) as writer:
+        for run in ("3", "4", "5"):
+            writer.add(run, cfg[run])
+        writer.add("0", cfg["5"])
+    with RunStore(filename) as store:
+        assert store.finalized
+        assert len(store) == 6
+        assert store.get("0") == cfg["5"]
+        assert store.get("4") == cfg["4"]
+
+    size = os.path.getsize(filename)
+    runStore.compact(filename)
+    assert os.path.getsize(filename) < size
+    with RunStore(filename) as store:
+        assert store.finalized and store.get("0") == cfg["5"]
+
+
+def test_partial_tail(tmpdir):
+    cfg = run_configurations(runs=4)
+    filename = str(tmpdir.join("config.runs"))
+    with RunStoreWriter(filename, p_append=True) as writer:
+        ends = []
+        for run in ("0", "1", "2", "3"):
+            writer.add(run, cfg[run])
+            writer._fp.seek(0, os.SEEK_END)
+            ends.append(writer._fp.tell())
+    with open(filename, 'rb') as fp:
+        content = fp.read()
+
+    # a crash at any byte keeps exactly the runs written completely
+    for cut in range(len(runStore.MAGIC), len(content), 7):
+        with open(filename, 'wb') as fp:
+            fp.write(content[:cut])
+        complete = [str(run) for run, end in enumerate(ends) if end <= cut]
+        with RunStore(filename) as store:
+            assert sorted(store.keys()) == complete
+            for run in complete:
+                assert store.get(run) == cfg[run]
+
+    # the writer truncates the tail before appending
+    with open(filename, 'wb') as fp:
+        fp.write(content[:ends[1] + 5])
+    with RunStoreWriter(filename, p_append=True) as writer:
+        assert os.path.getsize(filename) == ends[1]
+        writer.add("2", cfg["2"])
+    with RunStore(filename) as store:
+        assert store.finalized
+        assert dict((run, store[run]) for run in store.keys()) == \
+            dict((run, cfg[run]) for run in ("0", "1", "2"))
+
+
+def test_summaries(tmpdir):
+    cfg = run_configurations(runs=3)
+    del cfg["1"]["vehicles"]
+    filename = str(tmpdir.join("config.runs"))
+    with RunStoreWriter(filename, p_append=True) as writer:
+        writer.add("0", cfg["0"])
+    available, vehicles, checksum = runStore.summarize_runcfg(cfg["0"])
+    assert available == sum(1 for space in cfg["0"]["parkingspaces"].values()
+                            if space["available"])
+    assert vehicles == 6
+    assert runStore.summarize_runcfg(cfg["1"])[1] == 0
+    assert runStore.summarize_runcfg({"vehicles": {}})[0] is None
+
+    # a crashed writer leaves runs without summary in the index
+    with RunStoreWriter(filename, p_append=True) as writer:
+        writer.add("1", cfg["1"])
+        writer.add("2", cfg["2"])
+        writer._summaries.clear()
+        writer._fp.flush()
+        with RunStore(filename) as store:
+            assert not store.finalized
+            assert store.summary("1") == runStore.summarize_runcfg(cfg["1"])
+
+    # finalizing stores all summaries, reading them decodes no run
+    with RunStore(filename) as store:
+        store.get = None
+        for run in cfg:
+            assert store.summary(run) == runStore.summarize_runcfg(cfg[run])
+        assert store.summary("3") is None
+        assert store.summary("0") == (available, vehicles, checksum)
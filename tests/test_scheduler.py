@@ -0,0 +1,36 @@
+from parking.runtime.scheduler import UpdateScheduler
+from parking.vehicle.fleet import state
+
+
+def test_scheduler_states():
+    scheduler = UpdateScheduler()
+    for index, activity in enumerate([state.CRUISING, state.SEARCHING,
+                                      state.FOUND_PARKING_SPACE,
+                                      state.PARKED]):
+        scheduler.add(index, activity)
+    assert scheduler.remaining == 3
+    assert scheduler.due(0) == [0, 1, 2]
+    assert scheduler.polled(0) and not scheduler.polled(1)
+
+    scheduler.move(2, state.MANEUVERING_TO_PARK, 13)
+    assert scheduler.due(12) == [0, 1]
+    # due once woken up until it changes state
+    assert scheduler.due(13) == [0, 1, 2]
+    assert scheduler.due(14) == [0, 1, 2]
+    scheduler.move(2, state.PARKED)
+    scheduler.move(0, state.SEARCHING)
+    assert scheduler.due(15) == [0, 1]
+    assert scheduler.remaining == 2
+
+
+def test_scheduler_skips_stale_wakeups():
+    scheduler = UpdateScheduler()
+    scheduler.add(0, state.FOUND_PARKING_SPACE)
+    scheduler.move(0, state.MANEUVERING_TO_PARK, 5)
+    scheduler.move(0, state.FOUND_PARKING_SPACE)
+    scheduler.move(0, state.MANEUVERING_TO_PARK, 9)
+    assert scheduler.due(5) == []
+    assert scheduler.due(9) == [0]
+    scheduler.move(0, state.PARKED)
+    assert scheduler.due(10) == []
+    assert scheduler.remaining == 0
@@ -0,0 +1,43 @@
+import pytest
+
+from parking.common.cooperativeSearch import HeapCooperativeSearch
+from parking.common.shortestPaths import LazyShortestPathTable
+from parking.common.shortestPaths import ShortestPathTable
+
+from networks import gg_bug, graph_ort, graphs
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+def test_table_matches_search(name, graph):
+    table = ShortestPathTable.build(graph)
+    for origin in range(len(graph)):
+        search = HeapCooperativeSearch(graph, [origin], 0).shortest()
+        for destination, distance in enumerate(search.output_lst[0]):
+            if search.path_lst[0][destination] == "entry":
+                assert table.distance(origin, destination) == float("inf")
+                continue
+            assert table.distance(origin, destination) == distance
+            assert table.path(origin, destination) == \
+                search.reconstruct_path(search.path_lst[0], destination)
+
+
+def test_table_cache(tmp_path):
+    filename = str(tmp_path / "paths.npz")
+    table = ShortestPathTable.cached(gg_bug, filename)
+    loaded = ShortestPathTable.cached(gg_bug, filename)
+    assert loaded.key == table.key
+    assert loaded.distances == table.distances
+    assert loaded.predecessors == table.predecessors
+    assert ShortestPathTable.cached(graph_ort, filename).key != table.key
+    with pytest.raises(ValueError):
+        table.path(0, 24)
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+def test_lazy_table_matches_table(name, graph):
+    table = ShortestPathTable.build(graph)
+    lazy = LazyShortestPathTable(graph)
+    for origin in range(len(graph)):
+        assert lazy.distance(origin, 0) == table.distance(origin, 0)
+        assert lazy.predecessors[origin] == table.predecessors[origin]
+    assert len(lazy.predecessors) == len(graph)
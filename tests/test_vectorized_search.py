@@ -0,0 +1,61 @@
+import random
+from sys import maxsize
+
+import numpy
+import pytest
+
+from parking.common.cooperativeSearch import CooperativeSearch
+from parking.common.cooperativeSearch import termination
+from parking.common.vectorizedSearch import NumpyCooperativeSearch
+from parking.common.vectorizedSearch import repeated_add
+
+from networks import gg_bug, graphs
+
+
+def assert_same_search(dense, vectorized):
+    for output, array in zip(dense.output_lst, vectorized.output_lst):
+        assert [x if x != maxsize else numpy.inf for x in output] == \
+            array.tolist()
+    assert vectorized.path_lst == dense.path_lst
+    assert vectorized.dynamic_graph.tolist() == dense.dynamic_graph
+
+
+def test_repeated_add():
+    value = 90.5
+    for dummy in range(7):
+        value += 90.5 * 0.2
+    assert repeated_add(90.5, 90.5 * 0.2, 7) == value
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+@pytest.mark.parametrize("penalty", [0, 0.2])
+def test_numpy_search_matches_dense(name, graph, penalty):
+    rnd = random.Random(name)
+    for agents in ([0], [len(graph) - 1] * 3,
+                   [rnd.randrange(len(graph)) for _ in range(5)]):
+        dense = CooperativeSearch(graph, agents, penalty).shortest()
+        vectorized = NumpyCooperativeSearch(graph, agents, penalty).shortest()
+        assert_same_search(dense, vectorized)
+
+
+@pytest.mark.parametrize("name,graph", list(graphs()))
+def test_numpy_dijkstra_inner_matches_dense(name, graph):
+    rnd = random.Random(name)
+    agents = [rnd.randrange(len(graph)) for _ in range(4)]
+    dense = CooperativeSearch(graph, agents, 0.2)
+    vectorized = NumpyCooperativeSearch(graph, agents, 0.2)
+    for dummy in range(len(graph) - 1):
+        for car in range(len(agents)):
+            dense.dijkstra_inner(car)
+            vectorized.dijkstra_inner(car)
+    assert_same_search(dense, vectorized)
+    assert vectorized.history == dense.history
+
+
+def test_numpy_search_early_termination():
+    cars = [25, 25, 25, 25, 25]
+    dest = [12, 12, 12, 12, 12]
+    full = CooperativeSearch(gg_bug, cars).shortest().paths(dest)
+    early = NumpyCooperativeSearch(gg_bug, cars, 0.2, None, dest,
+                                   termination.ALL_DESTINATIONS)
+    assert early.shortest().paths(dest) == full